@@ -4,7 +4,7 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS 
 from .config import Config
 from dotenv import load_dotenv
-from .db import db, migrate  
+from .db import db, migrate, sock
 from .routes.attendance_routes import attendance_bp
 from .routes.employee_route import employee_bp
 from .routes.auth_routes import auth_bp
@@ -33,6 +33,7 @@ def create_app(config_class=Config):
 
     db.init_app(app)
     migrate.init_app(app, db) 
+    sock.init_app(app)
 
     # Cấu hình CORS chi tiết hơn
     CORS(app, resources={
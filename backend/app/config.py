@@ -17,6 +17,92 @@ class Config:
     MIN_PASSWORD_LENGTH = 6
     MAX_LOGIN_ATTEMPTS = 5
 
+    # Ảnh nhận diện được giải mã thu nhỏ (JPEG DCT 1/2, 1/4, 1/8) sao cho cạnh dài vẫn >= giá trị này; 0 = giữ nguyên
+    IMAGE_INGEST_TARGET_SIDE = int(os.getenv('IMAGE_INGEST_TARGET_SIDE', 960))
+    # Kích thước tối đa (byte) của body ảnh gửi lên /api/recognize/binary
+    IMAGE_INGEST_MAX_BYTES = int(os.getenv('IMAGE_INGEST_MAX_BYTES', 8 * 1024 * 1024))
+
+    # WebSocket /api/recognize/stream: thời gian tối đa của một phiên và tuỳ chọn của flask-sock
+    RECOGNITION_STREAM_MAX_SECONDS = float(os.getenv('RECOGNITION_STREAM_MAX_SECONDS', 60))
+    SOCK_SERVER_OPTIONS = {'ping_interval': 25, 'max_message_size': IMAGE_INGEST_MAX_BYTES}
+
+    # Nạp sẵn model nhận diện khi khởi động server (script/CLI luôn nạp lười khi cần)
+    FACE_MODELS_WARMUP = os.getenv('FACE_MODELS_WARMUP', 'true').lower() == 'true'
+
+    # InsightFace model pack: buffalo_l (mặc định), buffalo_m, buffalo_s, buffalo_sc...
+    # FACE_ALLOWED_MODULES: danh sách module cách nhau bởi dấu phẩy, 'all' = toàn bộ module của pack.
+    # Chỉ cần detection + landmark_3d_68 (landmark, pose) + recognition; genderage/landmark_2d_106 không dùng.
+    FACE_MODEL_PACK = os.getenv('FACE_MODEL_PACK', 'buffalo_l')
+    FACE_ALLOWED_MODULES = os.getenv('FACE_ALLOWED_MODULES', 'detection,landmark_3d_68,recognition')
+    FACE_DET_SIZE = int(os.getenv('FACE_DET_SIZE', 640))
+
+    # ONNX Runtime session cho các model khuôn mặt (0 = mặc định của onnxruntime)
+    FACE_ORT_INTRA_OP_THREADS = int(os.getenv('FACE_ORT_INTRA_OP_THREADS', 0))
+    FACE_ORT_INTER_OP_THREADS = int(os.getenv('FACE_ORT_INTER_OP_THREADS', 0))
+    FACE_ORT_EXECUTION_MODE = os.getenv('FACE_ORT_EXECUTION_MODE', 'sequential')        # sequential | parallel
+    FACE_ORT_GRAPH_OPTIMIZATION = os.getenv('FACE_ORT_GRAPH_OPTIMIZATION', 'all')       # disable | basic | extended | all
+    FACE_ORT_CPU_MEM_ARENA = os.getenv('FACE_ORT_CPU_MEM_ARENA', 'true').lower() == 'true'
+    FACE_ORT_MEM_PATTERN = os.getenv('FACE_ORT_MEM_PATTERN', 'true').lower() == 'true'
+    FACE_ORT_ALLOW_SPINNING = os.getenv('FACE_ORT_ALLOW_SPINNING', 'true').lower() == 'true'
+    FACE_ORT_OPTIMIZED_MODEL_DIR = os.getenv('FACE_ORT_OPTIMIZED_MODEL_DIR', '')        # rỗng = không cache
+
+    # Model INT8 (detector + ArcFace) do scripts/quantize_face_models.py tạo ra; chỉ dùng khi báo cáo độ chính xác đạt
+    FACE_USE_QUANTIZED_MODELS = os.getenv('FACE_USE_QUANTIZED_MODELS', 'false').lower() == 'true'
+    FACE_QUANTIZED_MODEL_DIR = os.getenv('FACE_QUANTIZED_MODEL_DIR', os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'data', 'models', 'quantized')))
+
+    # Trạng thái liveness theo session: memory (một tiến trình) | sqlite (dùng chung giữa các worker) | redis
+    FACE_LIVENESS_STORE = os.getenv('FACE_LIVENESS_STORE', 'memory')
+    FACE_LIVENESS_SQLITE_PATH = os.getenv('FACE_LIVENESS_SQLITE_PATH', os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'data', 'liveness_sessions.db')))
+    FACE_LIVENESS_REDIS_URL = os.getenv('FACE_LIVENESS_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Theo dõi khuôn mặt trong session liveness: chỉ chạy detector trên vùng quanh bbox của frame trước,
+    # phát hiện lại toàn frame khi kết quả không chắc chắn hoặc sau FACE_TRACK_MAX_FRAMES frame liên tiếp
+    FACE_TRACKING = os.getenv('FACE_TRACKING', 'true').lower() == 'true'
+    FACE_TRACK_PADDING = float(os.getenv('FACE_TRACK_PADDING', 0.5))      # lề quanh bbox, theo kích thước bbox
+    FACE_TRACK_ROI_SIZE = int(os.getenv('FACE_TRACK_ROI_SIZE', 320))      # cạnh dài tối đa của ảnh ROI đưa vào detector
+    FACE_TRACK_MIN_SCORE = float(os.getenv('FACE_TRACK_MIN_SCORE', 0.6))
+    FACE_TRACK_MAX_FRAMES = int(os.getenv('FACE_TRACK_MAX_FRAMES', 15))
+
+    # Kết quả nhận diện + chấm công đã quyết định trong một liveness session được trả lại cho các frame
+    # tiếp theo của session (không truy vấn DB, không ghi chấm công lần nữa) trong FACE_RESULT_CACHE_TTL_SECONDS
+    # giây (0 = tắt, tối đa bằng thời hạn của session), chỉ khi frame vẫn được nhận diện là đúng nhân viên đó
+    FACE_RESULT_CACHE_TTL_SECONDS = float(os.getenv('FACE_RESULT_CACHE_TTL_SECONDS', 3.0))
+
+    # Dạng lưu embedding của gallery trong mỗi worker: float32 | float16 | int8 (float16/int8 chấm lại bằng float32)
+    FACE_GALLERY_PRECISION = os.getenv('FACE_GALLERY_PRECISION', 'float32')
+
+    # Snapshot gallery trên đĩa (mmap, dùng chung giữa các worker); rỗng = không dùng snapshot
+    FACE_GALLERY_SNAPSHOT_PATH = os.getenv('FACE_GALLERY_SNAPSHOT_PATH', os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'data', 'face_gallery.snapshot')))
+    FACE_GALLERY_SNAPSHOT_DTYPE = os.getenv('FACE_GALLERY_SNAPSHOT_DTYPE', 'float32')   # float32 | float16
+    # Nhật ký face_gallery_changes: mỗi lần poll đọc lại các thay đổi tạo trong REPLAY_SECONDS giây gần nhất
+    # (id nhỏ hơn có thể commit muộn khi nhiều worker cùng ghi); thay đổi đã nằm trong snapshot và cũ hơn
+    # RETENTION_HOURS giờ bị xóa mỗi khi ghi snapshot
+    FACE_GALLERY_CHANGE_REPLAY_SECONDS = float(os.getenv('FACE_GALLERY_CHANGE_REPLAY_SECONDS', 120))
+    FACE_GALLERY_CHANGE_RETENTION_HOURS = float(os.getenv('FACE_GALLERY_CHANGE_RETENTION_HOURS', 24))
+
+    # Face inference pool (0 = chạy model ngay trong luồng xử lý request)
+    FACE_INFERENCE_WORKERS = int(os.getenv('FACE_INFERENCE_WORKERS', 0))
+    FACE_INFERENCE_MAX_BATCH = int(os.getenv('FACE_INFERENCE_MAX_BATCH', 16))
+    FACE_INFERENCE_MAX_WAIT_MS = float(os.getenv('FACE_INFERENCE_MAX_WAIT_MS', 5))
+    FACE_INFERENCE_TIMEOUT_SECONDS = float(os.getenv('FACE_INFERENCE_TIMEOUT_SECONDS', 10))
+
+    # Lưu ảnh training bằng một luồng nền (app/services/image_writer.py): response không chờ ghi đĩa.
+    # Mỗi lô tối đa MAX_BATCH ảnh, chờ thêm tối đa MAX_WAIT_MS; FSYNC=false bỏ fsync (nhanh hơn, kém bền hơn)
+    FACE_IMAGE_WRITE_ASYNC = os.getenv('FACE_IMAGE_WRITE_ASYNC', 'true').lower() == 'true'
+    FACE_IMAGE_WRITE_MAX_BATCH = int(os.getenv('FACE_IMAGE_WRITE_MAX_BATCH', 32))
+    FACE_IMAGE_WRITE_MAX_WAIT_MS = float(os.getenv('FACE_IMAGE_WRITE_MAX_WAIT_MS', 20))
+    FACE_IMAGE_WRITE_FSYNC = os.getenv('FACE_IMAGE_WRITE_FSYNC', 'true').lower() == 'true'
+
+    # Đăng ký khuôn mặt hàng loạt (API /api/employees/bulk-enroll và scripts/bulk_enroll.py):
+    # số tiến trình (0 = chạy trong tiến trình gọi), số ảnh mỗi lô gửi cho một tiến trình
+    # (model nhận diện chạy một lần cho cả lô), số dòng FaceTrainingData mỗi transaction
+    BULK_ENROLL_WORKERS = int(os.getenv('BULK_ENROLL_WORKERS', 2))
+    BULK_ENROLL_BATCH_SIZE = int(os.getenv('BULK_ENROLL_BATCH_SIZE', 16))
+    BULK_ENROLL_CHUNK_SIZE = int(os.getenv('BULK_ENROLL_CHUNK_SIZE', 200))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -6,3 +6,4 @@ from .session import Session
 from .audit_log import AuditLog
 from .face_training_data import FaceTrainingData
 from .attendance_recovery import AttendanceRecoveryRequest
+from .face_gallery_change import FaceGalleryChange
@@ -4,6 +4,7 @@ from datetime import datetime, timezone, date, timedelta
 import re 
 from app.models.attendance import Attendance  
 from app.models.face_training_data import FaceTrainingData  
+from app.models.face_gallery_change import FaceGalleryChange
 import pytz 
 from app.utils.security import hash_password, check_password_hash 
 
@@ -44,6 +45,38 @@ class Employee(db.Model):
     recovery_requests = db.relationship('AttendanceRecoveryRequest', backref='employee', lazy=True)
     sessions = db.relationship('Session', backref='employee', lazy=True)
     
+    # NEW: Factory dùng chung cho add_employee_logic và đăng ký hàng loạt (bulk_enrollment)
+    @classmethod
+    def create_employee(cls, employee_id, data, poses_trained=0):
+        """Tạo đối tượng Employee mới (chưa add vào session) với mật khẩu ban đầu"""
+        new_employee = cls(
+            employee_id=employee_id,
+            full_name=data['full_name'],
+            department=data['department'],
+            position=data.get('position'),
+            phone=data.get('phone'),
+            email=data.get('email'),
+            face_training_completed=poses_trained >= 3,
+            total_poses_trained=poses_trained,
+            username=data.get('username') # Admin có thể cung cấp username riêng
+        )
+
+        # Logic đặt mật khẩu mặc định và cờ must_change_password
+        initial_password = data.get('initial_password')
+        if initial_password:
+            # Nếu Admin cung cấp mật khẩu ban đầu, sử dụng nó
+            new_employee.set_password(initial_password)
+            new_employee.must_change_password = False # Không cần đổi ngay nếu Admin đã đặt
+            if not new_employee.username: # Nếu Admin không đặt username, dùng employee_id
+                new_employee.username = employee_id
+        else:
+            # Nếu Admin không cung cấp, đặt mật khẩu mặc định là employee_id và buộc đổi
+            new_employee.set_password(employee_id) # Mật khẩu mặc định là employee_id
+            new_employee.must_change_password = True # Buộc đổi mật khẩu lần đầu
+            if not new_employee.username: # Nếu Admin không đặt username, dùng employee_id
+                new_employee.username = employee_id
+        return new_employee
+    
     def set_password(self, password):
         """Hash và lưu password cho nhân viên"""
         self.password_hash = hash_password(password)
@@ -152,6 +185,7 @@ class Employee(db.Model):
         self.face_training_completed = True
         self.face_training_date = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
         self.total_poses_trained = FaceTrainingData.get_employee_pose_count(self.employee_id)
+        FaceGalleryChange.record(self.employee_id)
         
         # Commit changes to database
         try:
@@ -175,11 +209,13 @@ class Employee(db.Model):
         if poses_count >= 5 and not self.face_training_completed:
             self.face_training_completed = True
             self.face_training_date = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+            FaceGalleryChange.record(self.employee_id)
             
         # Bỏ đánh dấu complete nếu không đủ pose
         elif poses_count < 5 and self.face_training_completed:
             self.face_training_completed = False
             self.face_training_date = None
+            FaceGalleryChange.record(self.employee_id)
             
         try:
             db.session.commit()
@@ -226,6 +262,7 @@ class Employee(db.Model):
                 print(f"Fixed: {emp.employee_id} pose count updated from {emp.total_poses_trained} to {poses_count}")
             
             if needs_update:
+                FaceGalleryChange.record(emp.employee_id)
                 fixed_count += 1
         
         try:
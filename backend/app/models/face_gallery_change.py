@@ -0,0 +1,69 @@
+# Nhật ký thay đổi dữ liệu khuôn mặt dùng để đồng bộ gallery giữa các worker
+from app.db import db
+from datetime import datetime, timedelta
+import pytz
+
+# Giá trị employee_id đặc biệt: yêu cầu các worker nạp lại toàn bộ gallery
+FULL_RELOAD = '*'
+
+
+def _now_vn():
+    return datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+
+
+class FaceGalleryChange(db.Model):
+    __tablename__ = 'face_gallery_changes'
+
+    # Đồng thời là generation của gallery. Id được cấp lúc INSERT chứ không phải lúc COMMIT: với nhiều
+    # writer đồng thời, một id nhỏ hơn có thể commit sau, nên worker đọc lại cả các thay đổi gần đây (replay_seconds)
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.String(8), nullable=False, index=True)  # Nhân viên bị thay đổi
+    pose_type = db.Column(db.String(20), nullable=True)  # None = toàn bộ pose của nhân viên
+    created_at = db.Column(db.DateTime, default=_now_vn, nullable=False, index=True)
+
+    @classmethod
+    def record(cls, employee_id, pose_type=None):
+        """Ghi nhận thay đổi vào session hiện tại (commit cùng với thay đổi dữ liệu)"""
+        change = cls(employee_id=employee_id, pose_type=pose_type)
+        db.session.add(change)
+        return change
+
+    @classmethod
+    def record_full_reload(cls):
+        """Ghi nhận thay đổi hàng loạt, buộc các worker nạp lại toàn bộ gallery"""
+        return cls.record(FULL_RELOAD)
+
+    @classmethod
+    def current_generation(cls):
+        """Trả về generation mới nhất (0 nếu chưa có thay đổi nào)"""
+        return db.session.query(db.func.max(cls.id)).scalar() or 0
+
+    @classmethod
+    def oldest_generation(cls):
+        """Id nhỏ nhất còn lưu (0 nếu bảng rỗng); các thay đổi cũ hơn đã bị prune"""
+        return db.session.query(db.func.min(cls.id)).scalar() or 0
+
+    @classmethod
+    def changes_since(cls, generation, replay_seconds=0):
+        """Các thay đổi có generation lớn hơn giá trị đã áp dụng, cộng các thay đổi tạo trong
+        `replay_seconds` giây gần nhất (có thể commit muộn với id nhỏ hơn); theo thứ tự id"""
+        condition = cls.id > generation
+        if replay_seconds:
+            condition = db.or_(condition, cls.created_at >= _now_vn() - timedelta(seconds=replay_seconds))
+        return cls.query.filter(condition).order_by(cls.id.asc()).all()
+
+    @classmethod
+    def prune(cls, up_to_generation, retention_hours):
+        """Xóa các thay đổi đã nằm trong snapshot (id < up_to_generation) và cũ hơn retention_hours.
+
+        Luôn giữ dòng của chính generation đó: bảng không bao giờ rỗng, nên current_generation()
+        không lùi về 0 và SQLite (không AUTOINCREMENT) không cấp lại các id cũ cho thay đổi mới.
+        Chạy trên kết nối riêng để không commit lẫn session của request. Trả về số dòng đã xóa.
+        """
+        cutoff = _now_vn() - timedelta(hours=retention_hours)
+        with db.engine.begin() as connection:
+            result = connection.execute(db.delete(cls).where(cls.id < up_to_generation, cls.created_at < cutoff))
+        return result.rowcount
+
+    def __repr__(self):
+        return f'<FaceGalleryChange #{self.id} {self.employee_id}:{self.pose_type}>'
@@ -4,10 +4,17 @@ from datetime import datetime  # Xử lý thời gian
 import uuid  # Tạo ID duy nhất cho training data
 import pytz  # Xử lý múi giờ
 import numpy as np  # Để validate face encoding
+from app.models.face_gallery_change import FaceGalleryChange  # Đồng bộ gallery nhận diện
 
 # Model lưu trữ dữ liệu training khuôn mặt cho từng nhân viên
 class FaceTrainingData(db.Model):
     __tablename__ = 'face_training_data'  
+
+    # Định dạng của face_encoding:
+    #   1 - embedding gốc của model (chuẩn bất kỳ)
+    #   2 - vector đơn vị (float32, chuẩn 1); chuẩn gốc nằm trong encoding_norm
+    ENCODING_VERSION_RAW = 1
+    ENCODING_VERSION = 2
     
     __table_args__ = (
         db.UniqueConstraint('employee_id', 'pose_type', name='unique_employee_pose'),
@@ -21,6 +28,8 @@ class FaceTrainingData(db.Model):
                             nullable=False, index=True)  # Khóa ngoại liên kết với bảng employees
     pose_type = db.Column(db.String(20), nullable=False)  # Loại pose (front, left, right, up, down)
     face_encoding = db.Column(db.LargeBinary, nullable=False)  # Mã hóa khuôn mặt dạng binary
+    encoding_norm = db.Column(db.Float)  # Chuẩn L2 của embedding gốc (trước khi chuẩn hóa), NULL với dữ liệu cũ
+    encoding_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Định dạng face_encoding
     image_quality_score = db.Column(db.Float)  # Điểm chất lượng ảnh (tùy chọn)
     created_at = db.Column(db.DateTime,
                            default=lambda: datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None),
@@ -61,9 +70,33 @@ class FaceTrainingData(db.Model):
         except Exception as e:
             raise ValueError(f"Invalid face encoding: {e}")
     
+    # NEW: Chuẩn hóa encoding một lần khi ghi, để lúc so khớp chỉ còn phép nhân vô hướng
+    @staticmethod
+    def normalize_face_encoding(face_encoding_bytes):
+        """Trả về (bytes của vector đơn vị float32, chuẩn L2 gốc)"""
+        vector = np.frombuffer(face_encoding_bytes, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not np.isfinite(norm) or norm == 0:
+            raise ValueError("Invalid face encoding: zero or non-finite norm")
+        return (vector / norm).tobytes(), float(norm)
+
+    def set_face_encoding(self, face_encoding, encoding_norm=None):
+        """Lưu encoding ở định dạng hiện tại (vector đơn vị + chuẩn gốc).
+
+        `encoding_norm` đã có nghĩa là `face_encoding` đã được chuẩn hóa (xem
+        generate_face_encoding_from_frame); nếu không, encoding được chuẩn hóa ở đây.
+        """
+        self.validate_face_encoding(face_encoding)
+        if encoding_norm is None:
+            face_encoding, encoding_norm = self.normalize_face_encoding(face_encoding)
+        self.face_encoding = face_encoding
+        self.encoding_norm = encoding_norm
+        self.encoding_version = self.ENCODING_VERSION
+
     # IMPROVED: Factory method với validation đầy đủ
     @classmethod
-    def create_training_data(cls, employee_id, pose_type, face_encoding, image_quality_score=None):
+    def create_training_data(cls, employee_id, pose_type, face_encoding, image_quality_score=None,
+                             encoding_norm=None):
         """Tạo bản ghi training mới với validation đầy đủ"""
         cls.validate_pose_type(pose_type)
         cls.validate_face_encoding(face_encoding)
@@ -72,12 +105,13 @@ class FaceTrainingData(db.Model):
         if image_quality_score is not None and (image_quality_score < 0 or image_quality_score > 100):
             raise ValueError("Image quality score must be between 0 and 100")
         
-        return cls(
+        training_data = cls(
             employee_id=employee_id,
             pose_type=pose_type,
-            face_encoding=face_encoding,
             image_quality_score=image_quality_score
         )
+        training_data.set_face_encoding(face_encoding, encoding_norm)
+        return training_data
     
     # IMPROVED: Lấy encodings với sắp xếp theo chất lượng
     @classmethod
@@ -119,12 +153,14 @@ class FaceTrainingData(db.Model):
     def clear_employee_training_data(cls, employee_id):
         """Xóa tất cả dữ liệu training của nhân viên (dùng khi retrain)"""
         deleted_count = cls.query.filter_by(employee_id=employee_id).delete()
+        FaceGalleryChange.record(employee_id)
         db.session.commit()
         return deleted_count
     
     # NEW: Replace encoding cho pose cụ thể
     @classmethod
-    def replace_employee_pose_encoding(cls, employee_id, pose_type, face_encoding, image_quality_score=None):
+    def replace_employee_pose_encoding(cls, employee_id, pose_type, face_encoding, image_quality_score=None,
+                                       encoding_norm=None):
         """Thay thế encoding cho pose cụ thể của nhân viên"""
         cls.validate_pose_type(pose_type)
         cls.validate_face_encoding(face_encoding)
@@ -137,10 +173,12 @@ class FaceTrainingData(db.Model):
             employee_id=employee_id,
             pose_type=pose_type,
             face_encoding=face_encoding,
-            image_quality_score=image_quality_score
+            image_quality_score=image_quality_score,
+            encoding_norm=encoding_norm
         )
         
         db.session.add(new_training_data)
+        FaceGalleryChange.record(employee_id, pose_type)
         db.session.commit()
         return new_training_data
     
@@ -57,12 +57,18 @@ class Settings(db.Model):
     enable_camera_quality_check = db.Column(db.Boolean, default=True)
     enable_device_registration = db.Column(db.Boolean, default=False)
     minimum_image_resolution = db.Column(db.String(50), default='720p')
+    detection_scale = db.Column(db.Float, default=0.5)  # Tỉ lệ thu nhỏ frame trước khi dò khuôn mặt (1.0 = giữ nguyên)
+    detection_max_side = db.Column(db.Integer, default=640)  # Cạnh dài tối đa của ảnh dò khuôn mặt (0 = không giới hạn)
     image_quality_threshold = db.Column(db.Float, default=0.7)
     
     # Face Recognition Settings
     confidence_threshold = db.Column(db.Float, default=0.75)
     enable_liveness_detection = db.Column(db.Boolean, default=True)
     enable_multiple_face_check = db.Column(db.Boolean, default=True)
+    gallery_search_backend = db.Column(db.String(20), default='exact')  # 'exact', 'ivf' (gallery lớn) hoặc 'centroid' (hai giai đoạn)
+    ivf_list_count = db.Column(db.Integer, default=64)  # Số bucket của chỉ mục IVF
+    ivf_probe_count = db.Column(db.Integer, default=8)  # Số bucket được quét cho mỗi truy vấn
+    centroid_shortlist = db.Column(db.Integer, default=10)  # Số nhân viên giữ lại sau bước so tâm (centroid)
 
     def to_dict(self):
         """Chuyển đổi đối tượng Settings thành dictionary để trả về cho frontend"""
@@ -114,12 +120,18 @@ class Settings(db.Model):
                 "cameraQualityCheck": self.enable_camera_quality_check,
                 "deviceRegistration": self.enable_device_registration,
                 "minResolution": self.minimum_image_resolution,
+                "detectionScale": self.detection_scale,
+                "detectionMaxSide": self.detection_max_side,
                 "imageQualityThreshold": self.image_quality_threshold,
                 "enableLivenessDetection": self.enable_liveness_detection,
                 "enableMultipleFaceCheck": self.enable_multiple_face_check
             },
             "faceSettings": {
                 "confidenceThreshold": self.confidence_threshold,
+                "searchBackend": self.gallery_search_backend,
+                "ivfLists": self.ivf_list_count,
+                "ivfProbes": self.ivf_probe_count,
+                "centroidShortlist": self.centroid_shortlist
             }
         }
 
@@ -224,6 +236,12 @@ class Settings(db.Model):
             self.enable_camera_quality_check = ds.get('cameraQualityCheck', self.enable_camera_quality_check)
             self.enable_device_registration = ds.get('deviceRegistration', self.enable_device_registration)
             self.minimum_image_resolution = ds.get('minResolution', self.minimum_image_resolution)
+            self.detection_scale = ds.get('detectionScale', self.detection_scale)
+            if self.detection_scale is not None and not (0.0 < self.detection_scale <= 1.0):
+                raise ValueError("Detection scale must be greater than 0.0 and at most 1.0")
+            self.detection_max_side = ds.get('detectionMaxSide', self.detection_max_side)
+            if self.detection_max_side is not None and self.detection_max_side != 0 and self.detection_max_side < 160:
+                raise ValueError("Detection max side must be 0 (no limit) or at least 160")
             self.image_quality_threshold = ds.get('imageQualityThreshold', self.image_quality_threshold)
             if self.image_quality_threshold is not None and not (0.0 <= self.image_quality_threshold <= 1.0):
                 raise ValueError("Image quality threshold must be between 0.0 and 1.0")
@@ -237,5 +255,17 @@ class Settings(db.Model):
             self.confidence_threshold = fs.get('confidenceThreshold', self.confidence_threshold)
             if self.confidence_threshold is not None and not (0.0 <= self.confidence_threshold <= 1.0):
                 raise ValueError("Confidence threshold must be between 0.0 and 1.0")
+            self.gallery_search_backend = fs.get('searchBackend', self.gallery_search_backend)
+            if self.gallery_search_backend not in ('exact', 'ivf', 'centroid'):
+                raise ValueError("Search backend must be 'exact', 'ivf' or 'centroid'")
+            self.ivf_list_count = fs.get('ivfLists', self.ivf_list_count)
+            if self.ivf_list_count is not None and self.ivf_list_count < 1:
+                raise ValueError("IVF list count must be at least 1")
+            self.ivf_probe_count = fs.get('ivfProbes', self.ivf_probe_count)
+            if self.ivf_probe_count is not None and not (1 <= self.ivf_probe_count <= self.ivf_list_count):
+                raise ValueError("IVF probe count must be between 1 and the IVF list count")
+            self.centroid_shortlist = fs.get('centroidShortlist', self.centroid_shortlist)
+            if self.centroid_shortlist is not None and self.centroid_shortlist < 1:
+                raise ValueError("Centroid shortlist must be at least 1")
 
         db.session.commit()
\ No newline at end of file
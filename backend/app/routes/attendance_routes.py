@@ -1,17 +1,51 @@
 # backend/app/routes/attendance_routes.py
 
+import json
+import time
+from urllib.parse import unquote
 from flask import Blueprint, request, jsonify
+from app.config import Config
+from app.db import sock
 from app.services.attendance_service import (
     recognize_face_logic,
+    recognize_image_bytes_logic,
     get_attendance_history_logic,
     get_today_attendance_logic,
     capture_face_training_logic
 )
+from app.services.image_ingest import read_stream_into
+from app.services.recognition_stream import RecognitionStream
 from app.utils.decorators import admin_required, employee_required
 
 # Khởi tạo Blueprint cho các route chấm công
 attendance_bp = Blueprint('attendance_bp', __name__)
 
+def _recognition_response(result, error, status):
+    """JSON response chung cho các endpoint nhận diện"""
+    if error:
+        # Đảm bảo error response có format chuẩn
+        if isinstance(error, dict):
+            return jsonify(error), status
+        else:
+            return jsonify({
+                'success': False,
+                'message': str(error),
+                'liveness_passed': False
+            }), status
+    
+    # Đảm bảo success response có format chuẩn
+    if isinstance(result, dict):
+        # Thêm success flag nếu chưa có
+        if 'success' not in result:
+            result['success'] = True
+        return jsonify(result), status
+    else:
+        return jsonify({
+            'success': True,
+            'message': str(result),
+            'liveness_passed': True
+        }), status
+
 @attendance_bp.route('/api/recognize', methods=['POST'])
 def recognize_face():
     """Nhận diện khuôn mặt và ghi nhận chấm công"""
@@ -57,29 +91,70 @@ def recognize_face():
             session_id
         )
         
-        if error:
-            # Đảm bảo error response có format chuẩn
-            if isinstance(error, dict):
-                return jsonify(error), status
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': str(error),
-                    'liveness_passed': False
-                }), status
-        
-        # Đảm bảo success response có format chuẩn
-        if isinstance(result, dict):
-            # Thêm success flag nếu chưa có
-            if 'success' not in result:
-                result['success'] = True
-            return jsonify(result), status
-        else:
+        return _recognition_response(result, error, status)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}',
+            'liveness_passed': False
+        }), 500
+
+# Ảnh gửi thẳng dưới dạng body nhị phân (không base64): metadata nằm trong header
+BINARY_IMAGE_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png')
+
+@attendance_bp.route('/api/recognize/binary', methods=['POST'])
+def recognize_face_binary():
+    """Nhận diện từ body ảnh nhị phân; X-Session-Id, X-Location, X-Device-Info trong header"""
+    try:
+        if request.mimetype not in BINARY_IMAGE_TYPES:
             return jsonify({
-                'success': True,
-                'message': str(result),
-                'liveness_passed': True
-            }), status
+                'success': False,
+                'message': f'Unsupported Content-Type, use one of {", ".join(BINARY_IMAGE_TYPES)}',
+                'liveness_passed': False
+            }), 415
+
+        length = request.content_length
+        if not length:
+            return jsonify({
+                'success': False,
+                'message': 'Content-Length is required',
+                'liveness_passed': False
+            }), 411
+        if length > Config.IMAGE_INGEST_MAX_BYTES:
+            return jsonify({
+                'success': False,
+                'message': f'Image too large ({length} bytes, max {Config.IMAGE_INGEST_MAX_BYTES})',
+                'liveness_passed': False
+            }), 413
+
+        session_id = request.headers.get('X-Session-Id')
+        if not session_id:
+            return jsonify({
+                'success': False,
+                'message': 'Session ID is required',
+                'liveness_passed': False
+            }), 400
+
+        try:
+            raw_bytes = read_stream_into(request.stream, length)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'liveness_passed': False
+            }), 400
+
+        # Header chỉ chứa được ASCII: client gửi location/device info dạng encodeURIComponent
+        location = request.headers.get('X-Location')
+        device_info = request.headers.get('X-Device-Info')
+        result, error, status = recognize_image_bytes_logic(
+            raw_bytes,
+            unquote(location) if location else None,
+            unquote(device_info) if device_info else None,
+            session_id
+        )
+        return _recognition_response(result, error, status)
 
     except Exception as e:
         return jsonify({
@@ -88,6 +163,60 @@ def recognize_face():
             'liveness_passed': False
         }), 500
 
+@sock.route('/api/recognize/stream', bp=attendance_bp)
+def recognize_face_stream(ws):
+    """Phiên nhận diện qua WebSocket cho kiosk.
+
+    Client gửi {"type": "start", "session_id", "location", "device_info"} rồi đẩy
+    liên tục các frame JPEG dạng binary message. Server trả "ready", các sự kiện
+    "progress" khi trạng thái liveness thay đổi, và một "result" cuối cùng
+    (cùng nội dung với /api/recognize) trước khi đóng kết nối.
+    """
+    try:
+        start = json.loads(ws.receive(timeout=10) or '{}')
+    except (TypeError, ValueError):
+        start = {}
+    if start.get('type') != 'start':
+        ws.send(json.dumps({'type': 'error', 'message': 'Expected a start message'}))
+        return
+
+    stream = RecognitionStream(start.get('session_id'), start.get('location'), start.get('device_info'))
+    ws.send(json.dumps({'type': 'ready', 'session_id': stream.session_id}))
+    deadline = time.monotonic() + Config.RECOGNITION_STREAM_MAX_SECONDS
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            message = ws.receive(timeout=remaining) if remaining > 0 else None
+            if message is None:
+                ws.send(json.dumps({
+                    'type': 'result',
+                    'success': False,
+                    'message': 'Recognition session timed out',
+                    'liveness_passed': False,
+                    'session_id': stream.session_id
+                }))
+                break
+            # Server chậm hơn tốc độ gửi: bỏ các frame cũ đang chờ, chỉ xử lý frame mới nhất
+            stop = False
+            while True:
+                newer = ws.receive(timeout=0)
+                if newer is None:
+                    break
+                if isinstance(newer, bytes):
+                    message = newer
+                else:
+                    stop = True
+            if stop or isinstance(message, str):
+                break
+
+            events, done = stream.process_frame(message)
+            for event in events:
+                ws.send(json.dumps(event))
+            if done:
+                break
+    finally:
+        stream.close()
+
 @attendance_bp.route('/api/attendance/<string:employee_id>', methods=['GET'])
 def get_attendance_history(employee_id):
     """Lấy lịch sử chấm công của nhân viên"""
@@ -4,6 +4,7 @@ from flask import Blueprint, request, jsonify
 from app.services.employee_service import (
     serve_uploaded_image_logic,
     add_employee_logic,
+    bulk_enroll_logic,
     get_employees_logic,
     get_employee_detail_logic,
     update_employee_logic,
@@ -36,6 +37,15 @@ def add_employee():
         return jsonify(error), status
     return jsonify(result), status
 
+@employee_bp.route('/api/employees/bulk-enroll', methods=['POST'])
+@admin_required # CHỈ ADMIN MỚI ĐƯỢC ĐĂNG KÝ HÀNG LOẠT
+def bulk_enroll_employees():
+    """Đăng ký khuôn mặt hàng loạt từ file ZIP các ảnh EMPID_pose.jpg"""
+    result, error, status = bulk_enroll_logic(request.files.get('archive'))
+    if error:
+        return jsonify(error), status
+    return jsonify(result), status
+
 @employee_bp.route('/api/employees', methods=['GET'])
 @admin_required # CHỈ ADMIN MỚI ĐƯỢC XEM DANH SÁCH NHÂN VIÊN
 def get_employees():
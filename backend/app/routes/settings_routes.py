@@ -2,9 +2,11 @@ from flask import Blueprint, request, jsonify
 from app.models.settings import Settings
 from app.models.attendance import Attendance
 from app.models.face_training_data import FaceTrainingData
+from app.models.face_gallery_change import FaceGalleryChange
 from app.models.employee import Employee
 from app.models.admin import Admin
 from app.utils.decorators import admin_required
+from app.services.face_gallery import face_gallery
 from app import db
 from datetime import datetime, timedelta
 import os
@@ -100,8 +102,10 @@ def reset_system():
         db.session.query(Attendance).delete()
         db.session.query(FaceTrainingData).delete()
         db.session.query(Employee).update({Employee.face_training_status: 'pending'})
+        FaceGalleryChange.record_full_reload()
 
         db.session.commit()
+        face_gallery.notify_changed()
         
         return jsonify({"message": "System reset successfully to default settings and data cleared."}), 200
     except Exception as e:
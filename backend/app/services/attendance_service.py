@@ -2,17 +2,17 @@
 
 from datetime import datetime, timedelta, time
 import pytz
-import cv2
-import numpy as np
-from PIL import Image
-from io import BytesIO
 import base64
 import os
 from app import db
-from app.services.facial_service import FacialRecognitionService
+from app.services.facial_service import FacialRecognitionService, FrameAnalysis
+from app.services.face_gallery import face_gallery
+from app.services.image_ingest import decode_frame, read_request_bytes
+from app.services.image_writer import save_frame
 from app.models.attendance import Attendance
 from app.models.employee import Employee
 from app.models.face_training_data import FaceTrainingData
+from app.models.face_gallery_change import FaceGalleryChange
 from app.models.settings import Settings
 from app.utils.helpers import get_vn_datetime, format_datetime_vn, format_time_vn, get_upload_path
 
@@ -26,6 +26,19 @@ def recognize_face_logic(image_file, base64_image, location, device_info, sessio
             "liveness_passed": False
         }, 400
 
+    try:
+        raw_bytes = read_request_bytes(image_file, base64_image)
+    except Exception as e:
+        return None, {
+            "success": False,
+            "message": f"Invalid image input: {str(e)}",
+            "liveness_passed": False
+        }, 400
+
+    return recognize_image_bytes_logic(raw_bytes, location, device_info, session_id)
+
+def recognize_image_bytes_logic(raw_bytes, location, device_info, session_id: str):
+    """Nhận diện + chấm công từ bytes ảnh đã đọc sẵn (JPEG/PNG; bytes hoặc mảng uint8)"""
     # Kiểm tra session_id
     if not session_id:
         return None, {
@@ -34,21 +47,10 @@ def recognize_face_logic(image_file, base64_image, location, device_info, sessio
             "liveness_passed": False
         }, 400
 
-    # Lấy settings hiện tại
-    settings = Settings.get_current_settings()
-
-    # Đọc & chuẩn hóa ảnh
+    # Giải mã ảnh một lần, ở độ phân giải đích (IMAGE_INGEST_TARGET_SIDE)
     try:
-        if base64_image:
-            if base64_image.startswith('data:'):
-                base64_image = base64_image.split(',', 1)[1]
-            raw_bytes = base64.b64decode(base64_image)
-        else:
-            raw_bytes = image_file.read()
-
-        nparr = np.frombuffer(raw_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if image is None:
+        frame = decode_frame(raw_bytes)
+        if frame is None:
             return None, {
                 "success": False,
                 "message": "Cannot decode image",
@@ -61,8 +63,20 @@ def recognize_face_logic(image_file, base64_image, location, device_info, sessio
             "liveness_passed": False
         }, 400
 
+    # Lấy settings hiện tại
+    settings = Settings.get_current_settings()
+    face_gallery.configure_from_settings(settings)
+    FacialRecognitionService.configure_from_settings(settings)
+
+    # Session đã có kết quả và khung hình vẫn nhận diện ra đúng nhân viên đó: trả lại kết quả cũ, không chấm công lại.
+    # Lượt detection/embedding của khung hình được dùng lại bởi pipeline đầy đủ nếu không trúng cache
+    analysis = FrameAnalysis(frame)
+    cached = FacialRecognitionService.cached_result(frame, session_id, analysis)
+    if cached is not None:
+        return cached
+
     # Nhận diện khuôn mặt WITH LIVENESS
-    success, message, employee = FacialRecognitionService.recognize_face_with_liveness(image, session_id)
+    success, message, employee = FacialRecognitionService.recognize_face_with_liveness(frame, session_id, analysis)
     
     # CRITICAL: Kiểm tra liveness trước
     if not success:
@@ -86,6 +100,12 @@ def recognize_face_logic(image_file, base64_image, location, device_info, sessio
             "session_id": session_id
         }, 200
 
+    result, error, status = record_attendance_logic(employee, settings, session_id)
+    FacialRecognitionService.cache_result(session_id, employee.employee_id, result, error, status)
+    return result, error, status
+
+def record_attendance_logic(employee, settings, session_id: str):
+    """Ghi check-in/check-out cho nhân viên đã nhận diện (dùng chung cho HTTP và WebSocket)"""
     employee_id = employee.employee_id
     full_name = employee.full_name
     department = employee.department
@@ -383,30 +403,14 @@ def capture_face_training_logic(image_file, base64_image, employee_id, pose_type
             "message": "Employee not found"
         }, 404
 
-    # Đọc & chuẩn hóa ảnh
+    # Đọc & giải mã ảnh một lần (ảnh training giữ độ phân giải gốc)
     try:
-        if base64_image:
-            if base64_image.startswith('data:'):
-                base64_image = base64_image.split(',', 1)[1]
-            raw_bytes = base64.b64decode(base64_image)
-        else:
-            raw_bytes = image_file.read()
-
-        nparr = np.frombuffer(raw_bytes, np.uint8)
-        img_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img_cv is None:
+        frame = decode_frame(read_request_bytes(image_file, base64_image), target_side=0)
+        if frame is None:
             return None, {
                 "success": False,
                 "message": "Cannot decode image"
             }, 400
-
-        ok, buf = cv2.imencode(".jpg", img_cv, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
-        if not ok:
-            return None, {
-                "success": False,
-                "message": "Failed to encode image"
-            }, 400
-        image_data = BytesIO(buf.tobytes())
     except (base64.binascii.Error, ValueError) as e:
         return None, {
             "success": False,
@@ -415,8 +419,8 @@ def capture_face_training_logic(image_file, base64_image, employee_id, pose_type
 
     # Sinh face-encoding & metadata với employee_id
     success, message, encoding, metadata = (
-        FacialRecognitionService.generate_face_encoding_with_metadata(
-            image_data, 
+        FacialRecognitionService.generate_face_encoding_from_frame(
+            frame,
             pose_type=pose_type,
             employee_id=employee_id.upper()
         )
@@ -427,14 +431,12 @@ def capture_face_training_logic(image_file, base64_image, employee_id, pose_type
             "message": message
         }, 400
 
-    # Lưu ảnh gốc
+    # Lưu ảnh gốc (luồng nền, không chờ ghi đĩa)
     try:
-        image_data.seek(0)
-        img_pil = Image.open(image_data).convert("RGB")
         save_dir = get_upload_path()
         os.makedirs(save_dir, exist_ok=True)
         save_path = os.path.join(save_dir, f"{employee_id}_{metadata['pose_type']}.jpg")
-        img_pil.save(save_path, quality=90)
+        save_frame(frame, save_path)
     except Exception as e:
         return None, {
             "success": False,
@@ -449,7 +451,7 @@ def capture_face_training_logic(image_file, base64_image, employee_id, pose_type
         ).first()
         
         if existing_training:
-            existing_training.face_encoding = encoding
+            existing_training.set_face_encoding(encoding, metadata['encoding_norm'])
             existing_training.image_quality_score = metadata['image_quality_score']
             existing_training.created_at = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
             print(f"Cập nhật pose {metadata['pose_type']} cho {employee_id}")
@@ -458,13 +460,16 @@ def capture_face_training_logic(image_file, base64_image, employee_id, pose_type
                 employee_id=employee_id.upper(),
                 pose_type=metadata['pose_type'],
                 face_encoding=encoding,
-                image_quality_score=metadata['image_quality_score']
+                image_quality_score=metadata['image_quality_score'],
+                encoding_norm=metadata['encoding_norm']
             )
             db.session.add(training_data)
             print(f"Tạo pose mới {metadata['pose_type']} cho {employee_id}")
         
+        FaceGalleryChange.record(employee_id.upper(), metadata['pose_type'])
         db.session.commit()
         updated_progress = employee.get_face_training_progress()
+        face_gallery.notify_changed()
         
         print(f"Progress của {employee_id}: {updated_progress['poses_completed']}/{updated_progress['poses_required']} - Completed: {employee.face_training_completed}")
         
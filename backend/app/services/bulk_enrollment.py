@@ -0,0 +1,343 @@
+import csv
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pytz
+
+from app import db
+from app.config import Config
+from app.models.employee import Employee
+from app.models.face_gallery_change import FaceGalleryChange
+from app.models.face_training_data import FaceTrainingData
+from app.services.face_gallery import face_gallery
+
+# --------------------------------------------------
+# Bulk face enrollment from a directory or ZIP of EMPID_pose.jpg files
+# --------------------------------------------------
+# Used by POST /api/employees/bulk-enroll and scripts/bulk_enroll.py.
+# Files are split into batches of BULK_ENROLL_BATCH_SIZE and processed by
+# BULK_ENROLL_WORKERS processes, each loading the models once. A worker reads
+# and decodes every image once, runs detection per image, then runs the
+# recognition model once for the whole batch. The original file is staged
+# under a temporary name next to its training image. The calling process
+# writes FaceTrainingData rows in one transaction per BULK_ENROLL_CHUNK_SIZE
+# rows (replacing existing poses), records one FaceGalleryChange per employee
+# like add_employee_logic, and only then renames the staged images over the
+# training images; a rolled-back chunk leaves the previous images in place.
+#
+# An optional `employees.csv` (employee_id, full_name, department[, position,
+# phone, email, username, initial_password]) creates missing employees first;
+# images of other unknown employees are reported as errors.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MANIFEST_NAME = 'employees.csv'
+MIN_POSES_FOR_COMPLETION = 3  # như add_employee_logic
+
+_worker_analyzer = None
+
+
+def _init_worker(intra_op_threads):
+    global _worker_analyzer
+    from app.services.face_models import create_face_analyzer
+    # Nhiều tiến trình cùng chạy: chia số luồng ONNX Runtime thay vì để mỗi tiến trình dùng mọi core
+    if not Config.FACE_ORT_INTRA_OP_THREADS:
+        Config.FACE_ORT_INTRA_OP_THREADS = intra_op_threads
+    _worker_analyzer = create_face_analyzer()
+
+
+def _read_source(source, archives):
+    """Bytes of a file path or of a (zip_path, member) pair; ZIP files stay open for the batch"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    zip_path, member = source
+    if zip_path not in archives:
+        archives[zip_path] = zipfile.ZipFile(zip_path)
+    return archives[zip_path].read(member)
+
+
+def process_batch(items, upload_dir, analyzer=None):
+    """Encode one batch of (name, employee_id, pose_type, source) images.
+
+    Returns (name, employee_id, pose_type, error, raw_embedding_bytes, quality,
+    staged_image) per item; `error` is None on success and `staged_image` is the
+    (temporary_path, training_image_path) pair for _commit_rows to finalize.
+    """
+    from app.services.face_models import align_face_crop, detect_faces, embed_aligned_crops
+    from app.services.facial_service import FacialRecognitionService
+    from app.services.image_ingest import decode_frame
+    analyzer = analyzer or _worker_analyzer
+
+    results, accepted, archives = [], [], {}
+    try:
+        for name, employee_id, pose_type, source in items:
+            try:
+                frame = decode_frame(_read_source(source, archives), target_side=0)
+            except (OSError, KeyError, zipfile.BadZipFile) as e:
+                results.append((name, employee_id, pose_type, f"Cannot read file: {e}", None, None, None))
+                continue
+            if frame is None:
+                results.append((name, employee_id, pose_type, "Invalid image", None, None, None))
+                continue
+            # Cùng điều kiện với generate_face_encoding_from_frame
+            if frame.gray.mean() < 50:
+                results.append((name, employee_id, pose_type, "Insufficient lighting", None, None, None))
+                continue
+            faces = detect_faces(analyzer, frame.bgr)
+            if len(faces) != 1:
+                results.append((name, employee_id, pose_type, "Please ensure exactly one face is visible",
+                                None, None, None))
+                continue
+            quality = FacialRecognitionService.calculate_image_quality(frame.bgr, gray=frame.gray)
+            accepted.append((name, employee_id, pose_type, frame, align_face_crop(frame.bgr, faces[0].kps), quality))
+    finally:
+        for archive in archives.values():
+            archive.close()
+
+    if accepted:
+        embeddings = embed_aligned_crops(analyzer, [item[4] for item in accepted], normalize=False)
+        for (name, employee_id, pose_type, frame, _, quality), embedding in zip(accepted, embeddings):
+            path = os.path.join(upload_dir, f"{employee_id}_{pose_type}.jpg")
+            staged = f"{path}.{os.getpid()}.tmp"
+            try:
+                frame.save_jpeg(staged)
+            except OSError as e:
+                _discard(staged)
+                results.append((name, employee_id, pose_type, f"Cannot save image: {e}", None, None, None))
+                continue
+            results.append((name, employee_id, pose_type, None, embedding.tobytes(), float(quality), (staged, path)))
+    return results
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# --------------------------------------------------
+# Calling-process side
+# --------------------------------------------------
+def scan_source(path):
+    """(images [(name, employee_id, pose_type, source)], manifest rows, errors [(name, message)])"""
+    entries, manifest_text = [], None
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                full_path = os.path.join(root, filename)
+                name = os.path.relpath(full_path, path)
+                if filename.lower() == MANIFEST_NAME:
+                    with open(full_path, encoding='utf-8-sig') as f:
+                        manifest_text = f.read()
+                else:
+                    entries.append((name, full_path))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                filename = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith('__MACOSX/') or filename.startswith('.'):
+                    continue
+                if filename.lower() == MANIFEST_NAME:
+                    manifest_text = archive.read(info).decode('utf-8-sig')
+                else:
+                    entries.append((info.filename, (path, info.filename)))
+    else:
+        raise ValueError("Source must be a directory or a ZIP file")
+
+    images, errors, seen = [], [], set()
+    for name, source in entries:
+        stem, extension = os.path.splitext(os.path.basename(name))
+        if extension.lower() not in IMAGE_EXTENSIONS:
+            continue
+        if '_' not in stem:
+            errors.append((name, "File name must be EMPLOYEEID_pose"))
+            continue
+        employee_id, pose_type = stem.rsplit('_', 1)
+        employee_id, pose_type = employee_id.upper(), pose_type.lower()
+        try:
+            FaceTrainingData.validate_pose_type(pose_type)
+        except ValueError as e:
+            errors.append((name, str(e)))
+            continue
+        if (employee_id, pose_type) in seen:
+            errors.append((name, f"Duplicate image for {employee_id} {pose_type}"))
+        else:
+            seen.add((employee_id, pose_type))
+            images.append((name, employee_id, pose_type, source))
+
+    manifest = list(csv.DictReader(io.StringIO(manifest_text))) if manifest_text else []
+    return images, manifest, errors
+
+
+def _create_employees(manifest, errors):
+    """Create the manifest employees that do not exist yet (one transaction); returns how many"""
+    new_employees = []
+    existing = {e for (e,) in db.session.query(Employee.employee_id).filter(
+        Employee.employee_id.in_([(row.get('employee_id') or '').strip().upper() for row in manifest]))}
+    for line, row in enumerate(manifest, start=2):
+        data = {key: (value or '').strip() for key, value in row.items() if key}
+        employee_id = data.get('employee_id', '').upper()
+        if employee_id in existing:
+            continue
+        missing = [field for field in ('employee_id', 'full_name', 'department') if not data.get(field)]
+        try:
+            if missing:
+                raise ValueError(f"Missing required field {missing[0]}")
+            Employee.validate_email(data.get('email'))
+            Employee.validate_phone(data.get('phone'))
+        except ValueError as e:
+            errors.append((f"{MANIFEST_NAME}:{line}", str(e)))
+            continue
+        data = {key: value or None for key, value in data.items()}
+        new_employees.append(Employee.create_employee(employee_id, data))
+        existing.add(employee_id)
+    if not new_employees:
+        return 0
+    try:
+        db.session.add_all(new_employees)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        errors.extend((f"{MANIFEST_NAME}:{employee.employee_id}", f"Database error: {e}") for employee in new_employees)
+        return 0
+    return len(new_employees)
+
+
+def _commit_rows(rows, errors):
+    """Insert one chunk of encoded images in one transaction; returns (rows written, employees completed).
+
+    The staged images replace the training images only once the transaction
+    has committed; images of rejected or rolled-back rows are discarded.
+    """
+    records = []
+    for name, employee_id, pose_type, _, embedding, quality, staged_image in rows:
+        try:
+            records.append((name, FaceTrainingData.create_training_data(employee_id, pose_type, embedding, quality),
+                            staged_image))
+        except ValueError as e:
+            _discard(staged_image[0])
+            errors.append((name, str(e)))
+    if not records:
+        return 0, 0
+
+    poses = {}
+    for _, record, _ in records:
+        poses.setdefault(record.employee_id, []).append(record.pose_type)
+    completed = 0
+    try:
+        for employee_id, employee_poses in poses.items():
+            FaceTrainingData.query.filter(FaceTrainingData.employee_id == employee_id,
+                                          FaceTrainingData.pose_type.in_(employee_poses)
+                                          ).delete(synchronize_session=False)
+        db.session.add_all([record for _, record, _ in records])
+        db.session.flush()
+        counts = dict(db.session.query(FaceTrainingData.employee_id, db.func.count(FaceTrainingData.id))
+                      .filter(FaceTrainingData.employee_id.in_(list(poses)))
+                      .group_by(FaceTrainingData.employee_id).all())
+        now = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+        for employee in Employee.query.filter(Employee.employee_id.in_(list(poses))):
+            employee.total_poses_trained = counts.get(employee.employee_id, 0)
+            if employee.total_poses_trained >= MIN_POSES_FOR_COMPLETION and not employee.face_training_completed:
+                employee.face_training_completed = True
+                employee.face_training_date = now
+                completed += 1
+            FaceGalleryChange.record(employee.employee_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for name, _, (staged, _) in records:
+            _discard(staged)
+            errors.append((name, f"Database error: {e}"))
+        return 0, 0
+    for _, _, (staged, path) in records:
+        try:
+            os.replace(staged, path)
+        except OSError as e:
+            _discard(staged)
+            print(f"Không lưu được ảnh {path}: {e}")
+    return len(records), completed
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_enroll(path, upload_dir, workers=None, batch_size=None, chunk_size=None, progress=None):
+    """Enroll every EMPID_pose image of a directory or ZIP file; returns a report dict.
+
+    `progress(done, total)` is called after each committed chunk.
+    """
+    workers = Config.BULK_ENROLL_WORKERS if workers is None else workers
+    batch_size = batch_size or Config.BULK_ENROLL_BATCH_SIZE
+    chunk_size = chunk_size or Config.BULK_ENROLL_CHUNK_SIZE
+    started = time.perf_counter()
+
+    images, manifest, errors = scan_source(path)
+    files = len(images) + len(errors)
+    employees_created = _create_employees(manifest, errors) if manifest else 0
+    known = {e for (e,) in db.session.query(Employee.employee_id).filter(
+        Employee.employee_id.in_(list({image[1] for image in images})))}
+    for name, employee_id, _, _ in images:
+        if employee_id not in known:
+            errors.append((name, f"Unknown employee {employee_id}"))
+    images = [image for image in images if image[1] in known]
+    os.makedirs(upload_dir, exist_ok=True)
+
+    enrolled, completed, done, pending = 0, 0, 0, []
+
+    def _flush():
+        nonlocal enrolled, completed, pending
+        written, newly_completed = _commit_rows(pending, errors)
+        enrolled += written
+        completed += newly_completed
+        pending = []
+        if progress:
+            progress(done, len(images))
+
+    def _collect(results):
+        nonlocal done
+        for result in results:
+            done += 1
+            if result[3] is not None:
+                errors.append((result[0], result[3]))
+            else:
+                pending.append(result)
+        if len(pending) >= chunk_size:
+            _flush()
+
+    batches = list(_batches(images, batch_size))
+    if workers > 0 and len(batches) > 1:
+        processes = min(workers, len(batches))
+        intra_op_threads = max(1, (os.cpu_count() or 1) // processes)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(intra_op_threads,)) as executor:
+            for results in executor.map(process_batch, batches, [upload_dir] * len(batches)):
+                _collect(results)
+    else:
+        from app.services.face_models import get_face_analyzer
+        analyzer = get_face_analyzer() if batches else None
+        for batch in batches:
+            _collect(process_batch(batch, upload_dir, analyzer))
+    if pending:
+        _flush()
+    if enrolled:
+        face_gallery.notify_changed()
+
+    seconds = time.perf_counter() - started
+    return {
+        "files": files,
+        "enrolled": enrolled,
+        "failed": files - enrolled,
+        "employees_created": employees_created,
+        "employees_completed": completed,
+        "seconds": round(seconds, 3),
+        "images_per_second": round(done / seconds, 2) if seconds > 0 else 0.0,
+        "errors": [{"file": name, "error": message} for name, message in errors],
+    }
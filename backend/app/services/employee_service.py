@@ -4,13 +4,18 @@
 from flask import send_from_directory
 from app.models.employee import Employee
 from app.models.face_training_data import FaceTrainingData
+from app.models.face_gallery_change import FaceGalleryChange
 from app.services.facial_service import FacialRecognitionService
+from app.services.face_gallery import face_gallery
+from app.services.image_ingest import decode_frame
+from app.services.image_writer import save_frame
+from app.services.bulk_enrollment import bulk_enroll
 from app.utils.helpers import get_upload_path, serialize_employee_full, format_datetime_vn
 from app import db
 from sqlalchemy.exc import IntegrityError
-from PIL import Image
-from io import BytesIO
 import os
+import tempfile
+import zipfile
 import pytz
 from datetime import datetime
 from typing import Optional, Tuple
@@ -52,61 +57,40 @@ def add_employee_logic(data, image_files):
     try:
         for i, image_file in enumerate(image_files):
             pose_type = required_poses[i % len(required_poses)] if i < len(required_poses) else 'front'
-            success, message, encoding, metadata = FacialRecognitionService.generate_face_encoding_with_metadata(image_file, pose_type)
+            # Giải mã một lần, dùng chung cho encoding và ảnh lưu trữ
+            frame = decode_frame(image_file.read(), target_side=0)
+            if frame is None:
+                return None, {"error": "Invalid image"}, 400
+            success, message, encoding, metadata = FacialRecognitionService.generate_face_encoding_from_frame(frame, pose_type)
             if not success:
                 return None, {"error": message}, 400
-            face_encodings.append((encoding, metadata['pose_type'], metadata['image_quality_score']))
-            image_file.stream.seek(0)
-            image = Image.open(BytesIO(image_file.read())).convert("RGB")
+            face_encodings.append((encoding, metadata['pose_type'], metadata['image_quality_score'], metadata['encoding_norm']))
             save_path = os.path.join(save_dir, f"{employee_id}_{pose_type}.jpg")
-            image.save(save_path)
+            save_frame(frame, save_path)
             pose_types.append(metadata['pose_type'])
     except Exception as e:
         return None, {"error": f"Failed to process images: {str(e)}"}, 500
 
-    new_employee = Employee(
-        employee_id=employee_id,
-        full_name=data['full_name'],
-        department=data['department'],
-        position=data.get('position'),
-        phone=data.get('phone'),
-        email=data.get('email'),
-        face_training_completed=len(pose_types) >= 3,
-        total_poses_trained=len(pose_types),
-        username=data.get('username') # Admin có thể cung cấp username riêng
-    )
-    
-    # Logic đặt mật khẩu mặc định và cờ must_change_password
-    initial_password = data.get('initial_password')
-    if initial_password:
-        # Nếu Admin cung cấp mật khẩu ban đầu, sử dụng nó
-        new_employee.set_password(initial_password)
-        new_employee.must_change_password = False # Không cần đổi ngay nếu Admin đã đặt
-        if not new_employee.username: # Nếu Admin không đặt username, dùng employee_id
-            new_employee.username = employee_id
-    else:
-        # Nếu Admin không cung cấp, đặt mật khẩu mặc định là employee_id và buộc đổi
-        new_employee.set_password(employee_id) # Mật khẩu mặc định là employee_id
-        new_employee.must_change_password = True # Buộc đổi mật khẩu lần đầu
-        if not new_employee.username: # Nếu Admin không đặt username, dùng employee_id
-            new_employee.username = employee_id
-
+    new_employee = Employee.create_employee(employee_id, data, len(pose_types))
 
     try:
         db.session.add(new_employee)
         db.session.commit() # Commit để có new_employee.id cho FaceTrainingData
 
-        for encoding, pose_type, quality_score in face_encodings:
+        for encoding, pose_type, quality_score, encoding_norm in face_encodings:
             training_data = FaceTrainingData.create_training_data(
                 employee_id=employee_id,
                 pose_type=pose_type,
                 face_encoding=encoding,
-                image_quality_score=quality_score
+                image_quality_score=quality_score,
+                encoding_norm=encoding_norm
             )
             db.session.add(training_data)
         if len(pose_types) >= 3:
             new_employee.complete_face_training()
+        FaceGalleryChange.record(employee_id)
         db.session.commit()
+        face_gallery.notify_changed()
     except IntegrityError:
         db.session.rollback()
         return None, {"error": "Database error – possibly duplicate or constraint violation"}, 500
@@ -120,6 +104,29 @@ def add_employee_logic(data, image_files):
         "poses_trained": pose_types
     }, None, 201
 
+# NEW: Đăng ký khuôn mặt hàng loạt từ file ZIP (ảnh EMPID_pose.jpg, tùy chọn employees.csv)
+def bulk_enroll_logic(archive_file):
+    """Logic đăng ký hàng loạt; trả về báo cáo của bulk_enroll"""
+    if not archive_file or not archive_file.filename:
+        return None, {"error": "Missing archive file"}, 400
+    if not archive_file.filename.lower().endswith('.zip'):
+        return None, {"error": "Archive must be a ZIP file"}, 400
+
+    # Worker đọc trực tiếp từ file ZIP nên cần lưu ra đĩa trước
+    tmp = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
+    try:
+        with tmp:
+            archive_file.save(tmp)
+        if not zipfile.is_zipfile(tmp.name):
+            return None, {"error": "Archive must be a ZIP file"}, 400
+        report = bulk_enroll(tmp.name, get_upload_path())
+    except Exception as e:
+        db.session.rollback()
+        return None, {"error": f"Bulk enrollment failed: {str(e)}"}, 500
+    finally:
+        os.remove(tmp.name)
+    return report, None, 200
+
 def get_employees_logic(status_param=None, page=1, limit=10, search='', sort_by='created_at', sort_order='desc'):
     """Logic lấy danh sách nhân viên với pagination và search"""
     query = Employee.query
@@ -208,24 +215,27 @@ def update_employee_logic(employee_id, data, image_files):
         try:
             for i, image_file in enumerate(image_files):
                 pose_type = required_poses[i % len(required_poses)] if i < len(required_poses) else 'front'
-                success, message, encoding, metadata = FacialRecognitionService.generate_face_encoding_with_metadata(image_file, pose_type)
+                # Giải mã một lần, dùng chung cho encoding và ảnh lưu trữ
+                frame = decode_frame(image_file.read(), target_side=0)
+                if frame is None:
+                    return None, {"error": "Invalid image"}, 400
+                success, message, encoding, metadata = FacialRecognitionService.generate_face_encoding_from_frame(frame, pose_type)
                 if not success:
                     return None, {"error": message}, 400
-                face_encodings.append((encoding, metadata['pose_type'], metadata['image_quality_score']))
-                image_file.stream.seek(0)
-                image = Image.open(BytesIO(image_file.read())).convert("RGB")
+                face_encodings.append((encoding, metadata['pose_type'], metadata['image_quality_score'], metadata['encoding_norm']))
                 save_path = os.path.join(save_dir, f"{employee_id}_{pose_type}.jpg")
-                image.save(save_path)
+                save_frame(frame, save_path)
                 pose_types.append(metadata['pose_type'])
         except Exception as e:
             return None, {"error": f"Failed to process images: {str(e)}"}, 500
         FaceTrainingData.query.filter_by(employee_id=employee_id).delete()
-        for encoding, pose_type, quality_score in face_encodings:
+        for encoding, pose_type, quality_score, encoding_norm in face_encodings:
             training_data = FaceTrainingData.create_training_data(
                 employee_id=employee_id,
                 pose_type=pose_type,
                 face_encoding=encoding,
-                image_quality_score=quality_score
+                image_quality_score=quality_score,
+                encoding_norm=encoding_norm
             )
             db.session.add(training_data)
         employee.face_training_completed = len(pose_types) >= 3
@@ -234,7 +244,9 @@ def update_employee_logic(employee_id, data, image_files):
             employee.complete_face_training()
 
     employee.updated_at = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    FaceGalleryChange.record(employee.employee_id)
     db.session.commit()
+    face_gallery.notify_changed()
     return {
         "message": "Employee updated successfully",
         "employee": serialize_employee_full(employee),
@@ -250,7 +262,9 @@ def soft_delete_employee_logic(employee_id):
         return {"message": "Employee is already inactive", "employee": serialize_employee_full(employee)}, None, 200
     employee.status = False
     employee.updated_at = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    FaceGalleryChange.record(employee.employee_id)
     db.session.commit()
+    face_gallery.notify_changed()
     return {
         "message": "Employee soft-deleted successfully",
         "employee": serialize_employee_full(employee)
@@ -265,7 +279,9 @@ def restore_employee_logic(employee_id):
         return {"message": "Employee is already active", "employee": serialize_employee_full(employee)}, None, 200
     employee.status = True
     employee.updated_at = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    FaceGalleryChange.record(employee.employee_id)
     db.session.commit()
+    face_gallery.notify_changed()
     return {
         "message": f"Employee {employee_id} restored successfully",
         "employee": serialize_employee_full(employee)
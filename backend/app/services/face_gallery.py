@@ -0,0 +1,454 @@
+import time
+import threading
+import numpy as np
+
+# === Local imports ===
+from app.config import Config
+from app.db import db
+from app.models.employee import Employee
+from app.models.face_training_data import FaceTrainingData
+from app.models.face_gallery_change import FaceGalleryChange, FULL_RELOAD
+from app.services.gallery_search import ExactSearchBackend, create_search_backend
+from app.services.gallery_snapshot import load_snapshot, write_snapshot
+from app.services.gallery_storage import create_gallery_storage
+
+EMBEDDING_DIM = 512
+MIN_QUALITY_SCORE = 35
+SYNC_INTERVAL_SECONDS = 1.0
+INITIAL_CAPACITY = 64
+RESCORE_CANDIDATES = 8  # số ứng viên đầu tiên được chấm lại bằng float32 khi lưu dạng nén
+
+# --------------------------------------------------
+# In-memory embedding gallery
+# --------------------------------------------------
+class FaceGallery:
+    """Process-wide matrix of pre-normalized embeddings used for matching.
+
+    Row i of `vectors` belongs to `employee_ids[i]`, so a query is matched with
+    one matrix-vector product instead of one SQL query per employee. Training
+    writes are recorded in `FaceGalleryChange`; every worker polls the latest
+    generation at most once per `SYNC_INTERVAL_SECONDS` and applies only the
+    changed rows in place. Change ids are allocated at insert time, so a
+    change with a lower id can commit after a higher one: each poll also
+    re-reads the changes created in the last FACE_GALLERY_CHANGE_REPLAY_SECONDS
+    and applies those whose id it has not applied yet. The nearest-row lookup
+    itself is delegated to a pluggable search backend (see `gallery_search`).
+
+    A cold load starts from the on-disk snapshot (see `gallery_snapshot`) when
+    one exists, then applies the changes recorded after its generation. The
+    snapshot matrix is used in place (read-only mmap) until the first row
+    change, which copies it into process memory.
+
+    With `precision` float16 or int8 (FACE_GALLERY_PRECISION) the process only
+    holds compact codes (see `gallery_storage`): the first pass searches the
+    codes, then every candidate whose score could still be the best one is
+    rescored with its exact float32 row, so the match and its distance are
+    the same as with float32 storage.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, precision=None):
+        self.dim = dim
+        self.precision = precision or Config.FACE_GALLERY_PRECISION
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._last_poll = 0.0
+        self.generation = 0
+        self._applied_changes = set()  # id các thay đổi trong cửa sổ replay đã áp dụng
+        self._backend = ExactSearchBackend()
+        self._backend_config = ("exact",)
+        self._reset(INITIAL_CAPACITY)
+
+    def _reset(self, capacity):
+        self._size = 0
+        self._storage = create_gallery_storage(self.precision, self.dim, capacity)
+        self._employee_ids = np.empty(capacity, dtype=object)
+        self._pose_types = np.empty(capacity, dtype=object)
+        self._qualities = np.empty(capacity, dtype=np.float32)
+        self._row_index = {}  # (employee_id, pose_type) -> row
+        self.snapshot_generation = None  # generation của snapshot đang được map, nếu có
+
+    # ---------------- Read access ----------------
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        """Exact float32 rows (decoded into a copy with compact storage)"""
+        return self._storage.vectors(self._size)
+
+    @property
+    def memory_bytes(self):
+        """Embedding bytes held by this process (a mapped snapshot is shared, not counted)"""
+        return self._storage.nbytes(self._size)
+
+    def _search_matrix(self):
+        return self._storage.search_matrix(self._size)
+
+    @property
+    def employee_ids(self):
+        return self._employee_ids[:self._size]
+
+    @property
+    def pose_types(self):
+        return self._pose_types[:self._size]
+
+    @property
+    def qualities(self):
+        return self._qualities[:self._size]
+
+    # ---------------- Row-level updates ----------------
+    def _to_unit_vector(self, encoding, encoding_version=None):
+        vector = np.frombuffer(encoding, dtype=np.float32) if isinstance(encoding, (bytes, bytearray, memoryview)) \
+            else np.asarray(encoding, dtype=np.float32).ravel()
+        if vector.shape[0] != self.dim:
+            return None
+        if encoding_version == FaceTrainingData.ENCODING_VERSION:
+            return vector  # đã chuẩn hóa lúc ghi
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _grow(self, capacity=None):
+        capacity = capacity or max(INITIAL_CAPACITY, 2 * self._storage.capacity)
+        self._storage.grow(capacity, self._size)
+        employee_ids = np.empty(capacity, dtype=object)
+        employee_ids[:self._size] = self._employee_ids[:self._size]
+        pose_types = np.empty(capacity, dtype=object)
+        pose_types[:self._size] = self._pose_types[:self._size]
+        qualities = np.empty(capacity, dtype=np.float32)
+        qualities[:self._size] = self._qualities[:self._size]
+        self._employee_ids, self._pose_types, self._qualities = employee_ids, pose_types, qualities
+
+    def _ensure_writable(self):
+        # Ma trận map từ snapshot là chỉ đọc: chép sang bộ nhớ riêng ở lần thay đổi đầu tiên
+        if not self._storage.writable or not self._qualities.flags.writeable:
+            self._grow(self._size + INITIAL_CAPACITY)
+
+    def upsert_row(self, employee_id, pose_type, encoding, quality=None, encoding_version=None):
+        """Add or replace the (employee_id, pose_type) row in place"""
+        vector = self._to_unit_vector(encoding, encoding_version)
+        if vector is None:
+            self.remove_row(employee_id, pose_type)
+            return
+        with self._lock:
+            self._ensure_writable()
+            row = self._row_index.get((employee_id, pose_type))
+
+            if row is None:
+                if self._size == self._storage.capacity:
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._row_index[(employee_id, pose_type)] = row
+                self._employee_ids[row] = employee_id
+                self._pose_types[row] = pose_type
+            self._storage.set_row(row, vector)
+            self._qualities[row] = np.nan if quality is None else quality
+            self._backend.mark_rows([row])
+
+    def remove_row(self, employee_id, pose_type):
+        """Remove one row by moving the last row into its slot"""
+        with self._lock:
+            row = self._row_index.pop((employee_id, pose_type), None)
+            if row is None:
+                return
+            self._ensure_writable()
+            last = self._size - 1
+            if row != last:
+                self._storage.move_row(last, row)
+                self._employee_ids[row] = self._employee_ids[last]
+                self._pose_types[row] = self._pose_types[last]
+                self._qualities[row] = self._qualities[last]
+                self._row_index[(self._employee_ids[row], self._pose_types[row])] = row
+            # Kể cả khi xóa dòng cuối: backend phải biết gallery đã ngắn đi
+            self._backend.mark_rows([row])
+            self._storage.release_row(last)
+            self._employee_ids[last] = None
+            self._pose_types[last] = None
+            self._size = last
+
+    def apply_employee_rows(self, employee_id, rows, pose_type=None):
+        """Make the gallery hold exactly `rows` for an employee (or one of their poses)"""
+        with self._lock:
+            wanted = {row[1] for row in rows}
+            current = [pose for (emp, pose) in self._row_index if emp == employee_id]
+            for pose in current:
+                if (pose_type is None or pose == pose_type) and pose not in wanted:
+                    self.remove_row(employee_id, pose)
+            for _, pose, encoding, *extra in rows:
+                self.upsert_row(employee_id, pose, encoding, *extra)
+
+    def build(self, rows):
+        """Replace the gallery content with (employee_id, pose_type, encoding_bytes[, quality[, encoding_version]]) rows"""
+        with self._lock:
+            self._reset(max(INITIAL_CAPACITY, len(rows)))
+            unit_rows, legacy_rows = [], []
+            for row in rows:
+                (unit_rows if len(row) > 4 and row[4] == FaceTrainingData.ENCODING_VERSION else legacy_rows).append(row)
+            if unit_rows:
+                self._append_unit_rows(unit_rows)
+            for employee_id, pose_type, encoding, *extra in legacy_rows:
+                self.upsert_row(employee_id, pose_type, encoding, *extra)
+            self._backend.rebuild(self._search_matrix())
+            self._loaded = True
+
+    def _append_unit_rows(self, rows):
+        """Bulk-append rows already stored as unit vectors: one buffer join, no per-row work"""
+        vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32)
+        if vectors.shape[0] != len(rows) * self.dim:
+            # Có dòng sai kích thước: để upsert_row kiểm tra từng dòng
+            for employee_id, pose_type, encoding, *extra in rows:
+                self.upsert_row(employee_id, pose_type, encoding, *extra)
+            return
+        start, end = self._size, self._size + len(rows)
+        if end > self._storage.capacity:
+            self._grow(end)
+        self._storage.set_rows(start, vectors.reshape(len(rows), self.dim))
+        self._employee_ids[start:end] = [row[0] for row in rows]
+        self._pose_types[start:end] = [row[1] for row in rows]
+        self._qualities[start:end] = [np.nan if row[3] is None else row[3] for row in rows]
+        self._row_index.update((key, row) for row, key in enumerate(zip(self._employee_ids[start:end],
+                                                                         self._pose_types[start:end]), start))
+        self._size = end
+
+    def adopt_snapshot(self, snapshot):
+        """Use the arrays of a mapped GallerySnapshot as the gallery content (no copy of the vectors)"""
+        with self._lock:
+            self._reset(0)
+            self._storage.adopt(snapshot.vectors)
+            self._employee_ids = snapshot.employee_ids
+            self._pose_types = snapshot.pose_types
+            self._qualities = snapshot.quality
+            self._size = snapshot.size
+            self._row_index = {key: row for row, key in enumerate(zip(snapshot.employee_ids, snapshot.pose_types))}
+            self._backend.rebuild(self._search_matrix())
+            self.generation = snapshot.generation
+            self.snapshot_generation = snapshot.generation
+            self._loaded = True
+
+    def save_snapshot(self, path=None):
+        """Write the current content and generation to the snapshot file"""
+        with self._lock:
+            write_snapshot(path or Config.FACE_GALLERY_SNAPSHOT_PATH, self.generation, self.vectors,
+                           self.employee_ids, self.pose_types, self.qualities,
+                           dtype=Config.FACE_GALLERY_SNAPSHOT_DTYPE)
+
+    # ---------------- Search backend ----------------
+    def configure(self, backend="exact", **options):
+        """Switch the search backend; a no-op when the configuration is unchanged"""
+        config = (backend,) + tuple(sorted(options.items()))
+        with self._lock:
+            if config == self._backend_config:
+                return
+            self._backend = create_search_backend(backend, **options)
+            self._backend.rebuild(self._search_matrix())
+            self._backend_config = config
+
+    def configure_from_settings(self, settings):
+        """Apply the backend selected in `Settings` (faceSettings)"""
+        if settings.gallery_search_backend == "ivf":
+            self.configure("ivf", nlist=settings.ivf_list_count or 64, nprobe=settings.ivf_probe_count or 8)
+        elif settings.gallery_search_backend == "centroid":
+            self.configure("centroid", shortlist=settings.centroid_shortlist or 10)
+        else:
+            self.configure("exact")
+
+    def describe(self):
+        return dict(self._backend.describe(), size=self._size, generation=self.generation,
+                    precision=self.precision, memory_bytes=self.memory_bytes)
+
+    # ---------------- Database synchronisation ----------------
+    @staticmethod
+    def _rows_query():
+        """Usable training rows: active employees with completed training and enough quality"""
+        return (
+            db.session.query(
+                FaceTrainingData.employee_id,
+                FaceTrainingData.pose_type,
+                FaceTrainingData.face_encoding,
+                FaceTrainingData.image_quality_score,
+                FaceTrainingData.encoding_version,
+            )
+            .join(Employee, Employee.employee_id == FaceTrainingData.employee_id)
+            .filter(Employee.status.is_(True), Employee.face_training_completed.is_(True))
+            .filter(db.or_(
+                FaceTrainingData.image_quality_score.is_(None),
+                FaceTrainingData.image_quality_score >= MIN_QUALITY_SCORE,
+            ))
+        )
+
+    def load(self):
+        """(Re)load the whole gallery: from the snapshot when it is still valid, else from the database"""
+        with self._lock:
+            # Đọc generation trước để các thay đổi xảy ra trong lúc nạp vẫn được áp dụng lại
+            generation = FaceGalleryChange.current_generation()
+            if self._load_snapshot(generation):
+                self._last_poll = time.monotonic()
+                return
+            # Các thay đổi đã commit trước lúc đọc dữ liệu đều có trong build(): coi như đã áp dụng
+            recent = FaceGalleryChange.changes_since(generation, Config.FACE_GALLERY_CHANGE_REPLAY_SECONDS)
+            self.build(self._rows_query().all())
+            self.generation = max([generation] + [change.id for change in recent])
+            self._applied_changes = {change.id for change in recent}
+            self.snapshot_generation = None
+            self._last_poll = time.monotonic()
+            if Config.FACE_GALLERY_SNAPSHOT_PATH and self._try_save_snapshot() and not self._storage.exact_scores:
+                # Dạng nén: lấy các dòng float32 chính xác từ snapshot vừa ghi (mmap) thay vì giữ bản riêng
+                snapshot = load_snapshot(Config.FACE_GALLERY_SNAPSHOT_PATH, dim=self.dim)
+                if snapshot is not None and snapshot.generation == self.generation:
+                    self.adopt_snapshot(snapshot)
+
+    def load_from_database(self):
+        """Build from the database rows only, for read-only tools (benchmarks, calibration).
+
+        Unlike load() it never writes the snapshot nor prunes the change log,
+        so running it does not change the state shared with the server.
+        """
+        self.build(self._rows_query().all())
+
+    def _load_snapshot(self, generation):
+        """Adopt the snapshot and apply the changes recorded after it; False if it cannot be used"""
+        path = Config.FACE_GALLERY_SNAPSHOT_PATH
+        snapshot = load_snapshot(path, dim=self.dim) if path else None
+        # Snapshot mới hơn database (database bị tạo lại), cũ hơn các thay đổi còn lưu (đã prune)
+        # hoặc có lệnh nạp lại toàn bộ sau nó: bỏ qua
+        if snapshot is None or snapshot.generation > generation or \
+           snapshot.generation < FaceGalleryChange.oldest_generation() - 1:
+            return False
+        # Kể cả các thay đổi gần đây có id <= generation của snapshot: có thể đã commit sau khi snapshot được ghi
+        changes = FaceGalleryChange.changes_since(snapshot.generation, Config.FACE_GALLERY_CHANGE_REPLAY_SECONDS)
+        if any(change.employee_id == FULL_RELOAD for change in changes):
+            return False
+        self.adopt_snapshot(snapshot)
+        if changes:
+            self._apply_changes(changes)
+        self._applied_changes = {change.id for change in changes}
+        # Kiểm tra rẻ (COUNT, không đọc BLOB): snapshot của database khác hoặc bị sửa tay thì nạp lại
+        if self._rows_query().count() != self._size:
+            print("Snapshot gallery không khớp database, nạp lại từ database")
+            return False
+        if self.generation > snapshot.generation:
+            self._try_save_snapshot()
+        return True
+
+    def _try_save_snapshot(self):
+        try:
+            self.save_snapshot()
+        except OSError as e:
+            print(f"Không ghi được snapshot gallery: {e}")
+            return False
+        # Worker nguội bắt đầu từ snapshot này: các thay đổi cũ đã nằm trong nó có thể xóa
+        try:
+            FaceGalleryChange.prune(self.generation, Config.FACE_GALLERY_CHANGE_RETENTION_HOURS)
+        except Exception as e:
+            print(f"Không dọn được face_gallery_changes: {e}")
+        return True
+
+    def refresh_employee(self, employee_id, pose_type=None):
+        """Re-read one employee's rows (or a single pose) and apply them as a delta"""
+        query = self._rows_query().filter(FaceTrainingData.employee_id == employee_id)
+        if pose_type is not None:
+            query = query.filter(FaceTrainingData.pose_type == pose_type)
+        self.apply_employee_rows(employee_id, query.all(), pose_type)
+
+    def sync(self, force=False):
+        """Load on first use, then apply changes recorded by any worker since our generation"""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return
+            now = time.monotonic()
+            if not force and now - self._last_poll < SYNC_INTERVAL_SECONDS:
+                return
+            self._last_poll = now
+
+            # Worker để yên quá lâu: các thay đổi nó chưa áp dụng đã bị prune
+            if FaceGalleryChange.oldest_generation() > self.generation + 1:
+                self.load()
+                return
+            changes = FaceGalleryChange.changes_since(self.generation, Config.FACE_GALLERY_CHANGE_REPLAY_SECONDS)
+            pending = [change for change in changes if change.id not in self._applied_changes]
+            if not pending:
+                return
+            if any(change.employee_id == FULL_RELOAD for change in pending):
+                self.load()
+                return
+            self._apply_changes(pending)
+            self._applied_changes = {change.id for change in changes}
+
+    def _apply_changes(self, changes):
+        """Apply FaceGalleryChange rows (no full reload among them) as row deltas"""
+        with self._lock:
+            # Gộp các thay đổi: nếu có thay đổi toàn bộ nhân viên thì bỏ qua thay đổi theo pose
+            targets = {}
+            for change in changes:
+                poses = targets.setdefault(change.employee_id, set())
+                if poses is not None:
+                    targets[change.employee_id] = None if change.pose_type is None else poses | {change.pose_type}
+            for employee_id, poses in targets.items():
+                if poses is None:
+                    self.refresh_employee(employee_id)
+                else:
+                    for pose in poses:
+                        self.refresh_employee(employee_id, pose)
+            self.generation = max(self.generation, changes[-1].id)
+
+    def notify_changed(self):
+        """Apply freshly committed changes right away in the worker that wrote them"""
+        if self._loaded:
+            self.sync(force=True)
+
+    # ---------------- Matching ----------------
+    def search(self, query_embedding, pose_type=None):
+        """Return (employee_id, cosine_distance) of the closest row, or (None, inf).
+
+        `pose_type` is the query's estimated pose ("front", "left"...), used by
+        the centroid backend to favour the employee's embedding of that pose.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / np.linalg.norm(query)
+        with self._lock:
+            labels = {"employee_ids": self.employee_ids, "pose_types": self.pose_types, "query_pose": pose_type}
+            if self._storage.exact_scores:
+                rows, scores = self._backend.search(self._search_matrix(), query, k=1, **labels)
+            elif not self._backend.ranks_by_similarity:
+                # Xếp hạng có cộng trọng số pose nên không dùng được cận sai số: backend đọc thẳng
+                # các dòng float32 chính xác (centroid chỉ đọc toàn bộ khi tính lại tâm)
+                rows, scores = self._backend.search(self._storage.exact_matrix(self._size), query, k=1, **labels)
+            else:
+                rows, scores = self._rescored_search(query, labels)
+            if rows.shape[0] == 0:
+                return None, float("inf")
+            # Khoảng cách của dòng thắng luôn tính bằng cùng một phép dot float32, để float32 và
+            # dạng nén cho kết quả giống hệt nhau từng bit (quyết định tại ngưỡng không đổi)
+            score = self._storage.exact(rows[:1])[0] @ query
+            return self._employee_ids[rows[0]], float(1.0 - score)
+
+    def _rescored_search(self, query, labels):
+        """First pass on the compact codes, then exact float32 scores for every row that can still win.
+
+        A row's exact score lies within its residual of the approximate one, so
+        a row whose upper bound is below the best lower bound can never be the
+        best match. The candidate list is widened until no row left out of it
+        could still reach that bound.
+        """
+        matrix = self._search_matrix()
+        residuals = self._storage.residuals(self._size)
+        max_residual = float(residuals.max()) if self._size else 0.0
+        k = RESCORE_CANDIDATES
+        while True:
+            rows, approx = self._backend.search(matrix, query, k=k, **labels)
+            if rows.shape[0] == 0:
+                return rows, approx
+            lower = float(np.max(approx - residuals[rows]))
+            # Dòng không được trả về có điểm xấp xỉ <= approx[-1]
+            if rows.shape[0] < k or approx[-1] + max_residual < lower:
+                break
+            k *= 4
+        candidates = np.sort(rows[approx + residuals[rows] >= lower])
+        exact = self._storage.exact(candidates) @ query
+        best = int(np.argmax(exact))  # hoà điểm: dòng có chỉ số nhỏ nhất, như tìm kiếm float32
+        return candidates[best:best + 1], exact[best:best + 1]
+
+
+face_gallery = FaceGallery()
@@ -0,0 +1,169 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+from app.config import Config
+from app.services.onnx_sessions import apply_session_options, print_session_report
+
+# --------------------------------------------------
+# Face models: lazy construction and inference stages
+# --------------------------------------------------
+# Shared by the request process (FacialRecognitionService) and by the workers
+# of the inference pool, so both run exactly the same pipeline.
+#
+# Nothing heavy happens at import time: dlib, insightface/onnxruntime and the
+# model files are loaded on first use (or by `warm_up()` in serving workers),
+# so `flask db`, seed scripts, reports and tests start fast and stay small.
+
+ALIGNED_CROP_SIZE = 112  # ArcFace input size
+REQUIRED_MODULES = ('detection', 'recognition')
+DETECTION_STRIDE = 32     # kích thước đầu vào của RetinaFace phải chia hết cho stride lớn nhất
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SHAPE_PREDICTOR_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "shape_predictor_68_face_landmarks.dat"))
+
+_lock = threading.Lock()
+_face_analyzer = None
+_shape_predictor = None
+_dlib_face_detector = None
+
+def parse_allowed_modules(value):
+    """'detection,landmark_3d_68,recognition' (or a list) -> list always holding detection and
+    recognition; 'all' -> None, i.e. every module of the pack"""
+    if isinstance(value, (list, tuple)):
+        value = ','.join(value)
+    if value is None or value.strip().lower() in ('', 'all'):
+        return None
+    modules = [m.strip() for m in value.split(',') if m.strip()]
+    return modules + [m for m in REQUIRED_MODULES if m not in modules]
+
+def create_face_analyzer(model_pack=None, allowed_modules=None, det_size=None):
+    """Build and prepare the InsightFace pipeline (defaults from Config.FACE_*)"""
+    import insightface
+    allowed_modules = parse_allowed_modules(Config.FACE_ALLOWED_MODULES if allowed_modules is None else allowed_modules)
+    det_size = det_size or Config.FACE_DET_SIZE
+    analyzer = insightface.app.FaceAnalysis(
+        name=model_pack or Config.FACE_MODEL_PACK,
+        allowed_modules=allowed_modules,
+        providers=['CPUExecutionProvider'],
+    )
+    apply_session_options(analyzer)
+    analyzer.prepare(ctx_id=0, det_size=(det_size, det_size))
+    print_session_report(analyzer)
+    return analyzer
+
+def get_face_analyzer():
+    """Process-wide FaceAnalysis, created on first call"""
+    global _face_analyzer
+    if _face_analyzer is None:
+        with _lock:
+            if _face_analyzer is None:
+                _face_analyzer = create_face_analyzer()
+    return _face_analyzer
+
+def get_shape_predictor():
+    """dlib 68-point shape predictor, loaded on first call"""
+    global _shape_predictor
+    if _shape_predictor is None:
+        with _lock:
+            if _shape_predictor is None:
+                import dlib
+                if not os.path.exists(SHAPE_PREDICTOR_PATH):
+                    raise FileNotFoundError("Landmark model not found at %s" % SHAPE_PREDICTOR_PATH)
+                _shape_predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
+    return _shape_predictor
+
+def get_dlib_face_detector():
+    """dlib HOG frontal face detector, created on first call"""
+    global _dlib_face_detector
+    if _dlib_face_detector is None:
+        with _lock:
+            if _dlib_face_detector is None:
+                import dlib
+                _dlib_face_detector = dlib.get_frontal_face_detector()
+    return _dlib_face_detector
+
+def warm_up(use_pool=True):
+    """Load every model now and run one dummy inference so the first request is not slow.
+
+    Meant for serving workers; with an inference pool configured its worker
+    processes are started (and warmed) instead of loading the models here.
+    """
+    from app.services.inference_pool import get_inference_pool
+    pool = get_inference_pool() if use_pool else None
+    blank = np.zeros((ALIGNED_CROP_SIZE, ALIGNED_CROP_SIZE, 3), dtype=np.uint8)
+    if pool is not None:
+        pool.warm_up()
+    else:
+        analyzer = get_face_analyzer()
+        detect_faces(analyzer, blank)
+        embed_aligned_crops(analyzer, [blank])
+    get_shape_predictor()
+    get_dlib_face_detector()
+
+# --------------------------------------------------
+# Inference stages
+# --------------------------------------------------
+def detection_factor(image_shape, scale=1.0, max_side=0):
+    """Resize factor (<= 1) of a frame for the detector: `scale`, capped so the long side is at most `max_side`"""
+    factor = min(1.0, scale)
+    if max_side:
+        factor = min(factor, max_side / max(image_shape[:2]))
+    return factor
+
+def _run_detector(analyzer, image_bgr, scale, max_side):
+    """Detector boxes/keypoints in full-resolution coordinates.
+
+    With scale factors the detector sees a downscaled copy whose input keeps the
+    frame's aspect ratio (rounded up to the stride) instead of being letterboxed
+    into det_size, and the results are mapped back to the original frame.
+    """
+    if scale >= 1.0 and not max_side:
+        return analyzer.det_model.detect(image_bgr, max_num=0, metric='default')
+    factor = detection_factor(image_shape=image_bgr.shape, scale=scale, max_side=max_side)
+    height, width = image_bgr.shape[:2]
+    size = (max(1, round(width * factor)), max(1, round(height * factor)))
+    small = cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA) if factor < 1.0 else image_bgr
+    factor = size[1] / height  # tỉ lệ thực sau khi làm tròn kích thước
+    input_size = tuple(-(-side // DETECTION_STRIDE) * DETECTION_STRIDE for side in size)
+    bboxes, kpss = analyzer.det_model.detect(small, input_size=input_size, max_num=0, metric='default')
+    if factor < 1.0:
+        bboxes[:, :4] /= factor
+        if kpss is not None:
+            kpss = kpss / factor
+    return bboxes, kpss
+
+def detect_faces(analyzer, image_bgr: np.ndarray, scale=1.0, max_side=0):
+    """Cheap stage of FaceAnalysis.get: detector + landmark/pose models, no recognition model.
+
+    Only the detector uses the downscaled copy; landmark models (and later the
+    aligned crop) work on the full-resolution frame.
+    """
+    from insightface.app.common import Face
+    bboxes, kpss = _run_detector(analyzer, image_bgr, scale, max_side)
+    faces = []
+    for i in range(bboxes.shape[0]):
+        face = Face(bbox=bboxes[i, 0:4], kps=None if kpss is None else kpss[i], det_score=bboxes[i, 4])
+        for taskname, model in analyzer.models.items():
+            if taskname in ('detection', 'recognition'):
+                continue
+            model.get(image_bgr, face)
+        faces.append(face)
+    return faces
+
+def align_face_crop(image_bgr, kps):
+    """ArcFace-aligned crop from the 5 detector keypoints"""
+    from insightface.utils import face_align
+    return face_align.norm_crop(image_bgr, landmark=kps, image_size=ALIGNED_CROP_SIZE)
+
+def embed_aligned_crops(analyzer, crops, normalize=True):
+    """Expensive stage: one recognition-model run over a batch of aligned crops.
+
+    Returns unit vectors, or the raw model output with `normalize=False`
+    (enrollment keeps the original norm, see FaceTrainingData).
+    """
+    embeddings = analyzer.models['recognition'].get_feat(list(crops)).astype(np.float32)
+    if not normalize:
+        return embeddings
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
@@ -0,0 +1,113 @@
+import os
+import json
+import numpy as np
+
+from app.config import Config
+
+# --------------------------------------------------
+# INT8 fast path for the detector and the ArcFace recognizer
+# --------------------------------------------------
+# scripts/quantize_face_models.py writes, per model pack:
+#   <FACE_QUANTIZED_MODEL_DIR>/<pack>/<model>.int8.onnx
+#   <FACE_QUANTIZED_MODEL_DIR>/<pack>/quantization_report.json
+# The quantized files are only used when FACE_USE_QUANTIZED_MODELS is on AND
+# the report says the accuracy check against FaceTrainingData passed.
+
+QUANTIZED_SUFFIX = '.int8.onnx'
+REPORT_FILE = 'quantization_report.json'
+MATCH_THRESHOLD = 0.35  # ngưỡng khoảng cách cosine của FacialRecognitionService.match_embedding
+
+_warned_packs = set()
+
+def quantized_pack_dir(pack):
+    return os.path.join(Config.FACE_QUANTIZED_MODEL_DIR, pack)
+
+def quantized_file_name(model_file):
+    return os.path.splitext(os.path.basename(model_file))[0] + QUANTIZED_SUFFIX
+
+def load_report(pack):
+    path = os.path.join(quantized_pack_dir(pack), REPORT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_report(pack, report):
+    os.makedirs(quantized_pack_dir(pack), exist_ok=True)
+    with open(os.path.join(quantized_pack_dir(pack), REPORT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def quantized_model_file(model_file):
+    """The approved INT8 replacement of `model_file`, or None to keep the FP32 model"""
+    if not Config.FACE_USE_QUANTIZED_MODELS:
+        return None
+    pack = os.path.basename(os.path.dirname(os.path.abspath(model_file)))
+    report = load_report(pack)
+    if not report or not report.get('passed'):
+        if pack not in _warned_packs:
+            _warned_packs.add(pack)
+            print(f"[face-models] FACE_USE_QUANTIZED_MODELS is on but {pack} has no passing "
+                  f"quantization report in {quantized_pack_dir(pack)}; using FP32 models")
+        return None
+    name = quantized_file_name(model_file)
+    path = os.path.join(quantized_pack_dir(pack), name)
+    if name not in report.get('models', []) or not os.path.exists(path):
+        return None
+    return path
+
+# --------------------------------------------------
+# Accuracy check
+# --------------------------------------------------
+def distance_distributions(queries, gallery_vectors, gallery_ids, gallery_poses, threshold=MATCH_THRESHOLD):
+    """Same-person / different-person distances of query embeddings against the gallery.
+
+    `queries` is a list of (employee_id, pose_type, unit_embedding or None).
+    The genuine distance uses the employee's other poses only, so a photo is
+    never compared with the row that was enrolled from it. A query counts as
+    accepted when its genuine distance is under the threshold and beats every
+    impostor, and as a false accept when an impostor wins under the threshold.
+    """
+    genuine, impostor, accepted, false_accepts, evaluated = [], [], 0, 0, 0
+    for employee_id, pose_type, embedding in queries:
+        if embedding is None:
+            continue
+        same = gallery_ids == employee_id
+        own = same & (gallery_poses != pose_type)
+        if not own.any() or same.all():
+            continue
+        distances = 1.0 - gallery_vectors @ embedding
+        g, i = float(distances[own].min()), float(distances[~same].min())
+        genuine.append(g)
+        impostor.append(i)
+        evaluated += 1
+        accepted += g < threshold and g < i
+        false_accepts += i < threshold and i < g
+
+    def summary(values):
+        if not values:
+            return {}
+        v = np.asarray(values)
+        return {'mean': float(v.mean()), 'p5': float(np.percentile(v, 5)),
+                'p50': float(np.percentile(v, 50)), 'p95': float(np.percentile(v, 95))}
+
+    return {
+        'queries': evaluated,
+        'genuine': summary(genuine),
+        'impostor': summary(impostor),
+        'accept_rate': accepted / evaluated if evaluated else 0.0,
+        'false_accept_rate': false_accepts / evaluated if evaluated else 0.0,
+    }
+
+def accuracy_gate(baseline, candidate, embedding_similarity, min_queries=20, max_accept_drop=0.01,
+                  max_false_accept_increase=0.0, min_embedding_similarity=0.98):
+    """Compare INT8 against FP32 results; returns (passed, reasons)"""
+    reasons = []
+    if candidate['queries'] < min_queries:
+        reasons.append(f"only {candidate['queries']} evaluation queries (need {min_queries})")
+    if candidate['accept_rate'] < baseline['accept_rate'] - max_accept_drop:
+        reasons.append(f"accept rate {candidate['accept_rate']:.3f} < FP32 {baseline['accept_rate']:.3f} - {max_accept_drop}")
+    if candidate['false_accept_rate'] > baseline['false_accept_rate'] + max_false_accept_increase:
+        reasons.append(f"false accept rate {candidate['false_accept_rate']:.3f} > FP32 {baseline['false_accept_rate']:.3f}")
+    if embedding_similarity < min_embedding_similarity:
+        reasons.append(f"mean FP32/INT8 embedding similarity {embedding_similarity:.4f} < {min_embedding_similarity}")
+    return not reasons, reasons
@@ -0,0 +1,59 @@
+import numpy as np
+
+# --------------------------------------------------
+# Face tracking between frames of a liveness session
+# --------------------------------------------------
+# During the liveness window the face barely moves, so after a confident
+# full-frame detection the next frames only run the detector on a padded
+# region of interest (ROI) around the last box. The ROI is small and the
+# detector input is capped (FACE_TRACK_ROI_SIZE), so a tracked frame costs a
+# fraction of a full 640x640 detection. A tracked result is only trusted when
+# it is unambiguous (one face, high score, not cut by the ROI border);
+# otherwise the frame falls back to full detection.
+
+_COORDINATE_KEYS = ('bbox', 'kps', 'landmark_2d_106', 'landmark_3d_68')
+
+
+def tracking_roi(bbox, frame_shape, padding):
+    """Integer ROI (x1, y1, x2, y2) = `bbox` grown by `padding` x its size on each side, clipped to the frame"""
+    height, width = frame_shape[:2]
+    x1, y1, x2, y2 = (float(v) for v in bbox[:4])
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    left, top = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+    right, bottom = min(int(np.ceil(x2 + pad_x)), width), min(int(np.ceil(y2 + pad_y)), height)
+    if right - left < 2 or bottom - top < 2:
+        return None
+    return left, top, right, bottom
+
+
+def shift_faces(faces, offset):
+    """Map faces detected in a ROI back to frame coordinates (in place)"""
+    offset = np.asarray(offset, dtype=np.float32)
+    for face in faces:
+        for key in _COORDINATE_KEYS:
+            value = face.get(key)
+            if value is None:
+                continue
+            if key == 'bbox':
+                face[key] = value + np.tile(offset, 2)
+            else:
+                value = value.copy()
+                value[..., :2] += offset
+                face[key] = value
+    return faces
+
+
+def confident_track(faces, roi, frame_shape, min_score, border=2):
+    """True when a ROI detection can stand in for a full-frame detection.
+
+    Needs exactly one face scoring at least `min_score` whose box does not
+    touch a ROI edge that lies inside the frame (a face leaving the ROI, or a
+    second face partly inside it, sends the frame back to full detection).
+    """
+    if len(faces) != 1 or faces[0].get('det_score', 0.0) < min_score:
+        return False
+    height, width = frame_shape[:2]
+    left, top, right, bottom = roi
+    x1, y1, x2, y2 = faces[0]['bbox'][:4]
+    return ((left == 0 or x1 > left + border) and (top == 0 or y1 > top + border) and
+            (right == width or x2 < right - border) and (bottom == height or y2 < bottom - border))
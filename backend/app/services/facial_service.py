@@ -1,40 +1,210 @@
-import os
-import math
+import time
 import base64
-from datetime import datetime
 import cv2
-import dlib
 import numpy as np
-import insightface
 
 # === Local imports ===
 from app.models.employee import Employee
 from app.models.face_training_data import FaceTrainingData
+from app.services.face_gallery import face_gallery
+from app.services.face_models import (
+    align_face_crop, detect_faces, embed_aligned_crops,
+    get_face_analyzer, get_shape_predictor, get_dlib_face_detector,
+)
+from app.services.face_tracking import confident_track, shift_faces, tracking_roi
+from app.services.inference_pool import get_inference_pool
+from app.services.image_ingest import Frame, as_frame, decode_frame
+from app.services.liveness_features import head_moved, liveness_features
+from app.services.liveness_session import (
+    BLINK_EAR_THRESHOLD, EAR, HEAD_MOVEMENT_MIN_DISTANCE, MOUTH_RATIO, SMILE_RATIO_THRESHOLD, LivenessSession,
+)
+from app.services.liveness_store import get_liveness_store
+from app.config import Config
 
 # --------------------------------------------------
-# Load models once at module import
+# Models are loaded lazily (see face_models); serving workers call warm_up()
 # --------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "shape_predictor_68_face_landmarks.dat"))
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError("Landmark model not found at %s" % MODEL_PATH)
-
-_shape_predictor = dlib.shape_predictor(MODEL_PATH)
-_face_detector = dlib.get_frontal_face_detector()
-_face_analyzer = insightface.app.FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-_face_analyzer.prepare(ctx_id=0)
-
-def _extract_landmarks(image_bgr: np.ndarray):
-    """Return landmarks (68,2) or None if not exactly one face."""
-    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    rects = _face_detector(gray, 1)
+def _extract_landmarks(image_bgr: np.ndarray, bbox=None, gray=None):
+    """Return landmarks (68,2) or None if not exactly one face.
+
+    When `bbox` (x1, y1, x2, y2) comes from an earlier detection, dlib's own
+    detector is skipped and the shape predictor runs on a grayscale crop around
+    the box instead of the whole frame. `gray` is the frame's cached gray plane.
+    """
+    import dlib
+    offset = np.zeros(2, dtype=np.float32)
+    if bbox is not None:
+        height, width = image_bgr.shape[:2]
+        x1, y1, x2, y2 = (int(round(v)) for v in bbox[:4])
+        margin_x, margin_y = (x2 - x1) // 4, (y2 - y1) // 4
+        left, top = max(x1 - margin_x, 0), max(y1 - margin_y, 0)
+        right, bottom = min(x2 + margin_x, width), min(y2 + margin_y, height)
+        if right <= left or bottom <= top:
+            return None
+        gray = gray[top:bottom, left:right] if gray is not None else \
+            cv2.cvtColor(image_bgr[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+        rects = [dlib.rectangle(x1 - left, y1 - top, x2 - left, y2 - top)]
+        offset = np.array([left, top], dtype=np.float32)
+    else:
+        gray = gray if gray is not None else cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+        rects = get_dlib_face_detector()(gray, 1)
     if len(rects) != 1:
         return None
-    shape = _shape_predictor(gray, rects[0])
-    coords = np.zeros((68, 2), dtype="float")
-    for i in range(68):
-        coords[i] = (shape.part(i).x, shape.part(i).y)
-    return coords
+    shape = get_shape_predictor()(gray, rects[0])
+    # Một lượt qua shape.parts() thay vì 136 lần gọi shape.part(i).x / .y
+    coords = np.fromiter((c for p in shape.parts() for c in (p.x, p.y)), dtype=np.float32, count=136)
+    return coords.reshape(68, 2) + offset
+
+def _detect_faces(image_bgr: np.ndarray, scale=1.0, max_side=0):
+    """Detector + landmark stage, in the inference pool when one is configured"""
+    pool = get_inference_pool()
+    if pool is not None:
+        return pool.detect(image_bgr, scale, max_side).result(timeout=Config.FACE_INFERENCE_TIMEOUT_SECONDS)
+    return detect_faces(get_face_analyzer(), image_bgr, scale, max_side)
+
+def _detect_faces_in_roi(image_bgr: np.ndarray, bbox):
+    """Detector on a padded ROI around `bbox`; faces in frame coordinates, or None when not confident"""
+    roi = tracking_roi(bbox, image_bgr.shape, Config.FACE_TRACK_PADDING)
+    if roi is None:
+        return None
+    left, top, right, bottom = roi
+    # Ảnh ROI nhỏ: detector chạy với input bằng ROI (làm tròn theo stride), tối đa FACE_TRACK_ROI_SIZE
+    faces = _detect_faces(np.ascontiguousarray(image_bgr[top:bottom, left:right]), 1.0, Config.FACE_TRACK_ROI_SIZE)
+    shift_faces(faces, (left, top))
+    return faces if confident_track(faces, roi, image_bgr.shape, Config.FACE_TRACK_MIN_SCORE) else None
+
+def liveness_sessions():
+    return get_liveness_store(SESSION_TIMEOUT_SECONDS)
+
+
+def _embed_aligned_crops(crops):
+    """Recognition stage; with a pool, crops from concurrent requests share one batched run"""
+    pool = get_inference_pool()
+    if pool is not None:
+        futures = [pool.embed(crop) for crop in crops]
+        return np.stack([f.result(timeout=Config.FACE_INFERENCE_TIMEOUT_SECONDS) for f in futures])
+    return embed_aligned_crops(get_face_analyzer(), crops)
+
+# --------------------------------------------------
+# Per-frame analysis shared by liveness and recognition
+# --------------------------------------------------
+class FrameAnalysis:
+    """One InsightFace detection pass over a frame.
+
+    The detector, landmark, pose and embedding outputs of that single pass are
+    reused by `detect_liveness` and by matching, so a frame is never detected
+    twice. Detection runs lazily on first access, which keeps frames rejected
+    earlier (e.g. by the lighting check) free, and the recognition model only
+    runs when `embedding` is actually read.
+
+    `track_from(bbox)` makes that pass search a ROI around the face box of the
+    previous frame first (see face_tracking); `tracked` tells whether the ROI
+    result was used instead of a full-frame detection.
+    """
+
+    def __init__(self, image, faces=None):
+        self.frame = as_frame(image)
+        self.image = self.frame.bgr
+        self._faces = faces
+        self._track_bbox = None
+        self.tracked = False
+        self._aligned_crop = None
+        self._embedding = None
+
+    def track_from(self, bbox):
+        """Search around `bbox` (previous frame) before falling back to full detection"""
+        self._track_bbox = bbox
+
+    @property
+    def detected(self):
+        """Whether the detection pass already ran (reading `faces` runs it)"""
+        return self._faces is not None
+
+    @property
+    def faces(self):
+        if self._faces is None and self._track_bbox is not None:
+            self._faces = _detect_faces_in_roi(self.image, self._track_bbox)
+            self.tracked = self._faces is not None
+        if self._faces is None:
+            options = FacialRecognitionService.detection_options
+            self._faces = _detect_faces(self.image, options["scale"], options["max_side"])
+        return self._faces
+
+    @property
+    def embedded(self):
+        """Whether the recognition model already ran on this frame (reading `embedding` runs it)"""
+        return self._embedding is not None
+
+    @property
+    def face_count(self):
+        return len(self.faces)
+
+    @property
+    def face(self):
+        """The detected face, or None unless exactly one face is visible"""
+        return self.faces[0] if self.face_count == 1 else None
+
+    @property
+    def bbox(self):
+        return None if self.face is None else self.face.bbox
+
+    @property
+    def landmarks(self):
+        """68 (x, y) points in dlib/iBUG order, or None"""
+        face = self.face
+        if face is None:
+            return None
+        if getattr(face, 'landmark_3d_68', None) is not None:
+            return face.landmark_3d_68[:, :2].astype(np.float32)
+        # Pack không có module landmark_3d_68: chỉ chạy shape predictor của dlib trên bbox đã có
+        return _extract_landmarks(self.image, bbox=face.bbox, gray=self.frame.gray)
+
+    @property
+    def pose(self):
+        """(pitch, yaw, roll) in degrees, or None"""
+        face = self.face
+        if face is None or getattr(face, 'pose', None) is None:
+            return None
+        return tuple(float(a) for a in face.pose)
+
+    @property
+    def pose_type(self):
+        """Pose name of the face ("front", "left"...) as in detect_face_pose, or None if unknown"""
+        pose_type, _ = FacialRecognitionService.detect_face_pose(self.image, self.faces)
+        return None if pose_type == "unknown" else pose_type
+
+    @property
+    def aligned_crop(self):
+        """112x112 crop aligned on the detector keypoints, the recognition model input"""
+        face = self.face
+        if face is None:
+            return None
+        if self._aligned_crop is None:
+            self._aligned_crop = align_face_crop(self.image, face.kps)
+        return self._aligned_crop
+
+    @property
+    def face_quality(self):
+        """calculate_image_quality of the face region only"""
+        bbox = self.bbox
+        if bbox is None:
+            return 0.0
+        height, width = self.image.shape[:2]
+        x1, y1 = max(int(bbox[0]), 0), max(int(bbox[1]), 0)
+        x2, y2 = min(int(bbox[2]), width), min(int(bbox[3]), height)
+        if x2 <= x1 or y2 <= y1:
+            return 0.0
+        return FacialRecognitionService.calculate_image_quality(
+            self.image[y1:y2, x1:x2], gray=self.frame.gray[y1:y2, x1:x2])
+
+    @property
+    def embedding(self):
+        """Unit-normalized float32 embedding, or None (runs the recognition model once)"""
+        if self.face is None:
+            return None
+        if self._embedding is None:
+            self._embedding = _embed_aligned_crops([self.aligned_crop])[0]
+        return self._embedding
 
 # --------------------------------------------------
 # Simplified LivenessChecker
@@ -43,63 +213,54 @@ class LivenessChecker:
     def __init__(self):
         self.actions = ['blink', 'smile', 'head_movement']
 
+    def frame_features(self, landmarks, scale=1.0):
+        """(EAR, mouth ratio, yaw, roll) of one frame, the values kept in LivenessSession.
+
+        `scale` is the frame's decode reduction, so yaw stays in full-resolution pixels.
+        """
+        return liveness_features(landmarks, scale)
+
     def detect_blink(self, landmarks):
-        def ear(eye):
-            A = np.linalg.norm(eye[1] - eye[5])
-            B = np.linalg.norm(eye[2] - eye[4])
-            C = np.linalg.norm(eye[0] - eye[3])
-            return (A + B) / (2.0 * C)
-        left, right = landmarks[36:42], landmarks[42:48]
-        return (ear(left) + ear(right)) / 2 < 0.25
+        return liveness_features(landmarks)[EAR] < BLINK_EAR_THRESHOLD
 
     def detect_smile(self, landmarks):
-        mouth = landmarks[48:68]
-        width = np.linalg.norm(mouth[0] - mouth[6])
-        height = np.linalg.norm(mouth[3] - mouth[9])
-        ratio = (width / height) if height else 0
-        return ratio > 3.0
+        return liveness_features(landmarks)[MOUTH_RATIO] > SMILE_RATIO_THRESHOLD
 
-    def detect_head_movement(self, frames_data, min_distance=6.0):
+    def detect_head_movement(self, frames_data, min_distance=HEAD_MOVEMENT_MIN_DISTANCE):
         """Simple head movement detection - just check angle changes"""
         if len(frames_data) < 5:
             return False
-        
-        angles = []
-        for frame_data in frames_data:
-            landmarks = frame_data['landmarks']
-            left_eye = landmarks[36:42].mean(axis=0)
-            right_eye = landmarks[42:48].mean(axis=0)
-            nose_tip = landmarks[30]
-            face_center_x = (landmarks[0][0] + landmarks[16][0]) / 2
-            
-            # Simple angle calculation
-            yaw = abs(nose_tip[0] - face_center_x)
-            roll = abs(math.degrees(math.atan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0])))
-            angles.append((yaw, roll))
-        
-        # Check for significant movement
-        max_yaw_change = max(abs(angles[i][0] - angles[i-1][0]) for i in range(1, len(angles)))
-        max_roll_change = max(abs(angles[i][1] - angles[i-1][1]) for i in range(1, len(angles)))
-        
-        return max_yaw_change > min_distance or max_roll_change > min_distance
+        features = liveness_features(np.stack([frame_data['landmarks'] for frame_data in frames_data]))
+        return head_moved(features, min_distance)
 
 # --------------------------------------------------
-# Global Liveness Session Management
+# Liveness Session Management (state lives in the FACE_LIVENESS_STORE backend)
 # --------------------------------------------------
-LIVENESS_SESSIONS = {}
 SESSION_TIMEOUT_SECONDS = 5
 MAX_FRAMES_PER_SESSION = 30
+BEST_FRAME_QUALITY_MARGIN = 5.0
+RECOGNITION_THRESHOLD = 0.35  # khoảng cách cosine tối đa để coi là cùng một nhân viên
 
 # --------------------------------------------------
 # Main Service Class
 # --------------------------------------------------
 class FacialRecognitionService:
     liveness_checker = LivenessChecker()
+    # Hệ số thu nhỏ frame trước khi chạy detector (mặc định: không thu nhỏ)
+    detection_options = {"scale": 1.0, "max_side": 0}
+
+    @staticmethod
+    def configure_from_settings(settings):
+        """Apply the detection scale factors selected in `Settings` (deviceSettings)"""
+        FacialRecognitionService.detection_options = {
+            "scale": settings.detection_scale or 1.0,
+            "max_side": settings.detection_max_side or 0,
+        }
 
     @staticmethod
     def _bytes_to_image(image_bytes: bytes):
-        arr = np.frombuffer(image_bytes, np.uint8)
-        return cv2.imdecode(arr, cv2.IMREAD_COLOR)
+        frame = decode_frame(image_bytes, target_side=0)
+        return None if frame is None else frame.bgr
 
     @staticmethod
     def decode_base64_image(b64: str):
@@ -111,9 +272,10 @@ class FacialRecognitionService:
             return None
 
     @staticmethod
-    def calculate_image_quality(img):
+    def calculate_image_quality(img, gray=None):
         """Simple quality score based on sharpness and contrast"""
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         sharp = cv2.Laplacian(gray, cv2.CV_64F).var()
         contrast = gray.std()
         return min(100, (sharp/100)*50 + (contrast/50)*50)
@@ -133,6 +295,9 @@ class FacialRecognitionService:
         if not faces or len(faces) != 1:
             return "unknown", 0.0
         face = faces[0]
+        if face.pose is None:
+            # Pack/module không có landmark_3d_68 thì không ước lượng được góc
+            return "unknown", 0.0
         pitch, yaw, roll = face.pose[0], face.pose[1], face.pose[2]
         pose_type = FacialRecognitionService._get_pose_from_angles(pitch, yaw, roll)
         return pose_type, 0.0
@@ -140,23 +305,33 @@ class FacialRecognitionService:
     @staticmethod
     def generate_face_encoding_with_metadata(file_like, pose_type=None, employee_id=None):
         """Generate face encoding with metadata"""
-        img = FacialRecognitionService._bytes_to_image(file_like.read())
-        if img is None:
+        # Ảnh training luôn giải mã ở độ phân giải gốc
+        frame = decode_frame(file_like.read(), target_side=0)
+        if frame is None:
             return False, "Invalid image", None, None
+        return FacialRecognitionService.generate_face_encoding_from_frame(frame, pose_type, employee_id)
+
+    @staticmethod
+    def generate_face_encoding_from_frame(frame: Frame, pose_type=None, employee_id=None):
+        """Generate face encoding with metadata from an already decoded Frame"""
+        img = frame.bgr
 
         # Check lighting
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        if gray.mean() < 50:
+        if frame.gray.mean() < 50:
             return False, "Insufficient lighting", None, None
 
         # Detect face and generate embedding
-        faces = _face_analyzer.get(img)
+        faces = get_face_analyzer().get(img)
         if not faces or len(faces) != 1:
             return False, "Please ensure exactly one face is visible", None, None
 
         face = faces[0]
-        embedding = face.embedding.astype(np.float32).tobytes()
-        quality = FacialRecognitionService.calculate_image_quality(img)
+        # Lưu sẵn vector đơn vị (định dạng FaceTrainingData.ENCODING_VERSION), chuẩn gốc đi kèm metadata
+        try:
+            embedding, encoding_norm = FaceTrainingData.normalize_face_encoding(face.embedding.astype(np.float32).tobytes())
+        except ValueError:
+            return False, "Unable to compute face embedding", None, None
+        quality = FacialRecognitionService.calculate_image_quality(img, gray=frame.gray)
         
         # Auto-detect pose
         if not pose_type:
@@ -164,7 +339,8 @@ class FacialRecognitionService:
 
         metadata = {
             "pose_type": pose_type,
-            "image_quality_score": quality
+            "image_quality_score": quality,
+            "encoding_norm": encoding_norm
         }
 
         # Update training completion if needed
@@ -181,159 +357,189 @@ class FacialRecognitionService:
         return True, "Success", embedding, metadata
 
     @staticmethod
-    def detect_liveness(img, session_id: str):
+    def detect_liveness(img, session_id: str, analysis=None):
         """Enhanced liveness detection"""
-        current_time = datetime.now()
-        
-        # Clean old sessions
-        for sid in list(LIVENESS_SESSIONS.keys()):
-            if (current_time - LIVENESS_SESSIONS[sid]['last_update']).total_seconds() > SESSION_TIMEOUT_SECONDS:
-                del LIVENESS_SESSIONS[sid]
-
-        # Initialize session
-        if session_id not in LIVENESS_SESSIONS:
-            LIVENESS_SESSIONS[session_id] = {
-                'frames_data': [],
-                'liveness_passed': False,
-                'last_update': current_time,
-                'blink_detected': False,
-                'smile_detected': False,
-                'head_movement_detected': False
-            }
-
-        session_data = LIVENESS_SESSIONS[session_id]
-        session_data['last_update'] = current_time
+        if analysis is None:
+            analysis = FrameAnalysis(img)
+        current_time = time.time()
+        store = liveness_sessions()
+
+        # Load or initialize session
+        session = store.get(session_id)
+        if session is None:
+            session = LivenessSession(MAX_FRAMES_PER_SESSION)
+        session.last_update = current_time
+        if Config.FACE_TRACKING and session.track_bbox is not None and \
+           session.tracked_frames < Config.FACE_TRACK_MAX_FRAMES:
+            analysis.track_from(session.track_bbox)
+
+        live_ok, message, keep = FacialRecognitionService._advance_liveness(session, analysis, current_time)
+        if analysis.detected:
+            session.update_track(analysis.bbox, analysis.tracked)
+        if keep:
+            store.put(session_id, session)
+        else:
+            store.delete(session_id)
+        return live_ok, message
 
-        # Check lighting
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        if np.std(gray) < 10:
-            if session_id in LIVENESS_SESSIONS:
-                del LIVENESS_SESSIONS[session_id]
-            return False, "Lighting too dim"
-
-        # Extract landmarks
-        landmarks = _extract_landmarks(img)
+    @staticmethod
+    def _advance_liveness(session, analysis, current_time):
+        """Add one frame to the session state; returns (passed, message, keep_session)"""
+        # Check lighting (gray plane cached on the frame, shared with quality/landmarks)
+        if np.std(analysis.frame.gray) < 10:
+            return False, "Lighting too dim", False
+
+        # Extract landmarks from the shared detection
+        landmarks = analysis.landmarks
         if landmarks is None:
-            return False, "Unable to detect face"
-
-        # Add frame data
-        session_data['frames_data'].append({
-            'timestamp': current_time,
-            'landmarks': landmarks
-        })
-
-        # Clean old frames
-        session_data['frames_data'] = [
-            f for f in session_data['frames_data']
-            if (current_time - f['timestamp']).total_seconds() <= SESSION_TIMEOUT_SECONDS
-        ]
-        
-        if len(session_data['frames_data']) > MAX_FRAMES_PER_SESSION:
-            session_data['frames_data'].pop(0)
-
-        # Check liveness actions
-        if not session_data['liveness_passed']:
-            checker = FacialRecognitionService.liveness_checker
-
-            # Check blink
-            if not session_data['blink_detected']:
-                for frame_data in session_data['frames_data']:
-                    if checker.detect_blink(frame_data['landmarks']):
-                        session_data['blink_detected'] = True
-                        break
-
-            # Check smile  
-            if not session_data['smile_detected']:
-                for frame_data in session_data['frames_data']:
-                    if checker.detect_smile(frame_data['landmarks']):
-                        session_data['smile_detected'] = True
-                        break
-
-            # Check head movement
-            if not session_data['head_movement_detected']:
-                if checker.detect_head_movement(session_data['frames_data']):
-                    session_data['head_movement_detected'] = True
-
-            # Pass if any action detected
-            actions_detected = [
-                session_data['blink_detected'],
-                session_data['smile_detected'], 
-                session_data['head_movement_detected']
-            ]
-            
-            if any(actions_detected):
-                session_data['liveness_passed'] = True
-                detected = [a for a, d in zip(['blink', 'smile', 'head movement'], actions_detected) if d]
-                return True, f"Liveness passed: {', '.join(detected)}"
+            return False, "Unable to detect face", True
+
+        # Keep the best-quality aligned crop for the single recognition pass
+        quality = analysis.face_quality
+        if quality > session.best_quality:
+            session.best_quality = quality
+            session.best_crop = analysis.aligned_crop
+            session.best_pose = analysis.pose_type
+            if analysis.embedded:
+                # Crop này đã qua model recognition (vd. lúc kiểm tra cache kết quả): không chạy lại
+                session.embedding, session.embedding_quality = analysis.embedding, quality
+
+        # Drop frames that left the time window, then add this frame's features (ring buffer)
+        session.expire(current_time, SESSION_TIMEOUT_SECONDS)
+        session.add_frame(current_time, FacialRecognitionService.liveness_checker.frame_features(
+            landmarks, analysis.frame.reduction))
+
+        # Check liveness actions on the new frame only
+        if not session.liveness_passed:
+            detected = session.update_actions()
+            if detected:
+                session.liveness_passed = True
+                return True, f"Liveness passed: {', '.join(detected)}", True
             else:
                 # Check timeout
-                if session_data['frames_data'] and \
-                   (current_time - session_data['frames_data'][0]['timestamp']).total_seconds() > SESSION_TIMEOUT_SECONDS:
-                    del LIVENESS_SESSIONS[session_id]
-                    return False, "Liveness timeout. Please blink, smile, or move your head."
-                return False, "Please blink, smile, or gently move your head."
+                if current_time - session.oldest_timestamp > SESSION_TIMEOUT_SECONDS:
+                    return False, "Liveness timeout. Please blink, smile, or move your head.", False
+                return False, "Please blink, smile, or gently move your head.", True
         
-        return True, "Liveness check successful"
+        return True, "Liveness check successful", True
 
     @staticmethod
-    def recognize_face_with_multiple_encodings(img):
+    def recognize_face_with_multiple_encodings(img, analysis=None):
         """Face recognition with multiple encodings"""
-        faces = _face_analyzer.get(img)
-        if not faces or len(faces) != 1:
+        if analysis is None:
+            analysis = FrameAnalysis(img)
+        if analysis.face is None:
             return False, "Image must contain exactly one face", None
+        return FacialRecognitionService.match_embedding(analysis.embedding, analysis.pose_type)
 
-        # Normalize query embedding
-        query_embedding = faces[0].embedding.astype(np.float32)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+    @staticmethod
+    def _session_query_embedding(session_id: str, analysis):
+        """(embedding, pose type) of the best frame of a liveness session, embedded once per session.
+
+        It is only recomputed when a clearly better frame arrived after a failed match.
+        """
+        store = liveness_sessions()
+        session = store.get(session_id)
+        if session is None or session.best_crop is None:
+            return analysis.embedding, analysis.pose_type
+
+        if session.embedding is None or \
+           session.best_quality > session.embedding_quality + BEST_FRAME_QUALITY_MARGIN:
+            session.embedding = _embed_aligned_crops([session.best_crop])[0]
+            session.embedding_quality = session.best_quality
+            store.put(session_id, session)
+        return session.embedding, session.best_pose
 
-        # Get active employees with completed training
-        employees = Employee.query.filter_by(status=True, face_training_completed=True).all()
-        if not employees:
+    @staticmethod
+    def match_embedding(query_embedding, query_pose=None):
+        """Match a unit-normalized embedding against enrolled employees (`query_pose`: estimated pose type)"""
+        # Match against the in-memory gallery of active, fully trained employees
+        face_gallery.sync()
+        if face_gallery.size == 0:
             return False, "No employees have completed face training", None
 
-        best_match = {"distance": float("inf"), "employee": None}
-
-        for emp in employees:
-            training_data_list = FaceTrainingData.get_employee_encodings(emp.employee_id)
-            if not training_data_list:
-                continue
-
-            for d in training_data_list:
-                try:
-                    stored_embedding = np.frombuffer(d.face_encoding, dtype=np.float32)
-                    if stored_embedding.shape[0] != 512:
-                        continue
-                    stored_embedding = stored_embedding / np.linalg.norm(stored_embedding)
-                except Exception:
-                    continue
-
-                # Filter by quality
-                if d.image_quality_score is not None and d.image_quality_score < 35:
-                    continue
-
-                # Calculate cosine distance
-                cos_sim = np.dot(query_embedding, stored_embedding)
-                distance = 1 - cos_sim
-
-                if distance < best_match["distance"]:
-                    best_match["distance"] = distance
-                    best_match["employee"] = emp
+        best_employee_id, best_distance = face_gallery.search(query_embedding, query_pose)
+        best_match = {"distance": best_distance, "employee": None}
+        if best_employee_id is not None:
+            best_match["employee"] = Employee.query.filter_by(employee_id=best_employee_id).first()
 
         # Check threshold
-        THRESHOLD = 0.35
-        if best_match["employee"] and best_match["distance"] < THRESHOLD:
+        if best_match["employee"] and best_match["distance"] < RECOGNITION_THRESHOLD:
             print(f"Tìm thấy khớp: {best_match['employee'].employee_id} – Khoảng cách: {best_match['distance']:.4f}")
             return True, "Face recognized successfully", best_match["employee"]
         else:
             return False, "Face does not match any registered employee", None
 
     @staticmethod
-    def recognize_face_with_liveness(img, session_id: str):
-        """Recognition with liveness check"""
-        live_ok, live_msg = FacialRecognitionService.detect_liveness(img, session_id)
+    def recognize_face_with_liveness(img, session_id: str, analysis=None):
+        """Recognition with liveness check.
+
+        Frames only run detection + landmarks until liveness passes; the
+        recognition model then runs once on the best frame of the session.
+        """
+        if analysis is None:
+            analysis = FrameAnalysis(img)
+        live_ok, live_msg = FacialRecognitionService.detect_liveness(img, session_id, analysis)
         if not live_ok:
             return False, live_msg, None
-        return FacialRecognitionService.recognize_face_with_multiple_encodings(img)
+        if analysis.face is None:
+            return False, "Image must contain exactly one face", None
+        query_embedding, query_pose = FacialRecognitionService._session_query_embedding(session_id, analysis)
+        return FacialRecognitionService.match_embedding(query_embedding, query_pose)
+
+    # ---------------- Recognition result cache ----------------
+    @staticmethod
+    def cached_result(img, session_id: str, analysis=None):
+        """(result, error, status) already decided in this session, or None.
+
+        Only served while the frame is still recognized as the employee of the
+        cached outcome: one face around the tracked box, its embedding matched
+        against the in-memory gallery at the recognition threshold. Anyone else
+        (or no face) drops the cached outcome. A hit skips the employee lookup
+        and the attendance logic, not the recognition model. Pass the frame's
+        `analysis` on to recognize_face_with_liveness after a miss so the
+        detection and the embedding are not computed twice.
+        """
+        if Config.FACE_RESULT_CACHE_TTL_SECONDS <= 0:
+            return None
+        store = liveness_sessions()
+        session = store.get(session_id)
+        if session is None or session.result is None or time.time() > session.result_expires:
+            return None
+
+        if analysis is None:
+            analysis = FrameAnalysis(img)
+        # Cùng điều kiện với detect_liveness: lượt detection này được pipeline đầy đủ dùng lại
+        if Config.FACE_TRACKING and session.track_bbox is not None and \
+           session.tracked_frames < Config.FACE_TRACK_MAX_FRAMES:
+            analysis.track_from(session.track_bbox)
+        if analysis.face is not None:
+            face_gallery.sync()
+            employee_id, distance = face_gallery.search(analysis.embedding, analysis.pose_type)
+            if employee_id == session.result_employee_id and distance < RECOGNITION_THRESHOLD:
+                outcome = session.result
+                return outcome['result'], outcome['error'], outcome['status']
+        session.result, session.result_employee_id = None, None
+        store.put(session_id, session)
+        return None
+
+    @staticmethod
+    def cache_result(session_id: str, employee_id, result, error, status):
+        """Remember the attendance outcome decided for `employee_id` for the next frames of the session"""
+        if Config.FACE_RESULT_CACHE_TTL_SECONDS <= 0 or status >= 500 or not employee_id:
+            return
+        store = liveness_sessions()
+        session = store.get(session_id)
+        if session is None:
+            return
+        session.result = {
+            'result': None if result is None else dict(result, cached=True),
+            'error': None if error is None else dict(error, cached=True),
+            'status': status,
+        }
+        session.result_employee_id = employee_id
+        session.result_expires = time.time() + min(Config.FACE_RESULT_CACHE_TTL_SECONDS, SESSION_TIMEOUT_SECONDS)
+        store.put(session_id, session)
 
     @staticmethod  
     def get_required_poses():
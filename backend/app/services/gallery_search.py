@@ -0,0 +1,252 @@
+import numpy as np
+
+# --------------------------------------------------
+# Search backends for FaceGallery
+# --------------------------------------------------
+# A backend receives the gallery's (N, D) matrix of unit vectors on every call,
+# so it never owns a copy of the embeddings. It is told which rows changed
+# (`mark_rows`) and when the whole matrix was replaced (`rebuild`). `search`
+# also gets the row labels (`employee_ids`, `pose_types`) and the query's
+# estimated pose (`query_pose`); only the centroid backend uses them.
+# `ranks_by_similarity` tells whether the k rows returned are the best by plain
+# cosine among the rows scored; compact gallery storage relies on it to bound
+# which rows need an exact rescore.
+
+class ExactSearchBackend:
+    """Brute-force cosine search: one matrix-vector product over all rows"""
+    name = "exact"
+    ranks_by_similarity = True
+
+    def rebuild(self, vectors):
+        pass
+
+    def mark_rows(self, rows):
+        pass
+
+    def describe(self):
+        return {"backend": self.name}
+
+    def search(self, vectors, query, k=1, **labels):
+        """Return (rows, similarities) of the k best rows, best first"""
+        return _exact_search(vectors, query, k)
+
+
+class IVFSearchBackend:
+    """Inverted-file index: rows are bucketed by their nearest k-means centroid and
+    a query only scores the rows of its `nprobe` closest buckets.
+
+    Rows changed since the last assignment are kept in a small "dirty" set that is
+    always scored exhaustively, so deltas from FaceGallery stay correct without an
+    immediate re-index. The buckets are re-assigned once the dirty set grows past
+    `reassign_ratio` of the gallery, and the centroids are retrained once the
+    gallery size has changed by more than 2x.
+    """
+    name = "ivf"
+    ranks_by_similarity = True
+
+    def __init__(self, nlist=64, nprobe=8, train_iterations=10, reassign_ratio=0.05, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.reassign_ratio = reassign_ratio
+        self.seed = seed
+        self._centroids = None
+        self._trained_size = 0
+        self._reset_lists()
+
+    def _reset_lists(self):
+        self._order = np.empty(0, dtype=np.int64)    # row ids sorted by bucket
+        self._offsets = np.zeros(1, dtype=np.int64)  # bucket b = _order[_offsets[b]:_offsets[b+1]]
+        self._clean = np.zeros(0, dtype=bool)        # rows whose bucket is up to date
+        self._dirty = set()
+        self._needs_assign = True
+
+    def describe(self):
+        return {"backend": self.name, "nlist": self.nlist, "nprobe": self.nprobe,
+                "trained": self._centroids is not None, "dirty_rows": len(self._dirty)}
+
+    def _train(self, vectors):
+        """Spherical k-means on (a sample of) the gallery"""
+        rng = np.random.default_rng(self.seed)
+        n = vectors.shape[0]
+        nlist = min(self.nlist, n)
+        sample_size = min(n, 256 * nlist)
+        sample = vectors[rng.choice(n, sample_size, replace=False)] if sample_size < n else vectors[:n]
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Bucket rỗng: khởi tạo lại bằng một vector ngẫu nhiên của mẫu
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self._centroids = centroids.astype(np.float32)
+        self._trained_size = n
+
+    def _assign(self, vectors):
+        n = vectors.shape[0]
+        buckets = np.argmax(vectors @ self._centroids.T, axis=1) if n else np.empty(0, dtype=np.int64)
+        self._order = np.argsort(buckets, kind="stable")
+        counts = np.bincount(buckets, minlength=self._centroids.shape[0])
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._clean = np.ones(n, dtype=bool)
+        self._dirty = set()
+        self._needs_assign = False
+
+    def rebuild(self, vectors):
+        self._centroids = None
+        self._reset_lists()
+
+    def mark_rows(self, rows):
+        for row in rows:
+            if row < self._clean.shape[0]:
+                self._clean[row] = False
+            self._dirty.add(row)
+        if len(self._dirty) > max(32, self.reassign_ratio * self._clean.shape[0]):
+            self._needs_assign = True
+
+    def _prepare(self, vectors):
+        n = vectors.shape[0]
+        if self._centroids is None or n > 2 * self._trained_size or 2 * n < self._trained_size:
+            self._train(vectors)
+            self._needs_assign = True
+        if self._needs_assign:
+            self._assign(vectors)
+
+    def search(self, vectors, query, k=1, **labels):
+        n = vectors.shape[0]
+        if n <= self.nlist * 4:
+            # Gallery quá nhỏ để chia bucket: tìm kiếm đầy đủ
+            return _exact_search(vectors, query, k)
+        self._prepare(vectors)
+
+        nprobe = min(self.nprobe, self._centroids.shape[0])
+        probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self._order[self._offsets[b]:self._offsets[b + 1]] for b in probe])
+        candidates = candidates[candidates < n]
+        candidates = candidates[self._clean[candidates]]
+
+        # Các dòng mới hoặc vừa thay đổi luôn được chấm điểm
+        extra = [row for row in self._dirty if row < n]
+        extra.extend(range(self._clean.shape[0], n))
+        if extra:
+            candidates = np.unique(np.concatenate((candidates, np.asarray(extra, dtype=np.int64))))
+        if candidates.shape[0] == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        return _top_k(candidates, vectors[candidates] @ query, k)
+
+
+class CentroidSearchBackend:
+    """Two-stage search over employees instead of rows.
+
+    Stage one scores one unit-normalized centroid per employee (the mean of
+    their pose embeddings) and keeps the `shortlist` best employees. Stage two
+    scores every pose row of those employees only. When the query pose is
+    known, the row of the same pose gets `pose_weight` added to its score for
+    ranking; the similarity returned (and so the distance compared with the
+    recognition threshold) is always the plain cosine of the employee's best row.
+
+    Centroids are recomputed lazily on the first search after a change.
+    """
+    name = "centroid"
+    ranks_by_similarity = False
+
+    def __init__(self, shortlist=10, pose_weight=0.05):
+        self.shortlist = shortlist
+        self.pose_weight = pose_weight
+        self._stale = True
+        self._centroids = None
+        self._order = np.empty(0, dtype=np.int64)    # row ids sorted by employee
+        self._offsets = np.zeros(1, dtype=np.int64)  # employee g = _order[_offsets[g]:_offsets[g+1]]
+
+    def describe(self):
+        return {"backend": self.name, "shortlist": self.shortlist, "pose_weight": self.pose_weight,
+                "employees": 0 if self._centroids is None else self._centroids.shape[0]}
+
+    def rebuild(self, vectors):
+        self._stale = True
+
+    def mark_rows(self, rows):
+        self._stale = True
+
+    def _prepare(self, vectors, employee_ids):
+        _, groups = np.unique(employee_ids.astype(str), return_inverse=True)
+        self._order = np.argsort(groups, kind="stable")
+        counts = np.bincount(groups)
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        sums = np.add.reduceat(vectors[self._order], self._offsets[:-1], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        self._centroids = (sums / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+        self._stale = False
+
+    def search(self, vectors, query, k=1, employee_ids=None, pose_types=None, query_pose=None):
+        n = vectors.shape[0]
+        if employee_ids is None or n == 0:
+            return _exact_search(vectors, query, k)
+        if self._stale or self._offsets[-1] != n:
+            self._prepare(vectors, employee_ids)
+
+        # Stage 1: shortlist of employees by centroid similarity
+        employees = self._centroids.shape[0]
+        shortlist = min(max(self.shortlist, k), employees)
+        if shortlist < employees:
+            candidates = np.argpartition(-(self._centroids @ query), shortlist - 1)[:shortlist]
+        else:
+            candidates = np.arange(employees)
+
+        # Stage 2: every pose row of the shortlisted employees
+        starts, ends = self._offsets[candidates], self._offsets[candidates + 1]
+        rows = np.concatenate([self._order[a:b] for a, b in zip(starts, ends)])
+        scores = vectors[rows] @ query
+        ranking = scores
+        if query_pose is not None and pose_types is not None and self.pose_weight:
+            ranking = scores + self.pose_weight * (pose_types[rows] == query_pose)
+
+        # Mỗi nhân viên: điểm xếp hạng = max các pose (đã cộng trọng số), dòng trả về = dòng có cosine cao nhất
+        segments = np.concatenate(([0], np.cumsum(ends - starts)[:-1]))
+        employee_rank = np.maximum.reduceat(ranking, segments)
+        best_rows, best_scores = [], []
+        for start, length in zip(segments, ends - starts):
+            i = start + int(np.argmax(scores[start:start + length]))
+            best_rows.append(rows[i])
+            best_scores.append(scores[i])
+        top, _ = _top_k(np.arange(candidates.shape[0]), employee_rank, k)
+        return np.asarray(best_rows, dtype=np.int64)[top], np.asarray(best_scores, dtype=np.float32)[top]
+
+
+def _exact_search(vectors, query, k):
+    n = vectors.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return _top_k(np.arange(n), vectors @ query, k)
+
+
+def _top_k(rows, scores, k):
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(scores.shape[0])
+    part = part[np.argsort(-scores[part], kind="stable")]
+    return rows[part], scores[part]
+
+
+SEARCH_BACKENDS = {
+    ExactSearchBackend.name: ExactSearchBackend,
+    IVFSearchBackend.name: IVFSearchBackend,
+    CentroidSearchBackend.name: CentroidSearchBackend,
+}
+
+
+def create_search_backend(name="exact", **options):
+    """Create a backend by its Settings name ('exact', 'ivf' or 'centroid')"""
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown gallery search backend: {name}. Must be one of {list(SEARCH_BACKENDS)}")
+    if name == IVFSearchBackend.name:
+        return IVFSearchBackend(**options)
+    if name == CentroidSearchBackend.name:
+        return CentroidSearchBackend(**options)
+    return ExactSearchBackend()
@@ -0,0 +1,131 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# --------------------------------------------------
+# On-disk snapshot of the face gallery
+# --------------------------------------------------
+# A cold worker would otherwise read every FaceTrainingData.face_encoding BLOB
+# from the database and normalize it. The snapshot holds the gallery ready to
+# use:
+#   b'FGSN' | u32 header length | JSON header | sections aligned to 64 bytes
+# The header has the schema version, the FaceGalleryChange generation the
+# content corresponds to, and the (offset, dtype, shape) of each section:
+#   vectors       (N, D) unit vectors, float32 or float16
+#   employee_ids  (N,) fixed-width UTF-8
+#   pose_types    (N,) fixed-width UTF-8
+#   quality       (N,) float32 image quality scores (NaN = unknown)
+# Files are replaced atomically (write to a temporary file, then os.replace), so
+# a worker never maps a half-written snapshot. float32 vectors are memory-mapped
+# read-only and used in place: every worker maps the same page-cache pages
+# instead of holding its own copy. float16 halves the file but is converted
+# to float32 on load.
+
+SNAPSHOT_MAGIC = b'FGSN'
+SNAPSHOT_SCHEMA = 1
+SNAPSHOT_DTYPES = ('float32', 'float16')
+_ALIGN = 64
+_SECTIONS = {'vectors', 'employee_ids', 'pose_types', 'quality'}
+
+
+class GallerySnapshot:
+    """Arrays of a mapped snapshot; `vectors` is a read-only view of the file when stored as float32"""
+
+    def __init__(self, generation, vectors, employee_ids, pose_types, quality, path=None):
+        self.generation = generation
+        self.vectors = vectors
+        self.employee_ids = employee_ids
+        self.pose_types = pose_types
+        self.quality = quality
+        self.path = path
+
+    @property
+    def size(self):
+        return self.vectors.shape[0]
+
+
+def _text_array(values):
+    encoded = [str(v).encode('utf-8') for v in values]
+    width = max((len(v) for v in encoded), default=1)
+    return np.array(encoded, dtype=f'S{max(width, 1)}')
+
+
+def write_snapshot(path, generation, vectors, employee_ids, pose_types, quality=None, dtype='float32'):
+    """Write the gallery arrays to `path` atomically"""
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Snapshot dtype must be one of {SNAPSHOT_DTYPES}")
+    count = vectors.shape[0]
+    if quality is None:
+        quality = np.full(count, np.nan, dtype=np.float32)
+    sections = {
+        'vectors': np.ascontiguousarray(vectors, dtype=dtype),
+        'employee_ids': _text_array(employee_ids),
+        'pose_types': _text_array(pose_types),
+        'quality': np.asarray(quality, dtype=np.float32),
+    }
+
+    # Offset tính từ đầu file và nằm trong chính header: lặp đến khi độ dài header không đổi
+    header = {'schema': SNAPSHOT_SCHEMA, 'generation': int(generation), 'count': int(count),
+              'dim': int(vectors.shape[1]) if vectors.ndim == 2 else 0, 'sections': {}}
+    while True:
+        header_bytes = json.dumps(header, separators=(',', ':')).encode()
+        offset = -(-(8 + len(header_bytes)) // _ALIGN) * _ALIGN
+        layout = {}
+        for name, array in sections.items():
+            layout[name] = [offset, array.dtype.str, list(array.shape)]
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        if layout == header['sections']:
+            break
+        header['sections'] = layout
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        for name, array in sections.items():
+            f.seek(header['sections'][name][0])
+            f.write(array.tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, dim=None):
+    """Map a snapshot; None when the file is missing, of another schema/dim or inconsistent"""
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if buffer[:4] != SNAPSHOT_MAGIC:
+            return None
+        (header_len,) = struct.unpack_from('<I', buffer, 4)
+        header = json.loads(bytes(buffer[8:8 + header_len]))
+        if header.get('schema') != SNAPSHOT_SCHEMA or (dim is not None and header['dim'] != dim):
+            return None
+        arrays = {}
+        for name, (offset, dtype, shape) in header['sections'].items():
+            count = int(np.prod(shape))
+            if offset + count * np.dtype(dtype).itemsize > len(buffer):
+                return None  # file bị cắt ngắn
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
+    if set(arrays) != _SECTIONS or any(array.shape[0] != header['count'] for array in arrays.values()):
+        return None
+
+    vectors = arrays['vectors']
+    if vectors.dtype != np.float32:
+        vectors = vectors.astype(np.float32)
+    return GallerySnapshot(
+        header['generation'],
+        vectors,
+        np.array([v.decode('utf-8') for v in arrays['employee_ids']], dtype=object),
+        np.array([v.decode('utf-8') for v in arrays['pose_types']], dtype=object),
+        arrays['quality'],
+        path=path,
+    )
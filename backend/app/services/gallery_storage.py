@@ -0,0 +1,262 @@
+import numpy as np
+
+# --------------------------------------------------
+# Embedding storage for FaceGallery
+# --------------------------------------------------
+# float32 - the unit vectors themselves (default); search scores are exact.
+# float16 / int8 - compact codes for the first-pass search (2x / ~4x smaller,
+#   int8 with one scale per vector). Each row also keeps a bound on how far its
+#   approximate score can be from the exact one (`residuals`), and the exact
+#   float32 rows stay available for rescoring the few candidates that matter.
+#   After `adopt` those exact rows are read from the memory-mapped snapshot
+#   (pages shared by every worker of the host, only touched for candidates);
+#   rows written later are kept in a small per-process overlay.
+# A storage is addressed by row like the gallery and never moves rows by itself.
+
+RESIDUAL_EPSILON = 1e-5  # marge cho sai số làm tròn float32 của phép nhân ma trận xấp xỉ
+
+
+class Float32Storage:
+    precision = "float32"
+    exact_scores = True
+
+    def __init__(self, dim, capacity):
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+
+    @property
+    def capacity(self):
+        return self._vectors.shape[0]
+
+    @property
+    def writable(self):
+        return self._vectors.flags.writeable
+
+    def nbytes(self, size):
+        """Bytes of this process' own memory (a mapped snapshot is not counted)"""
+        return self._vectors.nbytes if self.writable else 0
+
+    def grow(self, capacity, size):
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:size] = self._vectors[:size]
+        self._vectors = vectors
+
+    def set_row(self, row, vector):
+        self._vectors[row] = vector
+
+    def set_rows(self, start, vectors):
+        self._vectors[start:start + vectors.shape[0]] = vectors
+
+    def move_row(self, source, target):
+        self._vectors[target] = self._vectors[source]
+
+    def release_row(self, row):
+        pass
+
+    def adopt(self, vectors):
+        self._vectors = vectors
+
+    def search_matrix(self, size):
+        return self._vectors[:size]
+
+    def exact(self, rows):
+        return self._vectors[rows]
+
+    def exact_matrix(self, size):
+        return self._vectors[:size]
+
+    def vectors(self, size):
+        return self._vectors[:size]
+
+
+class CompactMatrix:
+    """Read-only (N, D) view of compact codes, usable by the search backends like a float32 matrix.
+
+    `matrix @ x` and `matrix[rows]` decode in chunks of CHUNK_ROWS rows, so a
+    full scan never materializes the whole float32 matrix.
+    """
+    CHUNK_ROWS = 4096
+
+    def __init__(self, codes, scales):
+        self._codes = codes
+        self._scales = scales
+
+    @property
+    def shape(self):
+        return self._codes.shape
+
+    def __len__(self):
+        return self._codes.shape[0]
+
+    def __getitem__(self, rows):
+        scales = self._scales[rows]
+        return self._codes[rows].astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+
+    def __matmul__(self, other):
+        n = self._codes.shape[0]
+        out = np.empty((n,) + other.shape[1:], dtype=np.float32)
+        for start in range(0, n, self.CHUNK_ROWS):
+            end = min(start + self.CHUNK_ROWS, n)
+            scores = self._codes[start:end].astype(np.float32) @ other
+            scales = self._scales[start:end]
+            out[start:end] = scores * (scales[:, None] if scores.ndim == 2 else scales)
+        return out
+
+
+class ExactRows:
+    """Read-only (N, D) view of a storage's exact float32 rows, fetched only when indexed"""
+
+    def __init__(self, storage, size):
+        self._storage = storage
+        self._size = size
+
+    @property
+    def shape(self):
+        return (self._size, self._storage.dim)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, rows):
+        return self._storage.exact(np.arange(self._size)[rows])
+
+    def __matmul__(self, other):
+        out = np.empty((self._size,) + other.shape[1:], dtype=np.float32)
+        for start in range(0, self._size, CompactMatrix.CHUNK_ROWS):
+            end = min(start + CompactMatrix.CHUNK_ROWS, self._size)
+            out[start:end] = self._storage.exact(np.arange(start, end)) @ other
+        return out
+
+
+class CompactStorage:
+    exact_scores = False
+
+    def __init__(self, dim, capacity, precision="int8"):
+        if precision not in ("float16", "int8"):
+            raise ValueError("Compact storage precision must be 'float16' or 'int8'")
+        self.dim = dim
+        self.precision = precision
+        self._codes = np.empty((capacity, dim), dtype=np.float16 if precision == "float16" else np.int8)
+        self._scales = np.ones(capacity, dtype=np.float32)
+        self._residuals = np.zeros(capacity, dtype=np.float32)
+        self._base = None                                      # float32 (M, D), thường là mmap của snapshot
+        self._base_rows = np.full(capacity, -1, dtype=np.int64)  # row -> dòng của _base, -1 = trong overlay
+        self._overlay = {}                                     # row -> float32 vector
+
+    @property
+    def capacity(self):
+        return self._codes.shape[0]
+
+    @property
+    def writable(self):
+        return True
+
+    def nbytes(self, size):
+        own = self._codes.nbytes + self._scales.nbytes + self._residuals.nbytes + self._base_rows.nbytes
+        own += sum(v.nbytes for v in self._overlay.values())
+        if self._base is not None and self._base.flags.writeable:
+            own += self._base.nbytes  # bản float32 riêng (không phải mmap)
+        return own
+
+    def encode(self, vectors):
+        """(codes, scales, residual norms) of float32 unit vectors (M, D)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.precision == "float16":
+            codes = vectors.astype(np.float16)
+            scales = np.ones(vectors.shape[0], dtype=np.float32)
+        else:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            scales = scales.astype(np.float32)
+        decoded = codes.astype(np.float32) * scales[:, None]
+        # |q·x - q·x̂| <= ||x - x̂|| với truy vấn q có chuẩn 1
+        residuals = np.linalg.norm(vectors - decoded, axis=1) + RESIDUAL_EPSILON
+        return codes, scales, residuals.astype(np.float32)
+
+    def grow(self, capacity, size):
+        codes = np.empty((capacity, self.dim), dtype=self._codes.dtype)
+        codes[:size] = self._codes[:size]
+        scales, residuals = np.ones(capacity, dtype=np.float32), np.zeros(capacity, dtype=np.float32)
+        scales[:size], residuals[:size] = self._scales[:size], self._residuals[:size]
+        base_rows = np.full(capacity, -1, dtype=np.int64)
+        base_rows[:size] = self._base_rows[:size]
+        self._codes, self._scales, self._residuals, self._base_rows = codes, scales, residuals, base_rows
+
+    def set_row(self, row, vector):
+        codes, scales, residuals = self.encode(vector[None])
+        self._codes[row], self._scales[row], self._residuals[row] = codes[0], scales[0], residuals[0]
+        self._base_rows[row] = -1
+        self._overlay[row] = np.array(vector, dtype=np.float32)
+
+    def set_rows(self, start, vectors):
+        vectors = np.array(vectors, dtype=np.float32)
+        end = start + vectors.shape[0]
+        for chunk in range(start, end, CompactMatrix.CHUNK_ROWS):
+            stop = min(chunk + CompactMatrix.CHUNK_ROWS, end)
+            codes, scales, residuals = self.encode(vectors[chunk - start:stop - start])
+            self._codes[chunk:stop], self._scales[chunk:stop], self._residuals[chunk:stop] = codes, scales, residuals
+        self._base_rows[start:end] = -1
+        self._overlay.update(zip(range(start, end), vectors))
+
+    def move_row(self, source, target):
+        self._codes[target] = self._codes[source]
+        self._scales[target] = self._scales[source]
+        self._residuals[target] = self._residuals[source]
+        self._base_rows[target] = self._base_rows[source]
+        self._overlay.pop(target, None)
+        if source in self._overlay:
+            self._overlay[target] = self._overlay.pop(source)
+
+    def release_row(self, row):
+        self._overlay.pop(row, None)
+        self._base_rows[row] = -1
+
+    def adopt(self, vectors):
+        """Encode `vectors` (e.g. the mapped snapshot matrix) and keep them as the exact rows"""
+        n = vectors.shape[0]
+        if n > self.capacity:
+            self.grow(n, 0)
+        for start in range(0, n, CompactMatrix.CHUNK_ROWS):
+            end = min(start + CompactMatrix.CHUNK_ROWS, n)
+            codes, scales, residuals = self.encode(vectors[start:end])
+            self._codes[start:end], self._scales[start:end], self._residuals[start:end] = codes, scales, residuals
+        self._base = vectors
+        self._base_rows[:n] = np.arange(n)
+        self._overlay = {}
+
+    def search_matrix(self, size):
+        return CompactMatrix(self._codes[:size], self._scales[:size])
+
+    def residuals(self, size):
+        return self._residuals[:size]
+
+    def exact(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((rows.shape[0], self.dim), dtype=np.float32)
+        base_rows = self._base_rows[rows]
+        in_base = base_rows >= 0
+        if in_base.any():
+            out[in_base] = self._base[base_rows[in_base]]
+        for i in np.flatnonzero(~in_base):
+            out[i] = self._overlay[int(rows[i])]
+        return out
+
+    def exact_matrix(self, size):
+        return ExactRows(self, size)
+
+    def vectors(self, size):
+        """Exact float32 rows (a copy)"""
+        return self.exact(np.arange(size))
+
+
+GALLERY_STORAGES = ("float32", "float16", "int8")
+
+
+def create_gallery_storage(precision, dim, capacity):
+    """Create the row storage for a Config.FACE_GALLERY_PRECISION value"""
+    if precision not in GALLERY_STORAGES:
+        raise ValueError(f"Unknown gallery precision: {precision}. Must be one of {list(GALLERY_STORAGES)}")
+    if precision == "float32":
+        return Float32Storage(dim, capacity)
+    return CompactStorage(dim, capacity, precision)
@@ -0,0 +1,143 @@
+import base64
+import cv2
+import numpy as np
+
+from app.config import Config
+
+# --------------------------------------------------
+# Request image ingest
+# --------------------------------------------------
+# Every request image is decoded exactly once, already at the resolution the
+# pipeline needs: for JPEG, OpenCV's IMREAD_REDUCED_* flags let libjpeg scale
+# the DCT blocks by 1/2, 1/4 or 1/8 while decoding, which is much cheaper than
+# decoding at full size and resizing. Derived planes (grayscale) are cached on
+# the Frame so the lighting check, quality score and landmarks share them.
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# Marker SOF (start of frame) chứa kích thước ảnh; C4/C8/CC là DHT/JPG/DAC, không phải SOF
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class Frame:
+    """A decoded request image plus lazily derived planes shared by all checks"""
+
+    def __init__(self, bgr, raw_bytes=None, reduction=1, is_jpeg=False):
+        self.bgr = bgr
+        self.raw_bytes = raw_bytes
+        self.reduction = reduction  # ảnh đã được thu nhỏ 1/reduction khi giải mã
+        self.is_jpeg = is_jpeg
+        self._gray = None
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def jpeg_bytes(self, quality=90):
+        """JPEG bytes of the image; an unreduced JPEG upload is returned as-is without re-encoding"""
+        if self.is_jpeg and self.reduction == 1 and self.raw_bytes is not None:
+            return self.raw_bytes
+        ok, buffer = cv2.imencode('.jpg', self.bgr, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ok:
+            raise ValueError("Cannot encode image as JPEG")
+        return buffer.tobytes()
+
+    def save_jpeg(self, path, quality=90):
+        """Write the image as JPEG (see jpeg_bytes)"""
+        with open(path, 'wb') as f:
+            f.write(self.jpeg_bytes(quality))
+        return True
+
+
+def as_frame(image):
+    """Accept a Frame or a BGR ndarray"""
+    return image if isinstance(image, Frame) else Frame(image)
+
+
+def jpeg_size(data):
+    """(width, height) read from the JPEG header without decoding, or None"""
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(view):
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:  # byte đệm
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = (view[i + 2] << 8) | view[i + 3]
+        if marker in _SOF_MARKERS:
+            height = (view[i + 5] << 8) | view[i + 6]
+            width = (view[i + 7] << 8) | view[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduction_for(size, target_side):
+    """Largest JPEG scale denominator (1, 2, 4, 8) that keeps the long side >= target_side"""
+    if not size or not target_side:
+        return 1
+    long_side = max(size)
+    reduction = 1
+    for candidate in (2, 4, 8):
+        if long_side // candidate >= target_side:
+            reduction = candidate
+    return reduction
+
+
+def decode_frame(raw_bytes, target_side=None):
+    """Decode image bytes once, reduced while decoding when larger than `target_side`.
+
+    `target_side` defaults to Config.IMAGE_INGEST_TARGET_SIDE; 0 keeps full resolution.
+    Returns None when the bytes are not a decodable image.
+    """
+    if target_side is None:
+        target_side = Config.IMAGE_INGEST_TARGET_SIDE
+    size = jpeg_size(raw_bytes)
+    reduction = reduction_for(size, target_side) if size else 1
+    bgr = cv2.imdecode(np.frombuffer(raw_bytes, np.uint8), _REDUCED_FLAGS[reduction])
+    if bgr is None:
+        return None
+    return Frame(bgr, raw_bytes=raw_bytes, reduction=reduction, is_jpeg=size is not None)
+
+
+def read_stream_into(stream, length):
+    """Read exactly `length` bytes of a request body into a new uint8 array.
+
+    Uses readinto() so the body lands directly in the NumPy buffer that
+    cv2.imdecode reads, without building intermediate bytes objects.
+    """
+    buffer = np.empty(length, dtype=np.uint8)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        n = stream.readinto(view[received:])
+        if not n:
+            raise ValueError(f"Request body ended after {received} of {length} bytes")
+        received += n
+    return buffer
+
+
+def read_request_bytes(image_file, base64_image):
+    """Raw image bytes from an uploaded file or a (data URL) base64 string"""
+    if base64_image:
+        if base64_image.startswith('data:'):
+            base64_image = base64_image.split(',', 1)[1]
+        return base64.b64decode(base64_image)
+    return image_file.read()
@@ -0,0 +1,170 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from app.config import Config
+
+# --------------------------------------------------
+# Background persistence of training images
+# --------------------------------------------------
+# Training endpoints keep the uploaded image in data/uploads, but the response
+# only depends on the embedding and the database rows. `save_frame` therefore
+# hands the decoded Frame to a writer thread and returns at once. The thread
+# takes everything queued so far (up to `max_batch`, waiting at most
+# `max_wait_ms` for stragglers) and for the whole batch:
+#   1. writes each file's bytes to a temporary file next to its target: the
+#      original upload as-is, only non-JPEG / reduced frames are encoded (here,
+#      not in the request);
+#   2. fsyncs the temporary files, then renames them over their targets;
+#   3. fsyncs each target directory once, so the renames are durable too.
+# A reader never sees a half-written image, and a burst of uploads costs one
+# directory sync per batch instead of one per file. Writes to the same path
+# are applied in submission order.
+
+
+class ImageWriter:
+    """Single writer thread shared by the request threads of one backend process"""
+
+    def __init__(self, max_batch=32, max_wait_ms=20.0, fsync=True):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.fsync = fsync
+        self._pending = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name='training-image-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, path, frame) -> Future:
+        """Queue `frame` to be stored as JPEG at `path`; resolves to the path once it is on disk"""
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Image writer is closed"))
+            return future
+        self._pending.put((path, frame, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Wait until every image queued so far is written; False on timeout"""
+        if not self._thread.is_alive():
+            return True
+        marker = Future()
+        self._pending.put(marker)
+        try:
+            marker.result(timeout=timeout)
+            return True
+        except FutureTimeoutError:
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch and isinstance(batch[-1], tuple):
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+            self._write_batch([job for job in batch if isinstance(job, tuple)])
+            for marker in batch:
+                if isinstance(marker, Future):
+                    marker.set_result(True)
+
+    def _write_batch(self, jobs):
+        staged, directories = [], set()
+        for i, (path, frame, future) in enumerate(jobs):
+            tmp_path = f"{path}.{os.getpid()}.{i}.tmp"
+            try:
+                data = frame.jpeg_bytes()
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                staged.append((path, tmp_path, future))
+            except Exception as e:
+                _discard(tmp_path)
+                print(f"Không lưu được ảnh {path}: {e}")
+                future.set_exception(e)
+
+        for path, tmp_path, future in staged:
+            try:
+                os.replace(tmp_path, path)
+                directories.add(os.path.dirname(os.path.abspath(path)))
+            except OSError as e:
+                _discard(tmp_path)
+                print(f"Không lưu được ảnh {path}: {e}")
+                future.set_exception(e)
+
+        if self.fsync:
+            for directory in directories:
+                _fsync_directory(directory)
+        for path, _, future in staged:
+            if not future.done():
+                future.set_result(path)
+
+    def shutdown(self, timeout=5.0):
+        """Write what is still queued, then stop the thread"""
+        if not self._closed:
+            self._closed = True
+            self.flush(timeout)
+            self._pending.put(None)
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _fsync_directory(directory):
+    # Không phải hệ điều hành nào cũng cho mở thư mục (Windows): bỏ qua
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_image_writer():
+    """The process-wide writer, or None when FACE_IMAGE_WRITE_ASYNC is off (write in the request thread)"""
+    global _writer
+    if not Config.FACE_IMAGE_WRITE_ASYNC:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ImageWriter(
+                    max_batch=Config.FACE_IMAGE_WRITE_MAX_BATCH,
+                    max_wait_ms=Config.FACE_IMAGE_WRITE_MAX_WAIT_MS,
+                    fsync=Config.FACE_IMAGE_WRITE_FSYNC,
+                )
+                atexit.register(_writer.shutdown)
+    return _writer
+
+
+def save_frame(frame, path):
+    """Store a training image at `path`: queued to the writer thread, or written now when async writes are off"""
+    writer = get_image_writer()
+    if writer is None:
+        frame.save_jpeg(path)
+        return None
+    return writer.save(path, frame)
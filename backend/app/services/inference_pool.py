@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from app.config import Config
+
+# --------------------------------------------------
+# Worker-process side
+# --------------------------------------------------
+# Each worker process owns one FaceAnalysis instance, created by the pool
+# initializer so the models are loaded once per process, not per job.
+_worker_analyzer = None
+
+def _init_worker():
+    global _worker_analyzer
+    from app.services.face_models import create_face_analyzer
+    _worker_analyzer = create_face_analyzer()
+
+def _detect_in_worker(image_bgr, scale, max_side):
+    from app.services.face_models import detect_faces
+    # insightface Face trả về None cho mọi thuộc tính thiếu (kể cả __setstate__)
+    # nên không unpickle được: gửi dict thường rồi dựng lại Face ở tiến trình gọi
+    return [dict(face) for face in detect_faces(_worker_analyzer, image_bgr, scale, max_side)]
+
+def _warm_up_worker():
+    from app.services.face_models import detect_faces, embed_aligned_crops, ALIGNED_CROP_SIZE
+    blank = np.zeros((ALIGNED_CROP_SIZE, ALIGNED_CROP_SIZE, 3), dtype=np.uint8)
+    detect_faces(_worker_analyzer, blank)
+    embed_aligned_crops(_worker_analyzer, [blank])
+
+def _embed_in_worker(crops):
+    from app.services.face_models import embed_aligned_crops
+    return embed_aligned_crops(_worker_analyzer, crops)
+
+# --------------------------------------------------
+# Request-process side
+# --------------------------------------------------
+class InferencePool:
+    """Pool of inference processes shared by the request threads of one backend process.
+
+    Detection jobs are dispatched one frame at a time. Aligned crops waiting for
+    the recognition model are micro-batched: the batcher thread waits until a
+    worker is free, then takes everything queued so far (up to `max_batch`,
+    waiting at most `max_wait_ms` for stragglers) and runs it as one ONNX call.
+    Under load, batches therefore grow by themselves; when idle a crop waits at
+    most `max_wait_ms`.
+
+    If a worker process dies (OOM, a crash inside onnxruntime), the executor is
+    broken for good: the jobs in flight fail, and the executor is replaced by a
+    fresh one (warmed up again) so the next requests are served normally.
+    """
+
+    def __init__(self, workers, max_batch=16, max_wait_ms=5.0, initializer=_init_worker):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._initializer = initializer
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+        self._pending = queue.Queue()
+        self._free_slots = threading.Semaphore(workers)
+        self._closed = False
+        self._batcher = threading.Thread(target=self._batch_loop, name='face-embedding-batcher', daemon=True)
+        self._batcher.start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=self._initializer,
+        )
+
+    def _replace_executor(self, broken):
+        """Swap a broken executor for a new one (once, whichever thread notices first)"""
+        with self._executor_lock:
+            if self._closed or self._executor is not broken:
+                return self._executor
+            print("Một tiến trình inference đã dừng bất thường, khởi động lại inference pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            # Khởi động và warm up lại các worker ngay, không đợi request tiếp theo
+            for _ in range(self.workers):
+                self._executor.submit(_warm_up_worker)
+            return self._executor
+
+    def _submit(self, fn, *args):
+        """Submit a job to the current executor, replacing it first if it is already broken"""
+        executor = self._executor
+        try:
+            job = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            executor = self._replace_executor(executor)
+            job = executor.submit(fn, *args)
+
+        def _check_broken(job):
+            # Đăng ký trước callback của người gọi: executor đã được thay khi lỗi tới tay họ
+            if not job.cancelled() and isinstance(job.exception(), BrokenProcessPool):
+                self._replace_executor(executor)
+
+        job.add_done_callback(_check_broken)
+        return job
+
+    def detect(self, image_bgr, scale=1.0, max_side=0) -> Future:
+        """Run detector + landmarks on one frame in a worker; resolves to a list of Face"""
+        from insightface.app.common import Face
+        future = Future()
+
+        def _deliver(job):
+            try:
+                future.set_result([Face(d) for d in job.result()])
+            except Exception as e:
+                future.set_exception(e)
+
+        try:
+            job = self._submit(_detect_in_worker, image_bgr, scale, max_side)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        job.add_done_callback(_deliver)
+        return future
+
+    def embed(self, crop) -> Future:
+        """Queue one aligned crop for the next recognition batch; resolves to a unit vector"""
+        future = Future()
+        self._pending.put((crop, future))
+        return future
+
+    def _batch_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            self._free_slots.acquire()
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            job = self._submit(_embed_in_worker, np.stack([crop for crop, _ in batch]))
+        except Exception as e:
+            self._free_slots.release()
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        def _deliver(job):
+            self._free_slots.release()
+            try:
+                embeddings = job.result()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                return
+            for future, embedding in zip(futures, embeddings):
+                future.set_result(embedding)
+
+        job.add_done_callback(_deliver)
+
+    def warm_up(self, timeout=None):
+        """Start every worker process and run one dummy inference in each"""
+        jobs = [self._submit(_warm_up_worker) for _ in range(self.workers)]
+        for job in jobs:
+            job.result(timeout=timeout)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pending.put(None)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_inference_pool():
+    """The process-wide pool, or None when FACE_INFERENCE_WORKERS is 0 (inference in the request thread)"""
+    global _pool
+    if Config.FACE_INFERENCE_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InferencePool(
+                    Config.FACE_INFERENCE_WORKERS,
+                    max_batch=Config.FACE_INFERENCE_MAX_BATCH,
+                    max_wait_ms=Config.FACE_INFERENCE_MAX_WAIT_MS,
+                )
+    return _pool
@@ -0,0 +1,92 @@
+import numpy as np
+
+from app.services.liveness_session import (
+    BLINK_EAR_THRESHOLD, EAR, HEAD_MOVEMENT_MIN_DISTANCE, HEAD_MOVEMENT_MIN_FRAMES, MOUTH_RATIO, ROLL,
+    SMILE_RATIO_THRESHOLD, YAW,
+)
+
+# --------------------------------------------------
+# Vectorized landmark features for liveness
+# --------------------------------------------------
+# Turns 68-point landmarks (iBUG order), one frame (68, 2) or a batch
+# (F, 68, 2), into the four liveness features with a handful of NumPy ops:
+#   EAR         - mean eye aspect ratio of both eyes (blink when low)
+#   mouth ratio - mouth width / height (smile when high)
+#   yaw         - |nose tip x - face center x|, in pixels of the full-resolution
+#                 image (landmarks of a frame decoded at 1/n scale pass scale=n)
+#   roll        - |angle of the line between the eye centers|, in degrees
+# Used per frame by the live check (LivenessChecker) and on whole recorded
+# sequences offline (analyze_sequence).
+
+# Index pairs whose distances are needed, gathered in one indexing op:
+# eye 36-41 / 42-47 vertical (1, 5), (2, 4) and horizontal (0, 3),
+# mouth corners 48/54 and upper/lower lip middle 51/57
+_PAIRS = np.array([[37, 41], [38, 40], [43, 47], [44, 46],  # eye vertical
+                   [36, 39], [42, 45],                      # eye horizontal
+                   [48, 54], [51, 57]])                     # mouth width, height
+_PAIR_A, _PAIR_B = _PAIRS[:, 0], _PAIRS[:, 1]
+_NOSE_TIP, _JAW_LEFT, _JAW_RIGHT = 30, 0, 16
+
+
+def liveness_features(landmarks, scale=1.0):
+    """(F, 68, 2) -> (F, 4) float32 [EAR, mouth ratio, yaw, roll]; a single (68, 2) frame -> (4,)
+
+    `scale` converts landmark pixels to full-resolution pixels for yaw, the only
+    feature measured in pixels (HEAD_MOVEMENT_MIN_DISTANCE is tuned at full resolution).
+    """
+    points = np.asarray(landmarks, dtype=np.float32)
+    single = points.ndim == 2
+    if single:
+        points = points[None]
+
+    delta = points[:, _PAIR_A] - points[:, _PAIR_B]
+    d = np.hypot(delta[..., 0], delta[..., 1])  # (F, 8)
+    features = np.empty((points.shape[0], 4), dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ear = ((d[:, 0] + d[:, 1]) / d[:, 4] + (d[:, 2] + d[:, 3]) / d[:, 5]) / 4
+        mouth_ratio = d[:, 6] / d[:, 7]
+    # Mắt suy biến (chiều ngang 0) không được tính là chớp mắt; miệng khép hẳn -> tỉ lệ 0
+    features[:, EAR] = np.where(np.isnan(ear), np.inf, ear)
+    features[:, MOUTH_RATIO] = np.where(d[:, 7] == 0, 0, mouth_ratio)
+
+    # Tâm hai mắt: tổng 6 điểm mỗi mắt, hệ số 1/6 triệt tiêu trong arctan2
+    eyes = points[:, 36:48].reshape(-1, 2, 6, 2).sum(axis=2)  # (F, 2 eyes, xy)
+    eye_line = eyes[:, 1] - eyes[:, 0]
+    features[:, YAW] = np.abs(points[:, _NOSE_TIP, 0] - (points[:, _JAW_LEFT, 0] + points[:, _JAW_RIGHT, 0]) / 2) * scale
+    features[:, ROLL] = np.abs(np.degrees(np.arctan2(eye_line[:, 1], eye_line[:, 0])))
+    return features[0] if single else features
+
+
+def head_moved(features, min_distance=HEAD_MOVEMENT_MIN_DISTANCE):
+    """Frame-to-frame yaw or roll change above `min_distance` anywhere in a window of >= 5 frames"""
+    if len(features) < HEAD_MOVEMENT_MIN_FRAMES:
+        return False
+    changes = np.abs(np.diff(features[:, [YAW, ROLL]], axis=0))
+    return bool((changes > min_distance).any())
+
+
+def analyze_sequence(landmarks):
+    """Offline analysis of a recorded landmark sequence (F, 68, 2).
+
+    Returns the per-frame features and, for each action, the index of the
+    first frame where it is detected (None if never), using the live thresholds.
+    """
+    features = liveness_features(landmarks)
+
+    def first(mask):
+        hits = np.flatnonzero(mask)
+        return int(hits[0]) if hits.size else None
+
+    changes = np.abs(np.diff(features[:, [YAW, ROLL]], axis=0)).max(axis=1, initial=0)
+    moved = np.flatnonzero(changes > HEAD_MOVEMENT_MIN_DISTANCE)
+    head = None
+    if moved.size:
+        # changes[j] là thay đổi giữa frame j và j + 1; cần ít nhất HEAD_MOVEMENT_MIN_FRAMES frame
+        # (không áp dụng giới hạn thời gian / số frame của cửa sổ live)
+        head = max(int(moved[0]) + 1, HEAD_MOVEMENT_MIN_FRAMES - 1)
+    return {
+        'features': features,
+        'blink': first(features[:, EAR] < BLINK_EAR_THRESHOLD),
+        'smile': first(features[:, MOUTH_RATIO] > SMILE_RATIO_THRESHOLD),
+        'head_movement': head,
+    }
@@ -0,0 +1,163 @@
+import json
+import struct
+
+import numpy as np
+
+# --------------------------------------------------
+# Incremental liveness state of one session
+# --------------------------------------------------
+# Each frame is reduced once to four landmark features (eye aspect ratio,
+# mouth width/height ratio, yaw and roll proxies) kept in fixed-size ring
+# buffers. Blink and smile are decided on the new frame only (earlier frames
+# were checked when they arrived), and head movement keeps a running count
+# of large frame-to-frame changes inside the window, so adding a frame costs
+# the same whatever the window size.
+
+BLINK_EAR_THRESHOLD = 0.25
+SMILE_RATIO_THRESHOLD = 3.0
+HEAD_MOVEMENT_MIN_DISTANCE = 6.0
+HEAD_MOVEMENT_MIN_FRAMES = 5
+
+EAR, MOUTH_RATIO, YAW, ROLL = range(4)
+
+_MAGIC = b'LVS2'
+
+
+class LivenessSession:
+    def __init__(self, capacity, last_update=0.0):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.features = np.zeros((capacity, 4), dtype=np.float32)
+        # moved[i]: yaw/roll changed by more than HEAD_MOVEMENT_MIN_DISTANCE since the frame before i
+        self.moved = np.zeros(capacity, dtype=bool)
+        self.start = 0
+        self.count = 0
+        self.moves_in_window = 0
+
+        self.last_update = last_update
+        self.liveness_passed = False
+        self.blink_detected = False
+        self.smile_detected = False
+        self.head_movement_detected = False
+        self.best_quality = -1.0
+        self.best_crop = None
+        self.best_pose = None
+        self.embedding = None
+        self.embedding_quality = None
+        # Face tracking: box of the last detected face and how many frames in a row used the ROI
+        self.track_bbox = None
+        self.tracked_frames = 0
+        # Recognition outcome already decided in this session (served to follow-up frames until result_expires)
+        self.result = None
+        self.result_expires = 0.0
+        self.result_employee_id = None
+
+    # ---- ring buffer ----
+    def _index(self, offset):
+        return (self.start + offset) % self.capacity
+
+    def _drop_oldest(self):
+        self.start = self._index(1)
+        self.count -= 1
+        # Thay đổi giữa frame vừa bỏ và frame kế tiếp không còn nằm trong cửa sổ
+        if self.count and self.moved[self.start]:
+            self.moves_in_window -= 1
+            self.moved[self.start] = False
+
+    def expire(self, now, max_age):
+        """Drop frames more than `max_age` seconds old (amortized O(1): each frame is dropped once)"""
+        while self.count and now - self.timestamps[self.start] > max_age:
+            self._drop_oldest()
+
+    def add_frame(self, timestamp, features):
+        if self.count == self.capacity:
+            self._drop_oldest()
+        moved = False
+        if self.count:
+            previous = self.features[self._index(self.count - 1)]
+            moved = bool(abs(features[YAW] - previous[YAW]) > HEAD_MOVEMENT_MIN_DISTANCE or
+                         abs(features[ROLL] - previous[ROLL]) > HEAD_MOVEMENT_MIN_DISTANCE)
+        i = self._index(self.count)
+        self.timestamps[i] = timestamp
+        self.features[i] = features
+        self.moved[i] = moved
+        self.moves_in_window += moved
+        self.count += 1
+
+    @property
+    def oldest_timestamp(self):
+        return self.timestamps[self.start] if self.count else None
+
+    @property
+    def latest_features(self):
+        return self.features[self._index(self.count - 1)] if self.count else None
+
+    def window(self):
+        """(timestamps, features, moved) of the frames in the window, oldest first"""
+        order = self._index(np.arange(self.count))
+        return self.timestamps[order], self.features[order], self.moved[order]
+
+    def update_track(self, bbox, tracked):
+        """Remember the face box for the next frame's ROI search (None stops tracking)"""
+        self.track_bbox = None if bbox is None else np.asarray(bbox[:4], dtype=np.float32)
+        self.tracked_frames = self.tracked_frames + 1 if tracked and bbox is not None else 0
+
+    # ---- liveness actions ----
+    def update_actions(self):
+        """Update the action flags with the newest frame; returns the detected action names"""
+        ear, mouth_ratio = self.latest_features[EAR], self.latest_features[MOUTH_RATIO]
+        if not self.blink_detected and ear < BLINK_EAR_THRESHOLD:
+            self.blink_detected = True
+        if not self.smile_detected and mouth_ratio > SMILE_RATIO_THRESHOLD:
+            self.smile_detected = True
+        if not self.head_movement_detected and \
+           self.count >= HEAD_MOVEMENT_MIN_FRAMES and self.moves_in_window > 0:
+            self.head_movement_detected = True
+        return [name for name, detected in zip(
+            ['blink', 'smile', 'head movement'],
+            [self.blink_detected, self.smile_detected, self.head_movement_detected]) if detected]
+
+    # ---- serialization for shared stores ----
+    _SCALARS = ('capacity', 'last_update', 'liveness_passed', 'blink_detected', 'smile_detected',
+                'head_movement_detected', 'best_quality', 'best_pose', 'embedding_quality', 'tracked_frames',
+                'result', 'result_expires', 'result_employee_id')
+
+    def to_bytes(self):
+        """Compact form: small JSON header + the window arrays, crop and embedding"""
+        timestamps, features, moved = self.window()
+        arrays = {'timestamps': timestamps, 'features': features, 'moved': moved}
+        for key in ('best_crop', 'embedding', 'track_bbox'):
+            if getattr(self, key) is not None:
+                arrays[key] = np.ascontiguousarray(getattr(self, key))
+        header = {key: getattr(self, key) for key in self._SCALARS}
+        header['arrays'] = {key: [str(a.dtype), list(a.shape)] for key, a in arrays.items()}
+        header_bytes = json.dumps(header, separators=(',', ':'), default=lambda o: o.item()).encode()
+        return b''.join([_MAGIC, struct.pack('<I', len(header_bytes)), header_bytes]
+                        + [a.tobytes() for a in arrays.values()])
+
+    @classmethod
+    def from_bytes(cls, blob):
+        if blob[:4] != _MAGIC:
+            raise ValueError("Not a liveness session record")
+        (header_len,) = struct.unpack_from('<I', blob, 4)
+        offset = 8 + header_len
+        header = json.loads(bytes(blob[8:offset]))
+        arrays = {}
+        for key, (dtype, shape) in header.pop('arrays').items():
+            count = int(np.prod(shape))
+            arrays[key] = np.frombuffer(blob, dtype=dtype, count=count, offset=offset).reshape(shape).copy()
+            offset += count * np.dtype(dtype).itemsize
+
+        session = cls(header['capacity'])
+        for key in cls._SCALARS:
+            setattr(session, key, header.get(key, getattr(session, key)))
+        count = len(arrays['timestamps'])
+        session.timestamps[:count] = arrays['timestamps']
+        session.features[:count] = arrays['features']
+        session.moved[:count] = arrays['moved']
+        session.count = count
+        session.moves_in_window = int(arrays['moved'].sum())
+        session.best_crop = arrays.get('best_crop')
+        session.embedding = arrays.get('embedding')
+        session.track_bbox = arrays.get('track_bbox')
+        return session
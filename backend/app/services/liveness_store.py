@@ -0,0 +1,162 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+from app.config import Config
+from app.services.liveness_session import LivenessSession
+
+# --------------------------------------------------
+# Liveness session state backends
+# --------------------------------------------------
+# The blink / smile / head-movement state of a kiosk session is built up over
+# many frames. With several gunicorn workers consecutive frames of a session
+# land on different processes, so the state has to live outside the process:
+#   memory - module-level dict, one process only (default, previous behaviour)
+#   sqlite - one SQLite file shared by all workers on the host; put it on
+#            tmpfs (/dev/shm) to keep it in shared memory
+#   redis  - any Redis-protocol server (redis, valkey, a local stand-in)
+# Sessions are LivenessSession objects (stored as LivenessSession.to_bytes()
+# outside the memory store) and expire SESSION_TIMEOUT seconds after their
+# last frame. Writes are last-writer-wins: a kiosk sends the next frame only
+# after the previous response, so two workers never update one session at the
+# same time.
+
+class MemoryLivenessStore:
+    """Sessions in a dict of this process (single worker or sticky routing only).
+
+    Expiry uses a heap of (expires_at, session_id): a request only pops the
+    entries that are due instead of scanning every session.
+    """
+    name = "memory"
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._expiry and self._expiry[0][0] < now:
+            _, session_id = heapq.heappop(self._expiry)
+            session = self._sessions.get(session_id)
+            # Mục cũ của session đã được cập nhật sau đó thì bỏ qua
+            if session is not None and session.last_update + self.ttl_seconds < now:
+                del self._sessions[session_id]
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire(time.time())
+            return self._sessions.get(session_id)
+
+    def put(self, session_id, session):
+        with self._lock:
+            self._sessions[session_id] = session
+            heapq.heappush(self._expiry, (session.last_update + self.ttl_seconds, session_id))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteLivenessStore:
+    """Sessions in one SQLite file (WAL) shared by every worker process of the host"""
+    name = "sqlite"
+
+    def __init__(self, ttl_seconds, path):
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._local = threading.local()
+        self._next_purge = 0.0
+
+    def _connection(self):
+        # Một kết nối cho mỗi luồng và mỗi tiến trình (kết nối không dùng lại được sau fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS liveness_sessions ("
+                         "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, session_id):
+        now = time.time()
+        conn = self._connection()
+        if now >= self._next_purge:
+            # Dọn định kỳ thay vì mỗi request; get() đã bỏ qua các dòng hết hạn
+            conn.execute("DELETE FROM liveness_sessions WHERE expires_at < ?", (now,))
+            self._next_purge = now + self.ttl_seconds
+        row = conn.execute("SELECT data FROM liveness_sessions WHERE session_id = ? AND expires_at >= ?",
+                           (session_id, now)).fetchone()
+        return LivenessSession.from_bytes(row[0]) if row else None
+
+    def put(self, session_id, session):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO liveness_sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+            (session_id, session.to_bytes(), session.last_update + self.ttl_seconds))
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM liveness_sessions WHERE session_id = ?", (session_id,))
+
+
+class RedisLivenessStore:
+    """Sessions as Redis keys with a TTL; `client` is any object with the redis-py get/set/delete API"""
+    name = "redis"
+
+    def __init__(self, ttl_seconds, url=None, prefix='liveness:', client=None):
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("FACE_LIVENESS_STORE=redis requires the 'redis' package (pip install redis)") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, session_id):
+        blob = self.client.get(self.prefix + session_id)
+        return LivenessSession.from_bytes(blob) if blob else None
+
+    def put(self, session_id, session):
+        self.client.set(self.prefix + session_id, session.to_bytes(), px=int(self.ttl_seconds * 1000))
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+LIVENESS_STORES = {
+    MemoryLivenessStore.name: MemoryLivenessStore,
+    SQLiteLivenessStore.name: SQLiteLivenessStore,
+    RedisLivenessStore.name: RedisLivenessStore,
+}
+
+
+def create_liveness_store(name, ttl_seconds, **options):
+    """Create a store by its Config name ('memory', 'sqlite' or 'redis')"""
+    if name not in LIVENESS_STORES:
+        raise ValueError(f"Unknown liveness store: {name}. Must be one of {list(LIVENESS_STORES)}")
+    if name == SQLiteLivenessStore.name:
+        return SQLiteLivenessStore(ttl_seconds, options.get('path') or Config.FACE_LIVENESS_SQLITE_PATH)
+    if name == RedisLivenessStore.name:
+        return RedisLivenessStore(ttl_seconds, options.get('url') or Config.FACE_LIVENESS_REDIS_URL,
+                                  client=options.get('client'))
+    return MemoryLivenessStore(ttl_seconds)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_liveness_store(ttl_seconds):
+    """The process-wide store selected by FACE_LIVENESS_STORE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_liveness_store(Config.FACE_LIVENESS_STORE, ttl_seconds)
+    return _store
@@ -0,0 +1,144 @@
+import os
+
+from app.config import Config
+from app.services.face_quantization import quantized_model_file
+
+# --------------------------------------------------
+# ONNX Runtime session tuning for the face models
+# --------------------------------------------------
+# insightface creates every session with onnxruntime defaults: one intra-op
+# thread per core, busy-spinning thread pools, full graph optimization on each
+# start. With several backend processes (or inference pool workers) on one box
+# those thread pools fight each other, so the sessions are rebuilt here with the
+# FACE_ORT_* settings from Config. onnxruntime is imported lazily like the
+# models themselves.
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+EXECUTION_MODES = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+
+def _choice(value, choices, setting):
+    key = str(value).strip().lower()
+    if key not in choices:
+        raise ValueError(f"Invalid {setting}: {value}. Must be one of {list(choices)}")
+    return choices[key]
+
+def build_session_options(optimized_model_path=None, preoptimized=False):
+    """SessionOptions from Config.FACE_ORT_*.
+
+    `optimized_model_path` makes onnxruntime write the optimized graph there;
+    `preoptimized` loads such a file with graph optimizations turned off.
+    """
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    if Config.FACE_ORT_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = Config.FACE_ORT_INTRA_OP_THREADS
+    if Config.FACE_ORT_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = Config.FACE_ORT_INTER_OP_THREADS
+    options.execution_mode = getattr(ort.ExecutionMode, _choice(
+        Config.FACE_ORT_EXECUTION_MODE, EXECUTION_MODES, 'FACE_ORT_EXECUTION_MODE'))
+    level = 'ORT_DISABLE_ALL' if preoptimized else _choice(
+        Config.FACE_ORT_GRAPH_OPTIMIZATION, GRAPH_OPTIMIZATION_LEVELS, 'FACE_ORT_GRAPH_OPTIMIZATION')
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+    options.enable_cpu_mem_arena = Config.FACE_ORT_CPU_MEM_ARENA
+    options.enable_mem_pattern = Config.FACE_ORT_MEM_PATTERN
+    if not Config.FACE_ORT_ALLOW_SPINNING:
+        # Luồng rảnh ngủ thay vì quay vòng chờ việc: giảm tranh chấp CPU giữa các worker
+        options.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        options.add_session_config_entry('session.inter_op.allow_spinning', '0')
+    if optimized_model_path:
+        options.optimized_model_filepath = optimized_model_path
+    return options
+
+def optimized_model_path(model_file):
+    """Cache file for the optimized graph of `model_file`, or None when caching is off.
+
+    The file name carries the onnxruntime version and optimization level, since
+    an optimized graph is only valid for the runtime that produced it.
+    """
+    cache_dir = Config.FACE_ORT_OPTIMIZED_MODEL_DIR
+    if not cache_dir:
+        return None
+    import onnxruntime as ort
+    pack = os.path.basename(os.path.dirname(os.path.abspath(model_file)))
+    stem = os.path.splitext(os.path.basename(model_file))[0]
+    level = str(Config.FACE_ORT_GRAPH_OPTIMIZATION).strip().lower()
+    return os.path.join(cache_dir, pack, f"{stem}.ort{ort.__version__}.{level}.onnx")
+
+def create_session(model_file, providers=('CPUExecutionProvider',)):
+    """InferenceSession for `model_file` (or its approved INT8 version) with the configured
+    options, using/filling the optimized-model cache"""
+    import onnxruntime as ort
+    model_file = quantized_model_file(model_file) or model_file
+    cached = optimized_model_path(model_file)
+    if cached and os.path.exists(cached):
+        session = ort.InferenceSession(cached, build_session_options(preoptimized=True), providers=list(providers))
+        session.source_file = cached
+        return session
+
+    if cached:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        # Ghi ra file tạm rồi đổi tên: nhiều worker khởi động cùng lúc không đọc phải file dở dang
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        session = ort.InferenceSession(model_file, build_session_options(tmp_path), providers=list(providers))
+        os.replace(tmp_path, cached)
+    else:
+        session = ort.InferenceSession(model_file, build_session_options(), providers=list(providers))
+    session.source_file = model_file
+    return session
+
+def apply_session_options(analyzer, providers=('CPUExecutionProvider',)):
+    """Replace the default sessions of every loaded model with tuned ones.
+
+    Models keep their original `model_file` (insightface reads preprocessing
+    constants from it); only the session that runs the graph changes.
+    """
+    for model in analyzer.models.values():
+        model.session = create_session(model.model_file, providers)
+    return analyzer
+
+def session_report(analyzer):
+    """Effective onnxruntime settings of the analyzer, for the startup log"""
+    import onnxruntime as ort
+    cpu_count = os.cpu_count() or 1
+    intra = Config.FACE_ORT_INTRA_OP_THREADS
+    # Số tiến trình chạy model: worker của inference pool, hoặc các tiến trình web (gunicorn WEB_CONCURRENCY)
+    processes = Config.FACE_INFERENCE_WORKERS or int(os.getenv('WEB_CONCURRENCY', 1))
+    report = {
+        'onnxruntime': ort.__version__,
+        'cpu_count': cpu_count,
+        'intra_op_threads': intra if intra > 0 else f"auto ({cpu_count})",
+        'inter_op_threads': Config.FACE_ORT_INTER_OP_THREADS or 'auto',
+        'execution_mode': Config.FACE_ORT_EXECUTION_MODE,
+        'graph_optimization': Config.FACE_ORT_GRAPH_OPTIMIZATION,
+        'cpu_mem_arena': Config.FACE_ORT_CPU_MEM_ARENA,
+        'mem_pattern': Config.FACE_ORT_MEM_PATTERN,
+        'allow_spinning': Config.FACE_ORT_ALLOW_SPINNING,
+        'optimized_model_dir': Config.FACE_ORT_OPTIMIZED_MODEL_DIR or None,
+        'inference_workers': Config.FACE_INFERENCE_WORKERS,
+        'models': {
+            task: {
+                'file': getattr(model.session, 'source_file', model.model_file),
+                'providers': model.session.get_providers(),
+            }
+            for task, model in analyzer.models.items()
+        },
+    }
+    if processes * (intra if intra > 0 else cpu_count) > cpu_count:
+        report['warning'] = (f"{processes} inference process(es) x {intra if intra > 0 else cpu_count} intra-op threads "
+                             f"> {cpu_count} cores; set FACE_ORT_INTRA_OP_THREADS to about cores / processes")
+    return report
+
+def print_session_report(analyzer):
+    report = session_report(analyzer)
+    models = report.pop('models')
+    print(f"[face-models] pid={os.getpid()} " + " ".join(f"{key}={value}" for key, value in report.items()))
+    for task, info in models.items():
+        print(f"[face-models]   {task}: {info['file']} {info['providers']}")
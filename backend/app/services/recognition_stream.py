@@ -0,0 +1,82 @@
+import uuid
+
+from app.models.settings import Settings
+from app.services.attendance_service import record_attendance_logic
+from app.services.face_gallery import face_gallery
+from app.services.facial_service import (
+    BEST_FRAME_QUALITY_MARGIN, FacialRecognitionService, FrameAnalysis, liveness_sessions,
+)
+from app.services.image_ingest import decode_frame
+
+# --------------------------------------------------
+# Streaming liveness + recognition session (one per kiosk WebSocket)
+# --------------------------------------------------
+# Settings are read once when the stream opens. Every frame only runs
+# detection + landmarks for the liveness check; feedback is pushed only when
+# it changes. Once liveness passes, the best frame of the session is matched,
+# and the attendance row is written exactly once.
+
+class RecognitionStream:
+    def __init__(self, session_id=None, location=None, device_info=None):
+        self.session_id = session_id or f"stream_{uuid.uuid4().hex}"
+        self.location = location
+        self.device_info = device_info
+        self.settings = Settings.get_current_settings()
+        face_gallery.configure_from_settings(self.settings)
+        FacialRecognitionService.configure_from_settings(self.settings)
+        self.frames = 0
+        self._last_feedback = None
+        self._matched_quality = None
+
+    def _feedback(self, message, liveness_passed=False):
+        """Progress event (with the liveness actions seen so far); nothing if the client already has it"""
+        if message == self._last_feedback:
+            return []
+        self._last_feedback = message
+        return [{
+            "type": "progress",
+            "message": message,
+            "liveness_passed": liveness_passed,
+            "session_id": self.session_id,
+            **self.liveness_state(),
+        }]
+
+    def liveness_state(self):
+        session = liveness_sessions().get(self.session_id)
+        return {
+            "blink": bool(session and session.blink_detected),
+            "smile": bool(session and session.smile_detected),
+            "head_movement": bool(session and session.head_movement_detected),
+        }
+
+    def process_frame(self, raw_bytes):
+        """Run one frame; returns (events to push, done)"""
+        self.frames += 1
+        frame = decode_frame(raw_bytes)
+        if frame is None:
+            return self._feedback("Cannot decode image"), False
+
+        analysis = FrameAnalysis(frame)
+        live_ok, live_msg = FacialRecognitionService.detect_liveness(frame, self.session_id, analysis)
+        if not live_ok:
+            return self._feedback(live_msg), False
+        events = self._feedback(live_msg, liveness_passed=True)
+        if analysis.face is None:
+            return events + self._feedback("Image must contain exactly one face", True), False
+
+        # Chỉ so khớp lại khi có frame tốt hơn rõ rệt so với lần so khớp trước
+        session = liveness_sessions().get(self.session_id)
+        best_quality = session.best_quality if session else 0.0
+        if self._matched_quality is not None and best_quality <= self._matched_quality + BEST_FRAME_QUALITY_MARGIN:
+            return events, False
+        query_embedding, query_pose = FacialRecognitionService._session_query_embedding(self.session_id, analysis)
+        self._matched_quality = best_quality
+        matched, message, employee = FacialRecognitionService.match_embedding(query_embedding, query_pose)
+        if not matched or not employee:
+            return events + self._feedback(message, True), False
+
+        result, error, status = record_attendance_logic(employee, self.settings, self.session_id)
+        return events + [{"type": "result", "status_code": status, "frames": self.frames, **(result or error)}], True
+
+    def close(self):
+        liveness_sessions().delete(self.session_id)
@@ -0,0 +1,151 @@
+"""So sánh các cấu hình InsightFace (model pack, module, det_size) trên ảnh đã đăng ký
+
+  python benchmarks/face_model_benchmark.py
+  python benchmarks/face_model_benchmark.py --packs buffalo_l buffalo_s --det-sizes 640 320
+  python benchmarks/face_model_benchmark.py --modules all detection,landmark_3d_68,recognition
+
+Ảnh lấy từ data/uploads/<EMPLOYEE_ID>_<pose>.jpg (ảnh lưu khi training khuôn mặt).
+Với mỗi cấu hình, in độ trễ p50 của từng module và độ chính xác leave-one-out:
+  found     = tỉ lệ ảnh phát hiện đúng một khuôn mặt
+  top1      = ảnh gần nhất (trừ chính nó) thuộc cùng nhân viên
+  accept    = top1 đúng và khoảng cách < ngưỡng nhận diện
+  false_acc = ảnh gần nhất thuộc nhân viên khác mà vẫn dưới ngưỡng
+  pose      = pose ước lượng trùng với pose trong tên file
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_ROOT)
+
+from insightface.app.common import Face  # noqa: E402
+
+from app.services.face_models import create_face_analyzer  # noqa: E402
+from app.services.facial_service import FacialRecognitionService  # noqa: E402
+
+THRESHOLD = 0.35
+
+
+def load_enrolled_images(directory, limit=None):
+    """[(employee_id, pose_type, image_bgr)] từ các file <EMPLOYEE_ID>_<pose>.jpg"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.jpg'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if '_' not in name:
+            continue
+        employee_id, pose_type = name.rsplit('_', 1)
+        img = cv2.imread(path)
+        if img is not None:
+            images.append((employee_id, pose_type, img))
+        if limit and len(images) >= limit:
+            break
+    return images
+
+
+def profile(analyzer, images, repeat):
+    """Chạy pipeline từng bước, đo thời gian mỗi module; trả về (timings_ms, embeddings, poses)"""
+    timings = defaultdict(list)
+    embeddings, poses = [], []
+    for _, _, img in images:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bboxes, kpss = analyzer.det_model.detect(img, max_num=0, metric='default')
+            timings['detection'].append(time.perf_counter() - start)
+            faces = []
+            for j in range(bboxes.shape[0]):
+                face = Face(bbox=bboxes[j, 0:4], kps=None if kpss is None else kpss[j], det_score=bboxes[j, 4])
+                for taskname, model in analyzer.models.items():
+                    if taskname == 'detection':
+                        continue
+                    start = time.perf_counter()
+                    model.get(img, face)
+                    timings[taskname].append(time.perf_counter() - start)
+                faces.append(face)
+        if len(faces) == 1:
+            embedding = faces[0].normed_embedding
+            pose = FacialRecognitionService.detect_face_pose(img, faces)[0]
+        else:
+            embedding, pose = None, None
+        embeddings.append(embedding)
+        poses.append(pose)
+    return {task: np.array(values) * 1000 for task, values in timings.items()}, embeddings, poses
+
+
+def accuracy(images, embeddings, poses):
+    found = [i for i, e in enumerate(embeddings) if e is not None]
+    result = {'found': len(found) / max(len(images), 1)}
+    pose_hits = [poses[i] == images[i][1] for i in found]
+    result['pose'] = float(np.mean(pose_hits)) if pose_hits else 0.0
+    if len(found) < 2:
+        result.update(top1=0.0, accept=0.0, false_acc=0.0)
+        return result
+
+    vectors = np.stack([embeddings[i] for i in found]).astype(np.float32)
+    labels = np.array([images[i][0] for i in found])
+    similarities = vectors @ vectors.T
+    np.fill_diagonal(similarities, -np.inf)
+    nearest = np.argmax(similarities, axis=1)
+    distances = 1.0 - similarities[np.arange(len(found)), nearest]
+    same = labels[nearest] == labels
+    result['top1'] = float(np.mean(same))
+    result['accept'] = float(np.mean(same & (distances < THRESHOLD)))
+    result['false_acc'] = float(np.mean(~same & (distances < THRESHOLD)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default=os.path.join(BACKEND_ROOT, 'data', 'uploads'))
+    parser.add_argument('--limit', type=int, default=None, help='số ảnh tối đa')
+    parser.add_argument('--packs', nargs='+', default=['buffalo_l', 'buffalo_m', 'buffalo_s'])
+    parser.add_argument('--modules', nargs='+', default=['detection,landmark_3d_68,recognition'],
+                        help="danh sách module cách nhau bởi dấu phẩy, hoặc 'all'")
+    parser.add_argument('--det-sizes', type=int, nargs='+', default=[640, 320])
+    parser.add_argument('--repeat', type=int, default=3, help='số lần chạy mỗi ảnh khi đo thời gian')
+    args = parser.parse_args()
+
+    images = load_enrolled_images(args.images, args.limit)
+    if not images:
+        sys.exit(f"Không tìm thấy ảnh <EMPLOYEE_ID>_<pose>.jpg trong {args.images}")
+    print(f"{len(images)} ảnh của {len({e for e, _, _ in images})} nhân viên từ {args.images}\n")
+
+    results = []
+    for pack in args.packs:
+        for modules in args.modules:
+            for det_size in args.det_sizes:
+                label = f"{pack} det={det_size} [{modules}]"
+                start = time.perf_counter()
+                try:
+                    analyzer = create_face_analyzer(pack, modules, det_size)
+                except Exception as e:
+                    print(f"{label}: bỏ qua ({e})")
+                    continue
+                load_s = time.perf_counter() - start
+
+                timings, embeddings, poses = profile(analyzer, images, args.repeat)
+                per_module = {task: np.percentile(ms, 50) for task, ms in timings.items()}
+                results.append((label, load_s, per_module, accuracy(images, embeddings, poses)))
+
+    if not results:
+        return
+    width = max(len(label) for label, *_ in results) + 2
+    print(f"{'config':<{width}}{'load s':>8}{'total ms':>10}{'found':>8}{'top1':>8}{'accept':>8}{'false_acc':>10}{'pose':>8}")
+    for label, load_s, per_module, acc in results:
+        # Độ trễ mỗi frame = tổng p50 của các module (mỗi module chạy một lần cho mỗi khuôn mặt)
+        total = sum(per_module.values())
+        print(f"{label:<{width}}{load_s:>8.2f}{total:>10.1f}{acc['found']:>8.3f}{acc['top1']:>8.3f}"
+              f"{acc['accept']:>8.3f}{acc['false_acc']:>10.3f}{acc['pose']:>8.3f}")
+    print("\np50 ms per module")
+    for label, _, per_module, _ in results:
+        print(f"{label:<{width}}" + "  ".join(f"{task}={ms:.1f}" for task, ms in per_module.items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark recall và độ trễ của các backend tìm kiếm gallery (exact vs IVF)
+
+  python benchmarks/gallery_search_benchmark.py --employees 50000 --nlist 256 --nprobe 4 8 16 32
+  python benchmarks/gallery_search_benchmark.py --from-db
+
+Recall@1 = tỉ lệ truy vấn mà IVF trả về cùng dòng tốt nhất với tìm kiếm đầy đủ.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.gallery_search import ExactSearchBackend, IVFSearchBackend  # noqa: E402
+
+POSES = 5
+DIM = 512
+
+
+def synthetic_gallery(employees, noise, seed):
+    """Mỗi nhân viên là một tâm ngẫu nhiên, mỗi pose là tâm cộng nhiễu"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((employees, DIM)).astype(np.float32)
+    vectors = np.repeat(centers, POSES, axis=0) + noise * rng.standard_normal((employees * POSES, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return centers, vectors
+
+
+def db_gallery():
+    from app import create_app
+    from app.services.face_gallery import FaceGallery
+    app = create_app()
+    with app.app_context():
+        gallery = FaceGallery()
+        gallery.load_from_database()
+        return gallery.vectors.copy()
+
+
+def make_queries(vectors, count, noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    picks = vectors[rng.choice(vectors.shape[0], count)]
+    # noise là chuẩn (norm) của vector nhiễu cộng vào dòng gốc vốn có chuẩn 1
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(DIM)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run(backend, vectors, queries):
+    backend.rebuild(vectors)
+    backend.search(vectors, queries[0])  # warm-up (huấn luyện IVF)
+    best, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = backend.search(vectors, query)
+        timings.append(time.perf_counter() - start)
+        best.append(rows[0] if rows.shape[0] else -1)
+    return np.array(best), np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=0.3, help='nhiễu giữa các pose của cùng một người')
+    parser.add_argument('--query-noise', type=float, default=0.8, help='chuẩn của nhiễu truy vấn so với dòng gốc')
+    parser.add_argument('--nlist', type=int, nargs='+', default=[64, 256])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--from-db', action='store_true', help='dùng embeddings thật trong database')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.from_db:
+        vectors = db_gallery()
+    else:
+        _, vectors = synthetic_gallery(args.employees, args.noise, args.seed)
+    queries = make_queries(vectors, args.queries, args.query_noise, args.seed)
+    print(f"Gallery: {vectors.shape[0]} rows x {vectors.shape[1]}, {queries.shape[0]} queries")
+
+    exact_best, exact_ms = run(ExactSearchBackend(), vectors, queries)
+    print(f"{'backend':<22}{'recall@1':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'exact':<22}{1.0:>10.3f}{np.percentile(exact_ms, 50):>10.3f}{np.percentile(exact_ms, 95):>10.3f}")
+
+    for nlist in args.nlist:
+        for nprobe in args.nprobe:
+            if nprobe > nlist:
+                continue
+            best, ms = run(IVFSearchBackend(nlist=nlist, nprobe=nprobe), vectors, queries)
+            recall = float(np.mean(best == exact_best))
+            label = f"ivf nlist={nlist} np={nprobe}"
+            print(f"{label:<22}{recall:>10.3f}{np.percentile(ms, 50):>10.3f}{np.percentile(ms, 95):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Microbenchmark đặc trưng liveness: bản vector hoá (liveness_features) vs cách tính từng điểm trước đây
+
+  python benchmarks/liveness_features_benchmark.py
+  python benchmarks/liveness_features_benchmark.py --frames 1 30 1000 --repeat 200
+  python benchmarks/liveness_features_benchmark.py --landmarks session.npy   # phân tích offline (F, 68, 2)
+
+Bản cũ (legacy_*) được giữ nguyên ở đây làm mốc so sánh: np.linalg.norm cho từng cặp
+điểm và math.atan2 cho từng frame. Benchmark cũng kiểm tra hai cách cho cùng quyết định.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.liveness_features import analyze_sequence, head_moved, liveness_features  # noqa: E402
+from app.services.liveness_session import (  # noqa: E402
+    BLINK_EAR_THRESHOLD, EAR, HEAD_MOVEMENT_MIN_DISTANCE, MOUTH_RATIO, SMILE_RATIO_THRESHOLD,
+)
+
+
+# ---- previous per-point implementation ----
+def legacy_ear(landmarks):
+    def ear(eye):
+        A = np.linalg.norm(eye[1] - eye[5])
+        B = np.linalg.norm(eye[2] - eye[4])
+        C = np.linalg.norm(eye[0] - eye[3])
+        return (A + B) / (2.0 * C)
+    return (ear(landmarks[36:42]) + ear(landmarks[42:48])) / 2
+
+
+def legacy_mouth_ratio(landmarks):
+    mouth = landmarks[48:68]
+    width = np.linalg.norm(mouth[0] - mouth[6])
+    height = np.linalg.norm(mouth[3] - mouth[9])
+    return (width / height) if height else 0
+
+
+def legacy_angles(landmarks):
+    left_eye = landmarks[36:42].mean(axis=0)
+    right_eye = landmarks[42:48].mean(axis=0)
+    nose_tip = landmarks[30]
+    face_center_x = (landmarks[0][0] + landmarks[16][0]) / 2
+    yaw = abs(nose_tip[0] - face_center_x)
+    roll = abs(math.degrees(math.atan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0])))
+    return yaw, roll
+
+
+def legacy_features(batch):
+    return np.array([(legacy_ear(lm), legacy_mouth_ratio(lm), *legacy_angles(lm)) for lm in batch])
+
+
+def legacy_head_moved(batch, min_distance=HEAD_MOVEMENT_MIN_DISTANCE):
+    if len(batch) < 5:
+        return False
+    angles = [legacy_angles(lm) for lm in batch]
+    max_yaw_change = max(abs(angles[i][0] - angles[i-1][0]) for i in range(1, len(angles)))
+    max_roll_change = max(abs(angles[i][1] - angles[i-1][1]) for i in range(1, len(angles)))
+    return max_yaw_change > min_distance or max_roll_change > min_distance
+
+
+def synthetic_landmarks(frames, seed):
+    """Khuôn mặt dao động quanh một vị trí, thỉnh thoảng nhắm mắt"""
+    rng = np.random.default_rng(seed)
+    base = rng.random((68, 2)) * 80 + 200
+    batch = base + rng.standard_normal((frames, 68, 2)) * 3
+    closed = rng.random(frames) < 0.05
+    eyes = batch[closed, 36:48]
+    center = eyes[..., 1].mean(axis=1, keepdims=True)
+    batch[closed, 36:48, 1] = center + (eyes[..., 1] - center) * 0.05
+    return batch.astype(np.float32)
+
+
+def best_time_us(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, nargs='+', default=[1, 30, 300, 3000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--landmarks', help='file .npy (F, 68, 2) để phân tích offline')
+    args = parser.parse_args()
+
+    if args.landmarks:
+        landmarks = np.load(args.landmarks)
+        result = analyze_sequence(landmarks)
+        print(f"{len(landmarks)} frames: blink at {result['blink']}, smile at {result['smile']}, "
+              f"head movement at {result['head_movement']}")
+        for name, column in (('EAR', 0), ('mouth ratio', 1), ('yaw', 2), ('roll', 3)):
+            values = result['features'][:, column]
+            print(f"  {name:<12} min={values.min():8.3f} p50={np.median(values):8.3f} max={values.max():8.3f}")
+        return
+
+    print(f"{'frames':>7}  {'legacy us':>10} {'vector us':>10} {'speedup':>8}  "
+          f"{'head legacy':>11} {'head vector':>11}  {'max |diff|':>10} {'decisions':>9}")
+    for frames in args.frames:
+        batch = synthetic_landmarks(frames, args.seed)
+        batch64 = batch.astype(np.float64)
+
+        legacy = legacy_features(batch64)
+        vector = liveness_features(batch)
+        finite = np.isfinite(legacy)
+        max_diff = float(np.abs(legacy[finite] - vector[finite]).max())
+        agree = np.array_equal(legacy[:, EAR] < BLINK_EAR_THRESHOLD, vector[:, EAR] < BLINK_EAR_THRESHOLD) and \
+            np.array_equal(legacy[:, MOUTH_RATIO] > SMILE_RATIO_THRESHOLD, vector[:, MOUTH_RATIO] > SMILE_RATIO_THRESHOLD) and \
+            legacy_head_moved(batch64) == head_moved(vector)
+
+        t_legacy = best_time_us(lambda: legacy_features(batch64), args.repeat)
+        t_vector = best_time_us(lambda: liveness_features(batch), args.repeat)
+        h_legacy = best_time_us(lambda: legacy_head_moved(batch64), args.repeat)
+        h_vector = best_time_us(lambda: head_moved(liveness_features(batch)), args.repeat)
+        print(f"{frames:>7}  {t_legacy:10.1f} {t_vector:10.1f} {t_legacy / t_vector:7.1f}x  "
+              f"{h_legacy:11.1f} {h_vector:11.1f}  {max_diff:10.2e} {'same' if agree else 'DIFFER':>9}")
+
+
+if __name__ == '__main__':
+    main()
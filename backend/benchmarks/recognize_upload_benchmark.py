@@ -0,0 +1,129 @@
+"""So sánh upload khung hình nhận diện: JSON base64 (/api/recognize) vs body nhị phân (/api/recognize/binary)
+
+  python benchmarks/recognize_upload_benchmark.py
+  python benchmarks/recognize_upload_benchmark.py --images data/uploads --uplink-mbps 2 10 50
+
+Đo trên từng khung hình JPEG:
+  - số byte trên đường truyền (body HTTP)
+  - thời gian server đọc body ra bytes ảnh (parse JSON + base64 vs readinto), và cả khi giải mã
+  - thời gian truyền ước tính ở các tốc độ uplink của kiosk
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.image_ingest import decode_frame, read_request_bytes, read_stream_into  # noqa: E402
+
+SESSION_ID = 'session_1700000000000_benchmark'
+
+
+def synthetic_frames(sizes, seed):
+    """Khung hình giả có cấu trúc mịn (nén JPEG gần giống ảnh camera hơn nhiễu trắng)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for width, height in sizes:
+        small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+        img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+        frames.append((f"synthetic {width}x{height}", img))
+    return frames
+
+
+def file_frames(directory, limit):
+    frames = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.jpg')))[:limit]:
+        img = cv2.imread(path)
+        if img is not None:
+            frames.append((os.path.basename(path), img))
+    return frames
+
+
+def json_request(jpeg):
+    body = json.dumps({
+        'base64_image': base64.b64encode(jpeg).decode('ascii'),
+        'session_id': SESSION_ID,
+    }).encode()
+    return body, lambda: EnvironBuilder(method='POST', data=body, content_type='application/json').get_environ()
+
+
+def binary_request(jpeg):
+    headers = {'X-Session-Id': SESSION_ID}
+    return jpeg, lambda: EnvironBuilder(method='POST', data=jpeg, content_type='image/jpeg',
+                                        headers=headers).get_environ()
+
+
+def ingest_json(environ):
+    data = Request(environ).get_json()
+    return read_request_bytes(None, data.get('base64_image'))
+
+
+def ingest_binary(environ):
+    request = Request(environ)
+    return read_stream_into(request.stream, request.content_length)
+
+
+def timed(make_environ, ingest, decode, repeat):
+    """Median milliseconds; dựng environ ngoài vùng đo"""
+    samples = []
+    for _ in range(repeat):
+        environ = make_environ()
+        start = time.perf_counter()
+        raw = ingest(environ)
+        if decode:
+            decode_frame(raw)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='thư mục ảnh .jpg thay cho khung hình giả')
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--quality', type=int, default=90, help='chất lượng JPEG như canvas.toBlob(..., 0.9)')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--uplink-mbps', type=float, nargs='+', default=[2.0, 10.0, 50.0])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    frames = file_frames(args.images, args.limit) if args.images else \
+        synthetic_frames([(640, 480), (1280, 720), (1920, 1080)], args.seed)
+    if not frames:
+        sys.exit(f"Không tìm thấy ảnh .jpg trong {args.images}")
+
+    width = max(len(label) for label, _ in frames)
+    print(f"{'frame':<{width}}  {'jpeg KB':>8} {'json KB':>8} {'saved':>6}  "
+          f"{'read json ms':>12} {'read bin ms':>11}  {'+dec json ms':>12} {'+dec bin ms':>11}  "
+          + "  ".join(f"{f'@{mbps:g}Mbps':>16}" for mbps in args.uplink_mbps))
+    for label, img in frames:
+        jpeg = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), args.quality])[1].tobytes()
+        json_body, json_environ = json_request(jpeg)
+        bin_body, bin_environ = binary_request(jpeg)
+
+        read_json = timed(json_environ, ingest_json, False, args.repeat)
+        read_bin = timed(bin_environ, ingest_binary, False, args.repeat)
+        dec_json = timed(json_environ, ingest_json, True, args.repeat)
+        dec_bin = timed(bin_environ, ingest_binary, True, args.repeat)
+
+        # ms truyền body: byte * 8 / (Mbps * 1e6) * 1000
+        transfer = "  ".join(
+            f"{len(json_body) * 8 / (mbps * 1e3):7.1f}->{len(bin_body) * 8 / (mbps * 1e3):6.1f}ms"
+            for mbps in args.uplink_mbps)
+        print(f"{label:<{width}}  {len(bin_body) / 1024:8.1f} {len(json_body) / 1024:8.1f} "
+              f"{1 - len(bin_body) / len(json_body):6.1%}  {read_json:12.2f} {read_bin:11.2f}  "
+              f"{dec_json:12.2f} {dec_bin:11.2f}  {transfer}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""So sánh tìm kiếm một giai đoạn (exact) với so khớp hai giai đoạn (centroid + pose)
+
+  python benchmarks/two_stage_matching_benchmark.py
+  python benchmarks/two_stage_matching_benchmark.py --employees 50000 --shortlist 5 10 20 --pose-weight 0 0.05
+
+Gallery tổng hợp: nhân viên được chia thành các nhóm người trông giống nhau (tâm danh tính
+gần nhau), mỗi pose cộng thêm một hướng pose dùng chung cho mọi người (nên ảnh "left" của
+hai người khác nhau cũng giống nhau phần nào).
+Truy vấn thật: một nhân viên ở một pose ngẫu nhiên, kèm nhiễu; truy vấn giả mạo: người
+chưa đăng ký trông giống một nhân viên. In ra:
+  top1      = truy vấn thật trả về đúng nhân viên
+  accept    = top1 đúng và khoảng cách < ngưỡng nhận diện
+  false_acc = truy vấn thật trả về sai người dưới ngưỡng + truy vấn giả mạo dưới ngưỡng
+  rows/q    = số dòng được chấm điểm cho mỗi truy vấn
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.gallery_search import CentroidSearchBackend, ExactSearchBackend  # noqa: E402
+
+POSES = np.array(["front", "left", "right", "up", "down"], dtype=object)
+DIM = 512
+THRESHOLD = 0.35
+
+
+def _unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def _noise(rng, shape, norm):
+    """Nhiễu có chuẩn xấp xỉ `norm`"""
+    return norm * rng.standard_normal(shape).astype(np.float32) / np.sqrt(DIM)
+
+
+def synthetic_gallery(employees, family_size, family_spread, pose_strength, pose_noise, seed):
+    rng = np.random.default_rng(seed)
+    families = _unit(rng.standard_normal((-(-employees // family_size), DIM)))
+    identities = _unit(np.repeat(families, family_size, axis=0)[:employees] +
+                       _noise(rng, (employees, DIM), family_spread))
+    pose_directions = _unit(rng.standard_normal((len(POSES), DIM)))
+    pose_directions[0] = 0  # front là pose gốc
+    vectors = identities[:, None] + pose_strength * pose_directions[None] + \
+        _noise(rng, (employees, len(POSES), DIM), pose_noise)
+    employee_ids = np.repeat(np.array([f"EMP{i:06d}" for i in range(employees)], dtype=object), len(POSES))
+    pose_types = np.tile(POSES, employees)
+    return identities, pose_directions, _unit(vectors.reshape(-1, DIM)), employee_ids, pose_types
+
+
+def make_queries(identities, pose_directions, count, pose_strength, query_noise, lookalike, seed):
+    """(queries, poses, true employee index or -1 for impostors); nửa sau là giả mạo"""
+    rng = np.random.default_rng(seed + 1)
+    who = rng.integers(0, identities.shape[0], count)
+    poses = rng.integers(0, len(POSES), count)
+    centers = identities[who].copy()
+    impostor = np.arange(count) >= count // 2
+    centers[impostor] = _unit(centers[impostor] + _noise(rng, (int(impostor.sum()), DIM), lookalike))
+    queries = _unit(centers + pose_strength * pose_directions[poses] + _noise(rng, (count, DIM), query_noise))
+    return queries, POSES[poses], np.where(impostor, -1, who)
+
+
+def run(backend, vectors, employee_ids, pose_types, queries, query_poses, use_pose):
+    backend.rebuild(vectors)
+    labels = {"employee_ids": employee_ids, "pose_types": pose_types}
+    backend.search(vectors, queries[0], **labels)  # warm-up (tính centroid)
+    found, distances, timings = [], [], []
+    for query, pose in zip(queries, query_poses):
+        start = time.perf_counter()
+        rows, scores = backend.search(vectors, query, query_pose=pose if use_pose else None, **labels)
+        timings.append(time.perf_counter() - start)
+        found.append(employee_ids[rows[0]])
+        distances.append(1.0 - scores[0])
+    return np.array(found, dtype=object), np.array(distances), np.array(timings) * 1000
+
+
+def report(label, found, distances, ms, truth, rows_per_query):
+    genuine = truth >= 0
+    expected = np.array([f"EMP{i:06d}" for i in truth[genuine]], dtype=object)
+    correct = found[genuine] == expected
+    accepted = distances < THRESHOLD
+    false_accepts = int((accepted[genuine] & ~correct).sum() + accepted[~genuine].sum())
+    print(f"{label:<26}{correct.mean():>8.3f}{(correct & accepted[genuine]).mean():>8.3f}"
+          f"{false_accepts / len(truth):>11.4f}{rows_per_query:>9.0f}"
+          f"{np.percentile(ms, 50):>9.3f}{np.percentile(ms, 95):>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--family-size', type=int, default=5, help='số người trong mỗi nhóm trông giống nhau')
+    parser.add_argument('--family-spread', type=float, default=0.4, help='khoảng cách giữa những người cùng nhóm')
+    parser.add_argument('--pose-strength', type=float, default=0.8, help='độ lớn của hướng pose so với tâm danh tính')
+    parser.add_argument('--pose-noise', type=float, default=0.5, help='nhiễu riêng của từng ảnh đăng ký')
+    parser.add_argument('--query-noise', type=float, default=1.0)
+    parser.add_argument('--lookalike', type=float, default=1.0, help='khoảng cách của người giả mạo tới nhân viên gần nhất')
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--pose-weight', type=float, nargs='+', default=[0.0, 0.05])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    identities, pose_directions, vectors, employee_ids, pose_types = synthetic_gallery(
+        args.employees, args.family_size, args.family_spread, args.pose_strength, args.pose_noise, args.seed)
+    queries, query_poses, truth = make_queries(identities, pose_directions, args.queries, args.pose_strength,
+                                               args.query_noise, args.lookalike, args.seed)
+    print(f"Gallery: {args.employees} employees x {len(POSES)} poses = {vectors.shape[0]} rows, "
+          f"{len(queries)} queries ({int((truth < 0).sum())} impostors)")
+    print(f"{'matcher':<26}{'top1':>8}{'accept':>8}{'false_acc':>11}{'rows/q':>9}{'p50 ms':>9}{'p95 ms':>9}")
+
+    found, distances, ms = run(ExactSearchBackend(), vectors, employee_ids, pose_types, queries, query_poses, False)
+    report("exact (single stage)", found, distances, ms, truth, vectors.shape[0])
+    for shortlist in args.shortlist:
+        for weight in args.pose_weight:
+            backend = CentroidSearchBackend(shortlist=shortlist, pose_weight=weight)
+            found, distances, ms = run(backend, vectors, employee_ids, pose_types, queries, query_poses, True)
+            report(f"centroid k={shortlist} w={weight:g}", found, distances, ms, truth,
+                   args.employees + shortlist * len(POSES))
+
+
+if __name__ == '__main__':
+    main()
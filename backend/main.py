@@ -1,10 +1,17 @@
+import os
 from app import create_app
+from app.config import Config
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Chỉ nạp model trong tiến trình phục vụ request, không phải tiến trình reloader
+    if Config.FACE_MODELS_WARMUP and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from app.services.face_models import warm_up
+        warm_up()
+
     app.run(
         host='0.0.0.0',    
         port=5000,
         debug=True        
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,37 @@
+"""face gallery change log
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 18:52:10.417302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('face_gallery_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.String(length=8), nullable=False),
+    sa.Column('pose_type', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('face_gallery_changes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_face_gallery_changes_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_face_gallery_changes_employee_id'), ['employee_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('face_gallery_changes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_face_gallery_changes_employee_id'))
+        batch_op.drop_index(batch_op.f('ix_face_gallery_changes_created_at'))
+
+    op.drop_table('face_gallery_changes')
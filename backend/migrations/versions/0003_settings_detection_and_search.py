@@ -0,0 +1,49 @@
+"""settings: face detection scale and gallery search backend
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 18:53:44.902615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Giá trị mặc định của model (app/models/settings.py), gán cho dòng settings đã có
+DEFAULTS = {
+    'detection_scale': 0.5,
+    'detection_max_side': 640,
+    'gallery_search_backend': 'exact',
+    'ivf_list_count': 64,
+    'ivf_probe_count': 8,
+    'centroid_shortlist': 10,
+}
+
+
+def upgrade():
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('detection_scale', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('detection_max_side', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('gallery_search_backend', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('ivf_list_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('ivf_probe_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('centroid_shortlist', sa.Integer(), nullable=True))
+
+    settings = sa.table('settings', *(sa.column(name) for name in DEFAULTS))
+    op.execute(settings.update().values(**DEFAULTS))
+
+
+def downgrade():
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.drop_column('centroid_shortlist')
+        batch_op.drop_column('ivf_probe_count')
+        batch_op.drop_column('ivf_list_count')
+        batch_op.drop_column('gallery_search_backend')
+        batch_op.drop_column('detection_max_side')
+        batch_op.drop_column('detection_scale')
@@ -0,0 +1,30 @@
+"""face_training_data: encoding norm and format version
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:55:02.136548
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dòng đã có nhận encoding_version = 1 (embedding gốc); scripts/normalize_face_encodings.py
+    # chuyển chúng sang vector đơn vị theo từng batch
+    with op.batch_alter_table('face_training_data', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('encoding_norm', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('encoding_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('face_training_data', schema=None) as batch_op:
+        batch_op.drop_column('encoding_version')
+        batch_op.drop_column('encoding_norm')
@@ -0,0 +1,49 @@
+# Đăng ký khuôn mặt hàng loạt từ thư mục hoặc file ZIP ảnh <EMPLOYEE_ID>_<pose>.jpg
+#
+#   python scripts/bulk_enroll.py /path/to/photos                  # thư mục (có thể kèm employees.csv)
+#   python scripts/bulk_enroll.py photos.zip --workers 4 --report bulk_report.json
+#
+# Cùng pipeline với POST /api/employees/bulk-enroll (app/services/bulk_enrollment.py):
+# mỗi tiến trình worker nạp model một lần, ảnh được decode một lần và chạy model
+# recognition theo batch; ảnh gốc được lưu vào data/uploads. Pose đã có sẽ bị thay thế.
+import argparse
+import json
+import os
+import sys
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_ROOT)
+
+from app import create_app  # noqa: E402
+from app.services.bulk_enrollment import bulk_enroll  # noqa: E402
+from app.utils.helpers import get_upload_path  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Enroll face images named EMPLOYEEID_pose.jpg in bulk')
+    parser.add_argument('source', help='directory or ZIP file of images (optional employees.csv manifest)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (0 = in-process)')
+    parser.add_argument('--batch-size', type=int, default=None, help='images per recognition-model batch')
+    parser.add_argument('--chunk-size', type=int, default=None, help='rows per database transaction')
+    parser.add_argument('--report', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        report = bulk_enroll(args.source, get_upload_path(), workers=args.workers, batch_size=args.batch_size,
+                             chunk_size=args.chunk_size,
+                             progress=lambda done, total: print(f"  {done}/{total} images processed"))
+
+    for error in report['errors']:
+        print(f"  {error['file']}: {error['error']}")
+    print(f"Done: {report['enrolled']}/{report['files']} images enrolled in {report['seconds']:.1f}s "
+          f"({report['images_per_second']:.1f} images/s), {report['employees_created']} employees created, "
+          f"{report['employees_completed']} completed face training")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if report['failed'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
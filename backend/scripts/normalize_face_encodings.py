@@ -0,0 +1,67 @@
+# Chuyển các FaceTrainingData cũ sang định dạng encoding hiện tại (chạy một lần)
+#
+#   flask db upgrade                                        # thêm cột encoding_norm / encoding_version
+#   python scripts/normalize_face_encodings.py              # ghi lại các dòng cũ theo từng batch
+#   python scripts/normalize_face_encodings.py --dry-run    # chỉ đếm, không ghi gì
+#
+# Định dạng 1 lưu embedding gốc của model; định dạng 2 (FaceTrainingData.ENCODING_VERSION)
+# lưu vector đơn vị và chuẩn gốc trong encoding_norm. Gallery chuẩn hóa dòng định dạng 1 bằng
+# đúng phép tính của normalize_face_encoding, nên nội dung gallery không đổi: không cần ghi
+# FaceGalleryChange, snapshot hiện có vẫn dùng được. Dòng sai kích thước hoặc có chuẩn 0 được
+# giữ nguyên và liệt kê ở cuối (gallery vốn đã bỏ qua chúng).
+import argparse
+import os
+import sys
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_ROOT)
+
+from app import create_app  # noqa: E402
+from app.db import db  # noqa: E402
+from app.models.face_training_data import FaceTrainingData  # noqa: E402
+
+
+def normalize_rows(batch_size, dry_run):
+    """(số dòng đã chuyển, [(training_id, lỗi)] các dòng bỏ qua)"""
+    converted, skipped, last_id = 0, [], 0
+    while True:
+        batch = (FaceTrainingData.query
+                 .filter(FaceTrainingData.id > last_id,
+                         FaceTrainingData.encoding_version != FaceTrainingData.ENCODING_VERSION)
+                 .order_by(FaceTrainingData.id.asc())
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        for row in batch:
+            try:
+                row.set_face_encoding(row.face_encoding)
+                converted += 1
+            except ValueError as e:
+                skipped.append((row.training_id, str(e)))
+        last_id = batch[-1].id
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        print(f"  {converted} rows converted")
+    return converted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite face encodings as unit vectors + original norm')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        converted, skipped = normalize_rows(args.batch_size, args.dry_run)
+        action = "would be converted" if args.dry_run else "converted"
+        print(f"Done: {converted} rows {action} to encoding version {FaceTrainingData.ENCODING_VERSION}")
+        for training_id, error in skipped:
+            print(f"  skipped {training_id}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Tạo bản INT8 của detector và model ArcFace từ model pack đang cài, rồi kiểm tra độ chính xác
+
+  python scripts/quantize_face_models.py                       # static (QDQ), calibration từ data/uploads
+  python scripts/quantize_face_models.py --mode dynamic
+  python scripts/quantize_face_models.py --evaluate-only       # chỉ chạy lại bước kiểm tra
+
+Bước kiểm tra: mỗi ảnh training trong data/uploads (<EMPLOYEE_ID>_<pose>.jpg) được
+nhận diện bằng pipeline FP32 và INT8, rồi so với embeddings FaceTrainingData của
+gallery (các pose khác của cùng nhân viên = genuine, nhân viên khác = impostor).
+Kết quả ghi vào quantization_report.json; FACE_USE_QUANTIZED_MODELS chỉ có tác dụng
+khi báo cáo có "passed": true.
+"""
+import argparse
+import glob
+import os
+import sys
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_ROOT)
+
+from app.config import Config  # noqa: E402
+
+# Luôn so sánh với model FP32 gốc, kể cả khi môi trường đang bật fast path
+Config.FACE_USE_QUANTIZED_MODELS = False
+
+from app.services import face_quantization  # noqa: E402
+from app.services.face_models import (  # noqa: E402
+    align_face_crop, create_face_analyzer, detect_faces, embed_aligned_crops,
+)
+from app.services.onnx_sessions import build_session_options  # noqa: E402
+
+QUANTIZED_TASKS = ('detection', 'recognition')
+
+
+def load_images(directory, limit=None):
+    """[(employee_id, pose_type, image_bgr)] từ các file <EMPLOYEE_ID>_<pose>.jpg"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.jpg'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if '_' not in name:
+            continue
+        img = cv2.imread(path)
+        if img is not None:
+            employee_id, pose_type = name.rsplit('_', 1)
+            images.append((employee_id, pose_type, img))
+        if limit and len(images) >= limit:
+            break
+    return images
+
+
+class _RecordingSession:
+    """Wraps an InferenceSession and keeps every input feed, so calibration data is
+    preprocessed exactly like the real pipeline does it"""
+
+    def __init__(self, session):
+        self._session = session
+        self.feeds = []
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def run(self, output_names, input_feed, run_options=None):
+        self.feeds.append({k: np.array(v, copy=True) for k, v in input_feed.items()})
+        return self._session.run(output_names, input_feed, run_options)
+
+
+def run_pipeline(analyzer, image):
+    """Unit embedding of the single face in `image`, or None"""
+    faces = detect_faces(analyzer, image)
+    if len(faces) != 1:
+        return None
+    return embed_aligned_crops(analyzer, [align_face_crop(image, faces[0].kps)])[0]
+
+
+def collect_calibration_feeds(analyzer, images):
+    recorders = {task: _RecordingSession(analyzer.models[task].session) for task in QUANTIZED_TASKS}
+    for task, recorder in recorders.items():
+        analyzer.models[task].session = recorder
+    try:
+        for _, _, image in images:
+            run_pipeline(analyzer, image)
+    finally:
+        for task, recorder in recorders.items():
+            analyzer.models[task].session = recorder._session
+    return {task: recorder.feeds for task, recorder in recorders.items()}
+
+
+def quantize(model_file, output_file, mode, feeds):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if mode == 'dynamic':
+        quantize_dynamic(model_file, output_file, weight_type=QuantType.QInt8)
+        return
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._feeds = iter(feeds)
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    source = model_file
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        source = output_file + '.pre.onnx'
+        quant_pre_process(model_file, source)
+    except Exception as e:
+        print(f"  pre-processing skipped ({e})")
+        source = model_file
+    try:
+        quantize_static(source, output_file, _Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    finally:
+        if source != model_file and os.path.exists(source):
+            os.remove(source)
+
+
+def gallery_arrays():
+    from app import create_app
+    from app.services.face_gallery import FaceGallery
+    app = create_app()
+    with app.app_context():
+        gallery = FaceGallery()
+        gallery.load_from_database()
+        return gallery.vectors.copy(), np.array(gallery.employee_ids, dtype=object), np.array(gallery.pose_types, dtype=object)
+
+
+def evaluate(baseline_analyzer, candidate_analyzer, images):
+    vectors, ids, poses = gallery_arrays()
+    baseline, candidate, similarities = [], [], []
+    for employee_id, pose_type, image in images:
+        fp32 = run_pipeline(baseline_analyzer, image)
+        int8 = run_pipeline(candidate_analyzer, image)
+        baseline.append((employee_id, pose_type, fp32))
+        candidate.append((employee_id, pose_type, int8))
+        if fp32 is not None and int8 is not None:
+            similarities.append(float(fp32 @ int8))
+    detected = sum(e is not None for _, _, e in baseline)
+    return {
+        'images': len(images),
+        'gallery_rows': int(vectors.shape[0]),
+        'fp32': face_quantization.distance_distributions(baseline, vectors, ids, poses),
+        'int8': face_quantization.distance_distributions(candidate, vectors, ids, poses),
+        'embedding_similarity': {
+            'mean': float(np.mean(similarities)) if similarities else 0.0,
+            'min': float(np.min(similarities)) if similarities else 0.0,
+        },
+        'detection_agreement': len(similarities) / detected if detected else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pack', default=Config.FACE_MODEL_PACK)
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static')
+    parser.add_argument('--images', default=os.path.join(BACKEND_ROOT, 'data', 'uploads'))
+    parser.add_argument('--calibration-size', type=int, default=200, help='số ảnh dùng để calibration (static)')
+    parser.add_argument('--evaluate-only', action='store_true')
+    parser.add_argument('--min-queries', type=int, default=20)
+    parser.add_argument('--max-accept-drop', type=float, default=0.01)
+    parser.add_argument('--max-false-accept-increase', type=float, default=0.0)
+    parser.add_argument('--min-embedding-similarity', type=float, default=0.98)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        sys.exit(f"Không tìm thấy ảnh <EMPLOYEE_ID>_<pose>.jpg trong {args.images}")
+    output_dir = face_quantization.quantized_pack_dir(args.pack)
+    os.makedirs(output_dir, exist_ok=True)
+
+    baseline = create_face_analyzer(args.pack, ','.join(QUANTIZED_TASKS))
+    outputs = {task: os.path.join(output_dir, face_quantization.quantized_file_name(baseline.models[task].model_file))
+               for task in QUANTIZED_TASKS}
+
+    if not args.evaluate_only:
+        feeds = collect_calibration_feeds(baseline, images[:args.calibration_size]) if args.mode == 'static' else {}
+        for task in QUANTIZED_TASKS:
+            print(f"Quantizing {task}: {baseline.models[task].model_file} -> {outputs[task]} ({args.mode})")
+            quantize(baseline.models[task].model_file, outputs[task], args.mode, feeds.get(task, []))
+
+    import onnxruntime as ort
+    candidate = create_face_analyzer(args.pack, ','.join(QUANTIZED_TASKS))
+    for task in QUANTIZED_TASKS:
+        candidate.models[task].session = ort.InferenceSession(
+            outputs[task], build_session_options(), providers=['CPUExecutionProvider'])
+
+    results = evaluate(baseline, candidate, images)
+    passed, reasons = face_quantization.accuracy_gate(
+        results['fp32'], results['int8'], results['embedding_similarity']['mean'],
+        min_queries=args.min_queries, max_accept_drop=args.max_accept_drop,
+        max_false_accept_increase=args.max_false_accept_increase,
+        min_embedding_similarity=args.min_embedding_similarity,
+    )
+    report = {
+        'pack': args.pack,
+        'mode': args.mode,
+        'onnxruntime': ort.__version__,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'models': [os.path.basename(path) for path in outputs.values()],
+        'passed': passed,
+        'reasons': reasons,
+        **results,
+    }
+    face_quantization.save_report(args.pack, report)
+
+    for variant in ('fp32', 'int8'):
+        r = results[variant]
+        print(f"{variant}: queries={r['queries']} accept={r['accept_rate']:.3f} false_accept={r['false_accept_rate']:.3f} "
+              f"genuine p50={r['genuine'].get('p50', float('nan')):.3f} impostor p5={r['impostor'].get('p5', float('nan')):.3f}")
+    print(f"embedding similarity mean={results['embedding_similarity']['mean']:.4f} "
+          f"min={results['embedding_similarity']['min']:.4f}, detection agreement={results['detection_agreement']:.3f}")
+    print("PASSED: set FACE_USE_QUANTIZED_MODELS=true to enable" if passed else "FAILED: " + "; ".join(reasons))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
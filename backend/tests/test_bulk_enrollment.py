@@ -0,0 +1,128 @@
+import zipfile
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.employee import Employee
+from app.models.face_gallery_change import FaceGalleryChange
+from app.models.face_training_data import FaceTrainingData
+from app.services import bulk_enrollment, face_models
+from app.services.face_gallery import EMBEDDING_DIM
+
+
+class BulkTestingConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def app():
+    app = create_app(BulkTestingConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Employee.create_employee('E001', {'full_name': 'Nguyen Van A', 'department': 'IT'}))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Detector trả về đúng một mặt; embedding (chưa chuẩn hóa) suy ra từ độ sáng ảnh"""
+    calls = {"embed": 0}
+
+    def embed(analyzer, crops, normalize=True):
+        calls["embed"] += 1
+        assert not normalize
+        return np.stack([np.full(EMBEDDING_DIM, crop.mean(), dtype=np.float32) for crop in crops])
+
+    monkeypatch.setattr(face_models, 'get_face_analyzer', lambda: object())
+    monkeypatch.setattr(face_models, 'detect_faces', lambda analyzer, image: [SimpleNamespace(kps=None)])
+    monkeypatch.setattr(face_models, 'align_face_crop', lambda image, kps: image)
+    monkeypatch.setattr(face_models, 'embed_aligned_crops', embed)
+    return calls
+
+
+def _jpeg(brightness):
+    return cv2.imencode('.jpg', np.full((120, 100, 3), brightness, dtype=np.uint8))[1].tobytes()
+
+
+def _write_archive(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('employees.csv', 'employee_id,full_name,department\nE002,Tran Thi B,HR\n')
+        for pose, brightness in (('front', 120), ('left', 130), ('right', 140)):
+            archive.writestr(f'photos/E001_{pose}.jpg', _jpeg(brightness))
+        archive.writestr('photos/E002_front.jpg', _jpeg(150))
+        archive.writestr('photos/E002_left.jpg', _jpeg(20))      # quá tối
+        archive.writestr('photos/E003_front.jpg', _jpeg(120))    # không có trong database/manifest
+        archive.writestr('photos/E002_back.jpg', _jpeg(120))     # pose không hợp lệ
+        archive.writestr('photos/E002_right.jpg', b'not an image')
+
+
+def test_bulk_enroll_zip(app, fake_models, tmp_path):
+    archive = tmp_path / 'photos.zip'
+    _write_archive(archive)
+    upload_dir = tmp_path / 'uploads'
+
+    report = bulk_enrollment.bulk_enroll(str(archive), str(upload_dir), workers=0, batch_size=2)
+
+    assert (report['files'], report['enrolled'], report['failed']) == (8, 4, 4)
+    assert report['employees_created'] == 1 and report['employees_completed'] == 1
+    failed = {error['file']: error['error'] for error in report['errors']}
+    assert failed['photos/E002_left.jpg'] == "Insufficient lighting"
+    assert failed['photos/E003_front.jpg'] == "Unknown employee E003"
+    assert failed['photos/E002_right.jpg'] == "Invalid image"
+    assert 'photos/E002_back.jpg' in failed
+    assert fake_models["embed"] == 2  # một lần chạy model recognition cho mỗi batch có ảnh hợp lệ
+
+    e001 = Employee.query.filter_by(employee_id='E001').first()
+    assert e001.total_poses_trained == 3 and e001.face_training_completed
+    e002 = Employee.query.filter_by(employee_id='E002').first()
+    assert e002.total_poses_trained == 1 and not e002.face_training_completed
+    assert {c.employee_id for c in FaceGalleryChange.query.all()} == {'E001', 'E002'}
+
+    row = FaceTrainingData.query.filter_by(employee_id='E001', pose_type='front').first()
+    assert row.encoding_version == FaceTrainingData.ENCODING_VERSION
+    assert np.linalg.norm(np.frombuffer(row.face_encoding, dtype=np.float32)) == pytest.approx(1.0)
+    assert row.encoding_norm == pytest.approx(np.sqrt(EMBEDDING_DIM) * 120, rel=0.02)
+    # Ảnh gốc được lưu nguyên byte, không encode lại
+    with zipfile.ZipFile(archive) as z:
+        assert (upload_dir / 'E001_front.jpg').read_bytes() == z.read('photos/E001_front.jpg')
+
+
+def test_bulk_enroll_directory_replaces_existing_poses(app, fake_models, tmp_path):
+    source, upload_dir = tmp_path / 'photos', str(tmp_path / 'uploads')
+    source.mkdir()
+    (source / 'E001_front.jpg').write_bytes(_jpeg(100))
+    bulk_enrollment.bulk_enroll(str(source), upload_dir, workers=0)
+    (source / 'E001_front.jpg').write_bytes(_jpeg(200))
+    report = bulk_enrollment.bulk_enroll(str(source), upload_dir, workers=0)
+
+    assert report['enrolled'] == 1 and report['errors'] == []
+    rows = FaceTrainingData.query.filter_by(employee_id='E001').all()
+    assert len(rows) == 1 and rows[0].encoding_norm == pytest.approx(np.sqrt(EMBEDDING_DIM) * 200, rel=0.02)
+    assert Employee.query.filter_by(employee_id='E001').first().total_poses_trained == 1
+
+
+def test_rolled_back_chunk_keeps_the_previous_image(app, fake_models, tmp_path, monkeypatch):
+    source, upload_dir = tmp_path / 'photos', tmp_path / 'uploads'
+    source.mkdir()
+    (source / 'E001_front.jpg').write_bytes(_jpeg(100))
+    bulk_enrollment.bulk_enroll(str(source), str(upload_dir), workers=0)
+
+    def fail(employee_id, pose_type=None):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(FaceGalleryChange, 'record', fail)
+    (source / 'E001_front.jpg').write_bytes(_jpeg(200))
+    report = bulk_enrollment.bulk_enroll(str(source), str(upload_dir), workers=0)
+
+    assert report['enrolled'] == 0 and report['errors'][0]['error'].startswith("Database error")
+    # Ảnh training vẫn khớp với dòng FaceTrainingData còn lại, không sót file tạm
+    assert (upload_dir / 'E001_front.jpg').read_bytes() == _jpeg(100)
+    assert [p.name for p in upload_dir.iterdir()] == ['E001_front.jpg']
+    row = FaceTrainingData.query.filter_by(employee_id='E001', pose_type='front').first()
+    assert row.encoding_norm == pytest.approx(np.sqrt(EMBEDDING_DIM) * 100, rel=0.02)
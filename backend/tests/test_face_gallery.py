@@ -0,0 +1,204 @@
+import numpy as np
+import pytest
+from app.models.face_training_data import FaceTrainingData
+from app.services.face_gallery import FaceGallery, EMBEDDING_DIM
+
+
+def _random_embedding(rng):
+    return rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+
+def _row(employee_id, pose_type, vector):
+    return employee_id, pose_type, vector.astype(np.float32).tobytes()
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(42)
+
+
+def test_search_matches_per_row_loop(rng):
+    rows = [_row(f"EMP{i:03d}", pose, _random_embedding(rng))
+            for i in range(20) for pose in ("front", "left", "right")]
+    gallery = FaceGallery()
+    gallery.build(rows)
+    query = _random_embedding(rng)
+
+    # Cách tính cũ: chuẩn hóa từng vector rồi dot product
+    q = query / np.linalg.norm(query)
+    expected = min(
+        ((1 - np.dot(q, np.frombuffer(enc, np.float32) / np.linalg.norm(np.frombuffer(enc, np.float32))), emp)
+         for emp, _, enc in rows)
+    )
+
+    employee_id, distance = gallery.search(query)
+    assert employee_id == expected[1]
+    assert distance == pytest.approx(expected[0], abs=1e-5)
+
+
+def test_search_finds_noisy_copy(rng):
+    target = _random_embedding(rng)
+    rows = [_row("EMP001", "front", target)]
+    rows += [_row(f"EMP{i:03d}", "front", _random_embedding(rng)) for i in range(2, 50)]
+    gallery = FaceGallery()
+    gallery.build(rows)
+
+    employee_id, distance = gallery.search(target + 0.05 * _random_embedding(rng))
+    assert employee_id == "EMP001"
+    assert distance < 0.35
+
+
+def test_build_skips_malformed_rows(rng):
+    gallery = FaceGallery()
+    gallery.build([("EMP001", "front", b"\x00" * 16), _row("EMP002", "front", _random_embedding(rng))])
+    assert gallery.size == 1
+    assert list(gallery.employee_ids) == ["EMP002"]
+
+
+def test_pre_normalized_rows_match_legacy_rows(rng):
+    raw = [_row(f"EMP{i:03d}", pose, _random_embedding(rng) * (1 + i)) for i in range(8) for pose in ("front", "left")]
+    unit_rows = []
+    for employee_id, pose_type, encoding in raw:
+        record = FaceTrainingData.create_training_data(employee_id, pose_type, encoding, 80.0)
+        assert record.encoding_version == FaceTrainingData.ENCODING_VERSION
+        assert record.encoding_norm == pytest.approx(np.linalg.norm(np.frombuffer(encoding, np.float32)))
+        unit_rows.append((employee_id, pose_type, record.face_encoding, 80.0, record.encoding_version))
+
+    # Dòng đã chuẩn hóa được nạp nguyên khối, dòng cũ vẫn chuẩn hóa từng dòng: cùng một nội dung
+    legacy = FaceGallery()
+    legacy.build(raw)
+    mixed = FaceGallery()
+    mixed.build(unit_rows[::2] + [r + (80.0, FaceTrainingData.ENCODING_VERSION_RAW) for r in raw[1::2]])
+    assert mixed.size == legacy.size
+    for key, row in mixed._row_index.items():
+        assert np.array_equal(mixed.vectors[row], legacy.vectors[legacy._row_index[key]])
+    query = _random_embedding(rng)
+    assert mixed.search(query) == legacy.search(query)
+
+
+def test_empty_gallery_returns_no_match(rng):
+    gallery = FaceGallery()
+    gallery.build([])
+    assert gallery.search(_random_embedding(rng)) == (None, float("inf"))
+
+
+def _assert_same_content(gallery, rows):
+    expected = FaceGallery()
+    expected.build(rows)
+    actual = {(e, p): v for e, p, v in zip(gallery.employee_ids, gallery.pose_types, gallery.vectors)}
+    wanted = {(e, p): v for e, p, v in zip(expected.employee_ids, expected.pose_types, expected.vectors)}
+    assert actual.keys() == wanted.keys()
+    for key, vector in wanted.items():
+        np.testing.assert_allclose(actual[key], vector, rtol=1e-6)
+
+
+def test_row_deltas_keep_gallery_consistent(rng):
+    rows = [_row(f"EMP{i:03d}", pose, _random_embedding(rng))
+            for i in range(10) for pose in ("front", "left", "right", "up", "down")]
+    gallery = FaceGallery()
+    gallery.build(rows)
+
+    # Thay thế một pose, xóa toàn bộ một nhân viên, thêm nhân viên mới
+    replaced = _row("EMP003", "left", _random_embedding(rng))
+    gallery.apply_employee_rows("EMP003", [replaced], pose_type="left")
+    gallery.apply_employee_rows("EMP000", [])
+    new_rows = [_row("EMP100", pose, _random_embedding(rng)) for pose in ("front", "up")]
+    gallery.apply_employee_rows("EMP100", new_rows)
+
+    expected = [r for r in rows if r[0] != "EMP000" and r[:2] != ("EMP003", "left")]
+    expected += [replaced] + new_rows
+    assert gallery.size == len(expected)
+    _assert_same_content(gallery, expected)
+
+
+def test_remove_row_is_idempotent(rng):
+    gallery = FaceGallery()
+    gallery.build([_row("EMP001", "front", _random_embedding(rng)),
+                   _row("EMP002", "front", _random_embedding(rng))])
+    gallery.remove_row("EMP001", "front")
+    gallery.remove_row("EMP001", "front")
+    assert gallery.size == 1
+    assert list(gallery.employee_ids) == ["EMP002"]
+
+
+def _identity_rows(rng, employees, poses=("front", "left", "right", "up", "down"), noise=0.3):
+    centers = rng.standard_normal((employees, EMBEDDING_DIM)).astype(np.float32)
+    rows = [_row(f"EMP{i:05d}", pose, centers[i] + noise * rng.standard_normal(EMBEDDING_DIM))
+            for i in range(employees) for pose in poses]
+    return centers, rows
+
+
+def test_ivf_backend_agrees_with_exact_search(rng):
+    centers, rows = _identity_rows(rng, 400)
+    exact, ivf = FaceGallery(), FaceGallery()
+    exact.build(rows)
+    ivf.build(rows)
+    ivf.configure("ivf", nlist=16, nprobe=4)
+
+    queries = centers[:50] + 0.3 * rng.standard_normal((50, EMBEDDING_DIM)).astype(np.float32)
+    agree = sum(exact.search(q)[0] == ivf.search(q)[0] for q in queries)
+    assert agree >= 48
+
+
+def test_ivf_backend_sees_rows_added_after_indexing(rng):
+    _, rows = _identity_rows(rng, 200)
+    gallery = FaceGallery()
+    gallery.build(rows)
+    gallery.configure("ivf", nlist=16, nprobe=1)
+    gallery.search(_random_embedding(rng))  # huấn luyện và gán bucket
+
+    newcomer = _random_embedding(rng)
+    gallery.apply_employee_rows("NEW00001", [_row("NEW00001", "front", newcomer)])
+    gallery.apply_employee_rows("EMP00000", [])
+
+    employee_id, distance = gallery.search(newcomer)
+    assert employee_id == "NEW00001"
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert "EMP00000" not in set(gallery.employee_ids)
+
+
+def test_centroid_backend_agrees_with_exact_search(rng):
+    centers, rows = _identity_rows(rng, 300)
+    exact, centroid = FaceGallery(), FaceGallery()
+    exact.build(rows)
+    centroid.build(rows)
+    centroid.configure("centroid", shortlist=5)
+
+    queries = centers[:50] + 0.3 * rng.standard_normal((50, EMBEDDING_DIM)).astype(np.float32)
+    for query in queries:
+        employee_id, distance = exact.search(query)
+        assert centroid.search(query, "left") == (employee_id, pytest.approx(distance, abs=1e-5))
+
+    # Delta sau khi đã tính centroid
+    newcomer = _random_embedding(rng)
+    centroid.apply_employee_rows("NEW00001", [_row("NEW00001", "up", newcomer)])
+    assert centroid.search(newcomer)[0] == "NEW00001"
+
+
+@pytest.mark.parametrize("backend", ["centroid", "ivf"])
+def test_removing_the_last_row_keeps_search_consistent(rng, backend):
+    _, rows = _identity_rows(rng, 300)
+    gallery = FaceGallery()
+    gallery.build(rows)
+    gallery.configure(backend)
+    query = np.frombuffer(rows[-1][2], dtype=np.float32)
+    assert gallery.search(query)[0] == rows[-1][0]  # backend đã chuẩn bị xong trước khi xóa
+
+    gallery.remove_row(rows[-1][0], rows[-1][1])
+    employee_id, _ = gallery.search(query)
+    assert employee_id is not None and gallery.size == len(rows) - 1
+
+
+def test_centroid_backend_weights_the_query_pose(rng):
+    base = _random_embedding(rng)
+    left, front = base + 0.4 * _random_embedding(rng), base + 0.4 * _random_embedding(rng)
+    gallery = FaceGallery()
+    gallery.build([_row("EMP001", "left", left), _row("EMP002", "front", front)])
+    gallery.configure("centroid", shortlist=2, pose_weight=1.0)
+    query = left + front
+
+    assert gallery.search(query, "left")[0] == "EMP001"
+    assert gallery.search(query, "front")[0] == "EMP002"
+    # Khoảng cách trả về vẫn là cosine thật, không cộng trọng số pose
+    q = query / np.linalg.norm(query)
+    assert gallery.search(query, "left")[1] == pytest.approx(1 - q @ (left / np.linalg.norm(left)), abs=1e-5)
@@ -0,0 +1,58 @@
+import numpy as np
+from insightface.app.common import Face
+
+from app.services import facial_service
+from app.services.face_tracking import confident_track, tracking_roi
+from app.services.facial_service import FrameAnalysis
+
+
+def _frame(x, y, size=80, shape=(480, 640)):
+    image = np.zeros((*shape, 3), dtype=np.uint8)
+    image[y:y + size, x:x + size] = 255
+    return image
+
+
+def _square_detector(calls):
+    """Stand-in detector: the white square of the image is the face"""
+    def detect(image_bgr, scale=1.0, max_side=0):
+        calls.append(image_bgr.shape[:2])
+        ys, xs = np.nonzero(image_bgr[..., 0])
+        if not len(xs):
+            return []
+        bbox = np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1], dtype=np.float32)
+        return [Face(bbox=bbox, kps=np.tile(bbox[:2], (5, 1)), det_score=np.float32(0.9))]
+    return detect
+
+
+def test_tracking_roi_is_padded_and_clipped():
+    assert tracking_roi([100, 100, 200, 200], (480, 640), 0.5) == (50, 50, 250, 250)
+    assert tracking_roi([0, 400, 100, 480], (480, 640), 0.5) == (0, 360, 150, 480)
+    assert tracking_roi([700, 10, 800, 60], (480, 640), 0.5) is None
+
+
+def test_track_rejects_faces_cut_by_the_roi():
+    face = {'bbox': np.array([50, 80, 120, 150], dtype=np.float32), 'det_score': 0.9}
+    assert confident_track([face], (40, 60, 140, 170), (480, 640), 0.6)
+    assert not confident_track([face], (50, 60, 140, 170), (480, 640), 0.6)
+    assert not confident_track([face, face], (40, 60, 140, 170), (480, 640), 0.6)
+    assert not confident_track([dict(face, det_score=0.3)], (40, 60, 140, 170), (480, 640), 0.6)
+
+
+def test_frame_analysis_searches_roi_then_falls_back(monkeypatch):
+    calls = []
+    monkeypatch.setattr(facial_service, '_detect_faces', _square_detector(calls))
+
+    first = FrameAnalysis(_frame(200, 150))
+    assert list(first.bbox) == [200, 150, 280, 230] and not first.tracked
+
+    # Khuôn mặt dịch nhẹ: chỉ detector trên ROI, bbox trả về theo toạ độ frame
+    moved = FrameAnalysis(_frame(210, 155))
+    moved.track_from(first.bbox)
+    assert list(moved.bbox) == [210, 155, 290, 235] and moved.tracked
+    assert calls[-1] == (160, 160)
+
+    # Khuôn mặt ra khỏi ROI: phát hiện lại trên toàn frame
+    jumped = FrameAnalysis(_frame(450, 300))
+    jumped.track_from(moved.bbox)
+    assert list(jumped.bbox) == [450, 300, 530, 380] and not jumped.tracked
+    assert calls[-1] == (480, 640)
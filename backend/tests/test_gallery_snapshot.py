@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.services.face_gallery import FaceGallery, EMBEDDING_DIM
+from app.services.gallery_snapshot import load_snapshot, write_snapshot
+
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(7)
+    gallery = FaceGallery()
+    gallery.build([(f"EMP{i:03d}", pose, rng.standard_normal(EMBEDDING_DIM).astype(np.float32).tobytes(), 40.0 + i)
+                   for i in range(30) for pose in ("front", "left", "right")])
+    gallery.generation = 12
+    return gallery
+
+
+def _write(gallery, path, dtype='float32'):
+    write_snapshot(str(path), gallery.generation, gallery.vectors, gallery.employee_ids,
+                   gallery.pose_types, gallery.qualities, dtype=dtype)
+
+
+def test_snapshot_round_trip_is_mapped_in_place(gallery, tmp_path):
+    path = tmp_path / 'gallery.snapshot'
+    _write(gallery, path)
+    snapshot = load_snapshot(str(path), dim=EMBEDDING_DIM)
+
+    assert snapshot.generation == 12 and snapshot.size == gallery.size
+    assert not snapshot.vectors.flags.writeable  # view của mmap, không phải bản sao
+    assert np.array_equal(snapshot.vectors, gallery.vectors)
+    assert list(snapshot.employee_ids) == list(gallery.employee_ids)
+    assert list(snapshot.pose_types) == list(gallery.pose_types)
+    assert np.array_equal(snapshot.quality, gallery.qualities)
+
+
+def test_float16_snapshot(gallery, tmp_path):
+    path = tmp_path / 'gallery.snapshot'
+    _write(gallery, path, dtype='float16')
+    snapshot = load_snapshot(str(path))
+    assert snapshot.vectors.dtype == np.float32
+    np.testing.assert_allclose(snapshot.vectors, gallery.vectors, atol=1e-3)
+
+
+def test_invalid_snapshots_are_rejected(gallery, tmp_path):
+    path = tmp_path / 'gallery.snapshot'
+    assert load_snapshot(str(path)) is None
+    _write(gallery, path)
+    assert load_snapshot(str(path), dim=128) is None
+
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    assert load_snapshot(str(path)) is None
+    path.write_bytes(b'XXXX' + data[4:])
+    assert load_snapshot(str(path)) is None
+
+
+def test_gallery_copies_snapshot_on_first_change(gallery, tmp_path):
+    path = tmp_path / 'gallery.snapshot'
+    _write(gallery, path)
+    query = gallery.vectors[4] + 0.01
+    expected = gallery.search(query)
+
+    warm = FaceGallery()
+    warm.adopt_snapshot(load_snapshot(str(path)))
+    assert warm.generation == 12 and warm.search(query) == expected
+
+    replacement = np.ones(EMBEDDING_DIM, dtype=np.float32)
+    warm.upsert_row("EMP001", "left", replacement.tobytes(), 90.0)
+    warm.remove_row("EMP000", "front")
+    assert warm.vectors.flags.writeable
+    assert warm.search(replacement) == ("EMP001", pytest.approx(0.0, abs=1e-6))
+    assert warm.size == gallery.size - 1
+    # File trên đĩa không bị thay đổi
+    assert np.array_equal(load_snapshot(str(path)).vectors, gallery.vectors)
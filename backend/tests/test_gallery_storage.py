@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from app.services.face_gallery import FaceGallery, EMBEDDING_DIM
+from app.services.gallery_snapshot import load_snapshot
+
+THRESHOLD = 0.35  # FacialRecognitionService.match_embedding
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = np.random.default_rng(11)
+    centers = rng.standard_normal((200, EMBEDDING_DIM))
+    return [(f"EMP{i:04d}", pose, (centers[i] + 0.6 * rng.standard_normal(EMBEDDING_DIM)).astype(np.float32).tobytes())
+            for i in range(200) for pose in ("front", "left", "right", "up", "down")]
+
+
+def _boundary_queries(gallery, rng):
+    """Queries whose best match sits right at the threshold, on both sides, plus near ties"""
+    vectors = gallery.vectors
+    queries = []
+    for row in rng.choice(gallery.size, 60, replace=False):
+        target = vectors[row]
+        noise = _unit(rng.standard_normal(EMBEDDING_DIM) - target * (rng.standard_normal(EMBEDDING_DIM) @ target))
+        for delta in (-1e-3, -1e-4, -1e-5, 1e-5, 1e-4, 1e-3):
+            similarity = 1.0 - THRESHOLD - delta
+            queries.append(similarity * target + np.sqrt(1 - similarity ** 2) * noise)
+    for a, b in rng.choice(gallery.size, (20, 2)):
+        queries.append(vectors[a] + vectors[b] + 1e-4 * rng.standard_normal(EMBEDDING_DIM))
+    return np.asarray(queries, dtype=np.float32)
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_compact_precision_keeps_matching_decisions(rows, precision):
+    exact, compact = FaceGallery(precision="float32"), FaceGallery(precision=precision)
+    exact.build(rows)
+    compact.build(rows)
+
+    queries = _boundary_queries(exact, np.random.default_rng(5))
+    for query in queries:
+        expected_id, expected_distance = exact.search(query)
+        employee_id, distance = compact.search(query)
+        assert employee_id == expected_id
+        assert (distance < THRESHOLD) == (expected_distance < THRESHOLD)
+        assert distance == expected_distance
+
+
+def test_int8_gallery_uses_snapshot_rows_and_less_memory(rows, tmp_path):
+    source = FaceGallery(precision="float32")
+    source.build(rows)
+    path = str(tmp_path / 'gallery.snapshot')
+    source.save_snapshot(path)
+
+    float32, int8 = FaceGallery(precision="float32"), FaceGallery(precision="int8")
+    float32.build(rows)
+    int8.adopt_snapshot(load_snapshot(path))
+    assert float32.memory_bytes >= 3.5 * int8.memory_bytes
+
+    # Delta sau khi nạp snapshot: dòng mới nằm trong overlay, dòng bị xoá được thay bằng dòng cuối
+    newcomer = np.random.default_rng(3).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    for gallery in (float32, int8):
+        gallery.remove_row("EMP0000", "front")
+        gallery.upsert_row("NEW0001", "front", newcomer.tobytes())
+    np.testing.assert_array_equal(int8.vectors, float32.vectors)
+    assert int8.search(newcomer) == float32.search(newcomer)
+
+
+def test_centroid_backend_reads_exact_rows_with_compact_storage(rows):
+    exact, compact = FaceGallery(precision="float32"), FaceGallery(precision="int8")
+    for gallery in (exact, compact):
+        gallery.build(rows)
+        gallery.configure("centroid", shortlist=5)
+
+    # Trọng số pose làm thứ hạng khác cosine thuần: kết quả vẫn phải giống float32
+    for query in _boundary_queries(exact, np.random.default_rng(9))[::7]:
+        for pose in (None, "left", "up"):
+            assert compact.search(query, pose) == exact.search(query, pose)
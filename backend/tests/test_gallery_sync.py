@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import pytz
+
+from app import create_app, db
+from app.config import Config, TestingConfig
+from app.models.employee import Employee
+from app.models.face_gallery_change import FaceGalleryChange
+from app.models.face_training_data import FaceTrainingData
+from app.services.face_gallery import FaceGallery, EMBEDDING_DIM
+
+
+class SyncTestingConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'FACE_GALLERY_SNAPSHOT_PATH', '')
+    app = create_app(SyncTestingConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _enroll(employee_id, change_id=None, created_at=None):
+    """Nhân viên đã train xong + một FaceGalleryChange với id cho trước (mô phỏng id cấp lúc INSERT)"""
+    employee = Employee.create_employee(employee_id, {'full_name': employee_id, 'department': 'IT'}, 3)
+    encoding = np.random.default_rng(change_id).standard_normal(EMBEDDING_DIM).astype(np.float32).tobytes()
+    db.session.add_all([employee, FaceTrainingData.create_training_data(employee_id, 'front', encoding, 80.0),
+                        FaceGalleryChange(id=change_id, employee_id=employee_id, created_at=created_at)])
+    db.session.commit()
+
+
+def test_change_committed_late_with_a_lower_id_is_applied(app):
+    _enroll('E001', 1)
+    gallery = FaceGallery()
+    gallery.sync()
+    _enroll('E003', 3)
+    gallery.sync(force=True)
+    assert gallery.generation == 3 and set(gallery.employee_ids) == {'E001', 'E003'}
+
+    # Id 2 được cấp trước id 3 nhưng transaction của nó commit sau
+    _enroll('E002', 2)
+    gallery.sync(force=True)
+    assert set(gallery.employee_ids) == {'E001', 'E002', 'E003'} and gallery.generation == 3
+
+
+def test_prune_keeps_recent_changes_and_idle_workers_reload(app):
+    now = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    old = now - timedelta(hours=Config.FACE_GALLERY_CHANGE_RETENTION_HOURS + 1)
+    _enroll('E001', 1, created_at=old)
+    idle = FaceGallery()
+    idle.sync()
+    _enroll('E002', 2, created_at=old)
+    _enroll('E003', 3)
+
+    assert FaceGalleryChange.prune(3, Config.FACE_GALLERY_CHANGE_RETENTION_HOURS) == 2
+    assert [change.id for change in FaceGalleryChange.query.all()] == [3]
+
+    # Thay đổi id 2 (E002) đã bị xóa trước khi worker này áp dụng: phải nạp lại toàn bộ
+    idle.sync(force=True)
+    assert set(idle.employee_ids) == {'E001', 'E002', 'E003'} and idle.generation == 3
+
+
+def test_pruning_the_whole_log_keeps_generations_increasing(app, monkeypatch):
+    now = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    old = now - timedelta(hours=Config.FACE_GALLERY_CHANGE_RETENTION_HOURS + 1)
+    for change_id, employee_id in enumerate(('E001', 'E002', 'E003'), start=1):
+        _enroll(employee_id, change_id, created_at=old)
+    idle = FaceGallery()
+    idle.sync()
+
+    # Mọi thay đổi đều cũ và đã nằm trong snapshot: dòng mới nhất vẫn phải được giữ
+    assert FaceGalleryChange.prune(3, Config.FACE_GALLERY_CHANGE_RETENTION_HOURS) == 2
+    assert FaceGalleryChange.current_generation() == 3
+
+    _enroll('E004')
+    assert FaceGalleryChange.current_generation() == 4
+    # Worker để yên lâu hơn cửa sổ replay chỉ còn thấy các thay đổi có id > generation của nó
+    monkeypatch.setattr(Config, 'FACE_GALLERY_CHANGE_REPLAY_SECONDS', 0)
+    idle.sync(force=True)
+    assert 'E004' in idle.employee_ids and idle.generation == 4
+
+
+def test_load_from_database_leaves_snapshot_and_change_log_alone(app, monkeypatch, tmp_path):
+    snapshot_path = tmp_path / 'face_gallery.snapshot'
+    monkeypatch.setattr(Config, 'FACE_GALLERY_SNAPSHOT_PATH', str(snapshot_path))
+    now = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+    old = now - timedelta(hours=Config.FACE_GALLERY_CHANGE_RETENTION_HOURS + 1)
+    _enroll('E001', 1, created_at=old)
+    _enroll('E002', 2, created_at=old)
+
+    gallery = FaceGallery()
+    gallery.load_from_database()
+    assert set(gallery.employee_ids) == {'E001', 'E002'}
+    assert not snapshot_path.exists() and FaceGalleryChange.query.count() == 2
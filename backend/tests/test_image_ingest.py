@@ -0,0 +1,37 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.image_ingest import decode_frame, jpeg_size, read_stream_into, reduction_for
+
+
+def _jpeg(width, height):
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.rectangle(img, (width // 4, height // 4), (width // 2, height // 2), (0, 200, 255), -1)
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+
+def test_jpeg_size_reads_header_only():
+    assert jpeg_size(_jpeg(1920, 1080)) == (1920, 1080)
+    assert jpeg_size(cv2.imencode('.png', np.zeros((8, 8, 3), np.uint8))[1].tobytes()) is None
+    assert jpeg_size(b'not an image') is None
+
+
+def test_decode_frame_reduces_while_decoding():
+    assert reduction_for((1920, 1080), 960) == 2
+    assert reduction_for((640, 480), 960) == 1
+    frame = decode_frame(_jpeg(1920, 1080), target_side=960)
+    assert frame.reduction == 2 and frame.shape == (540, 960, 3)
+    assert decode_frame(_jpeg(1920, 1080), target_side=0).shape == (1080, 1920, 3)
+    assert decode_frame(b'garbage') is None
+
+
+def test_read_stream_into_fills_numpy_buffer():
+    data = _jpeg(320, 240)
+    buffer = read_stream_into(io.BytesIO(data), len(data))
+    assert buffer.dtype == np.uint8 and buffer.tobytes() == data
+    assert decode_frame(buffer, target_side=0).shape == (240, 320, 3)
+    with pytest.raises(ValueError):
+        read_stream_into(io.BytesIO(data[:100]), len(data))
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.config import Config
+from app.services import image_writer
+from app.services.image_ingest import decode_frame
+from app.services.image_writer import ImageWriter
+
+
+def _encoded(ext, brightness=120):
+    image = np.full((60, 80, 3), brightness, dtype=np.uint8)
+    image[20:40, 30:50] = 255 - brightness
+    return cv2.imencode(ext, image)[1].tobytes()
+
+
+@pytest.fixture
+def writer():
+    writer = ImageWriter(max_batch=8, max_wait_ms=5)
+    yield writer
+    writer.shutdown()
+
+
+def test_writer_stores_original_jpeg_bytes(writer, tmp_path):
+    uploads = [(tmp_path / f"E001_{pose}.jpg", _encoded('.jpg', 100 + i * 10))
+               for i, pose in enumerate(("front", "left", "right"))]
+    futures = [writer.save(str(path), decode_frame(data, target_side=0)) for path, data in uploads]
+    assert writer.flush(timeout=5)
+
+    assert [future.result() for future in futures] == [str(path) for path, _ in uploads]
+    for path, data in uploads:
+        assert path.read_bytes() == data  # không encode lại
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(path.name for path, _ in uploads)
+
+
+def test_writer_encodes_non_jpeg_and_keeps_submission_order(writer, tmp_path):
+    path = str(tmp_path / "E001_front.jpg")
+    writer.save(path, decode_frame(_encoded('.jpg', 60), target_side=0))
+    writer.save(path, decode_frame(_encoded('.png', 200), target_side=0))
+    assert writer.flush(timeout=5)
+
+    saved = cv2.imread(path)
+    assert (tmp_path / "E001_front.jpg").read_bytes()[:2] == b'\xff\xd8'
+    assert abs(float(saved[0, 0].mean()) - 200) < 3  # lần ghi sau cùng thắng
+
+
+def test_failed_write_does_not_block_the_batch(writer, tmp_path):
+    frame = decode_frame(_encoded('.jpg'), target_side=0)
+    failed = writer.save(str(tmp_path / "missing" / "E001_front.jpg"), frame)
+    written = writer.save(str(tmp_path / "E002_front.jpg"), frame)
+    assert writer.flush(timeout=5)
+
+    with pytest.raises(OSError):
+        failed.result()
+    assert written.result() and (tmp_path / "E002_front.jpg").exists()
+
+
+def test_save_frame_writes_in_request_thread_when_async_is_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'FACE_IMAGE_WRITE_ASYNC', False)
+    data = _encoded('.jpg')
+    assert image_writer.save_frame(decode_frame(data, target_side=0), str(tmp_path / "E001_up.jpg")) is None
+    assert (tmp_path / "E001_up.jpg").read_bytes() == data
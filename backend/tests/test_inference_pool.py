@@ -0,0 +1,57 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from app.services import inference_pool
+from app.services.inference_pool import InferencePool
+
+CRASH = 255  # giá trị pixel làm worker giả chết giữa chừng (như OOM / lỗi trong onnxruntime)
+
+
+class _FakeDetector:
+    def detect(self, image, input_size=None, max_num=0, metric='default'):
+        if image.size and image.flat[0] == CRASH:
+            os._exit(1)
+        return np.array([[10.0, 20.0, 60.0, 80.0, 0.9]], dtype=np.float32), None
+
+
+class _FakeRecognizer:
+    def get_feat(self, crops):
+        if any(crop.flat[0] == CRASH for crop in crops):
+            os._exit(1)
+        return np.stack([np.full(4, crop.mean() + 1.0, dtype=np.float32) for crop in crops])
+
+
+class _FakeAnalyzer:
+    def __init__(self):
+        self.det_model = _FakeDetector()
+        self.models = {'detection': self.det_model, 'recognition': _FakeRecognizer()}
+
+
+def _init_fake_worker():
+    inference_pool._worker_analyzer = _FakeAnalyzer()
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(1, max_batch=4, max_wait_ms=1, initializer=_init_fake_worker)
+    yield pool
+    pool.shutdown()
+
+
+def _image(value):
+    return np.full((112, 112, 3), value, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("stage", ["detect", "embed"])
+def test_pool_recovers_after_a_worker_dies(pool, stage):
+    assert pool.embed(_image(10)).result(timeout=60) == pytest.approx(np.full(4, 0.5))
+
+    with pytest.raises(BrokenProcessPool):
+        getattr(pool, stage)(_image(CRASH)).result(timeout=60)
+
+    faces = pool.detect(_image(10)).result(timeout=60)
+    assert len(faces) == 1 and faces[0].bbox.tolist() == [10.0, 20.0, 60.0, 80.0]
+    assert pool.embed(_image(10)).result(timeout=60) == pytest.approx(np.full(4, 0.5))
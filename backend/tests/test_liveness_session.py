@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.facial_service import FacialRecognitionService, LivenessChecker
+from app.services.liveness_features import analyze_sequence, liveness_features
+from app.services.liveness_session import (
+    BLINK_EAR_THRESHOLD, EAR, HEAD_MOVEMENT_MIN_FRAMES, MOUTH_RATIO, LivenessSession,
+)
+
+WINDOW_SECONDS = 5
+CAPACITY = 30
+
+
+def _landmark_sequence(rng, frames):
+    """Jittering face with occasional blinks, smiles and head turns"""
+    base = rng.random((68, 2)) * 20 + np.tile([[100.0, 100.0]], (68, 1))
+    for _ in range(frames):
+        lm = base + rng.standard_normal((68, 2)) * rng.choice([0.5, 4.0])
+        if rng.random() < 0.03:
+            # Nhắm mắt: ép toạ độ y của 12 điểm mắt về giữa
+            eyes = lm[36:48]
+            eyes[:, 1] = eyes[:, 1].mean() + (eyes[:, 1] - eyes[:, 1].mean()) * 0.05
+        yield lm
+
+
+def _full_scan(checker, frames_data):
+    """The previous per-frame evaluation: rescan the whole window"""
+    blink = any(checker.detect_blink(f['landmarks']) for f in frames_data)
+    smile = any(checker.detect_smile(f['landmarks']) for f in frames_data)
+    return blink, smile, checker.detect_head_movement(frames_data)
+
+
+def test_incremental_matches_full_window_scan():
+    checker = LivenessChecker()
+    for seed in range(20):
+        rng = np.random.default_rng(seed)
+        session = LivenessSession(CAPACITY)
+        frames_data, flags = [], [False, False, False]
+        now = 0.0
+        for landmarks in _landmark_sequence(rng, 80):
+            now += rng.choice([0.05, 0.2, 1.5])
+            # Previous implementation: append, drop old frames, cap the window, rescan
+            frames_data.append({'timestamp': now, 'landmarks': landmarks})
+            frames_data = [f for f in frames_data if now - f['timestamp'] <= WINDOW_SECONDS]
+            if len(frames_data) > CAPACITY:
+                frames_data.pop(0)
+            flags = [old or new for old, new in zip(flags, _full_scan(checker, frames_data))]
+
+            session.expire(now, WINDOW_SECONDS)
+            session.add_frame(now, checker.frame_features(landmarks))
+            session.update_actions()
+
+            assert session.count == len(frames_data)
+            assert [session.blink_detected, session.smile_detected, session.head_movement_detected] == flags
+
+
+def test_window_tracks_head_movement_count():
+    session = LivenessSession(HEAD_MOVEMENT_MIN_FRAMES + 1)
+    for i, yaw in enumerate([0] + [10] * (HEAD_MOVEMENT_MIN_FRAMES + 1)):
+        session.add_frame(float(i), (0.3, 2.0, yaw, 0.0))
+    # Bước nhảy yaw 0 -> 10 đã ra khỏi cửa sổ
+    assert session.count == session.capacity and session.moves_in_window == 0
+    assert session.update_actions() == []
+    session.add_frame(10.0, (0.3, 2.0, 30.0, 0.0))
+    assert session.moves_in_window == 1
+    assert session.update_actions() == ['head movement']
+
+
+def test_vectorized_features_match_per_frame():
+    rng = np.random.default_rng(3)
+    batch = np.stack(list(_landmark_sequence(rng, 60))).astype(np.float32)
+    batch[5, 36:48] = batch[5, 36]  # mắt suy biến: EAR = inf, không phải chớp mắt
+    batch[6, [51, 57]] = batch[6, 51]  # miệng chiều cao 0: tỉ lệ 0
+    features = liveness_features(batch)
+    assert features.shape == (60, 4) and features.dtype == np.float32
+    for lm, row in zip(batch, features):
+        assert np.array_equal(liveness_features(lm), row)
+    assert features[5, EAR] == np.inf and features[6, MOUTH_RATIO] == 0
+
+    result = analyze_sequence(batch)
+    blinks = np.flatnonzero(features[:, EAR] < BLINK_EAR_THRESHOLD)
+    assert result['blink'] == (int(blinks[0]) if blinks.size else None)
+
+
+def _head_turn(reduction):
+    """Frames of a slow head turn (nose moves 8 px per frame at full resolution), decoded at 1/reduction"""
+    rng = np.random.default_rng(11)
+    base = rng.random((68, 2)) * 20 + 100.0
+    base[[0, 16], 0] = [60.0, 140.0]   # hàm trái / phải
+    base[36:48, 1] = 90.0              # mắt mở, nằm ngang
+    base[36:48, 0] = np.linspace(70, 130, 12)
+    for i in range(HEAD_MOVEMENT_MIN_FRAMES + 2):
+        lm = base.copy()
+        lm[30, 0] = 100.0 + 8.0 * i
+        yield SimpleNamespace(
+            frame=SimpleNamespace(gray=rng.integers(0, 255, (40, 40)), reduction=reduction),
+            landmarks=(lm / reduction).astype(np.float32),
+            face_quality=0.0, aligned_crop=None, pose_type='front', embedded=False)
+
+
+def test_head_movement_does_not_depend_on_decode_scale():
+    outcomes = {}
+    for reduction in (1, 4):
+        session = LivenessSession(CAPACITY)
+        results = [FacialRecognitionService._advance_liveness(session, analysis, 0.1 * i)[:2]
+                   for i, analysis in enumerate(_head_turn(reduction))]
+        outcomes[reduction] = results
+        assert session.head_movement_detected
+    assert outcomes[1] == outcomes[4]
@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+
+from app.services.liveness_session import LivenessSession
+from app.services.liveness_store import RedisLivenessStore, SQLiteLivenessStore, create_liveness_store
+
+
+def _session(frames=3, now=None):
+    now = now or time.time()
+    rng = np.random.default_rng(0)
+    session = LivenessSession(30, last_update=now)
+    for i in range(frames):
+        session.add_frame(now - (frames - i) * 0.1, rng.random(4).astype(np.float32) * 20)
+    session.blink_detected = True
+    session.best_quality = np.float64(42.5)
+    session.best_crop = rng.integers(0, 256, (112, 112, 3), dtype=np.uint8)
+    return session
+
+
+class _DictRedis:
+    """Local stand-in serving the redis-py get/set/delete calls the store uses"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        value, expires = self.values.get(key, (None, 0))
+        return value if time.time() < expires else None
+
+    def set(self, key, value, px=None):
+        self.values[key] = (value, time.time() + px / 1000)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_session_bytes_round_trip():
+    session = _session(frames=40)  # vòng đệm đã quay vòng
+    session.update_track([10.5, 20, 110, 140, 0.9], tracked=True)
+    restored = LivenessSession.from_bytes(session.to_bytes())
+    assert restored.blink_detected is True and restored.best_quality == 42.5
+    assert restored.last_update == session.last_update
+    assert np.array_equal(restored.best_crop, session.best_crop)
+    assert restored.embedding is None
+    assert np.array_equal(restored.track_bbox, [10.5, 20, 110, 140]) and restored.tracked_frames == 1
+    assert restored.count == 30 and restored.moves_in_window == session.moves_in_window
+    for original, copy in zip(session.window(), restored.window()):
+        assert np.array_equal(original, copy)
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'liveness.db')
+    worker_a, worker_b = SQLiteLivenessStore(5, path), SQLiteLivenessStore(5, path)
+    worker_a.put('kiosk-1', _session())
+    assert worker_b.get('kiosk-1').blink_detected is True
+    worker_b.delete('kiosk-1')
+    assert worker_a.get('kiosk-1') is None
+
+    worker_a.put('stale', _session(now=time.time() - 10))
+    assert worker_b.get('stale') is None
+
+
+def test_redis_store_with_stand_in_client():
+    store = create_liveness_store('redis', 5, client=_DictRedis())
+    assert isinstance(store, RedisLivenessStore)
+    store.put('kiosk-1', _session(frames=30))
+    assert store.get('kiosk-1').count == 30
+    assert store.get('other') is None
+
+
+def test_memory_store_expires_sessions():
+    store = create_liveness_store('memory', 5)
+    store.put('old', _session(now=time.time() - 10))
+    store.put('new', _session())
+    assert store.get('old') is None and store.get('new') is not None
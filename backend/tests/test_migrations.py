@@ -0,0 +1,23 @@
+import os
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.config import TestingConfig
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+def test_migrations_build_the_current_schema(tmp_path):
+    class MigrationTestingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'migrated.db'}"
+
+    app = create_app(MigrationTestingConfig)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            diff = compare_metadata(MigrationContext.configure(connection), db.metadata)
+        db.engine.dispose()
+    assert diff == []
@@ -0,0 +1,150 @@
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from app.config import Config
+from app.services import attendance_service, facial_service
+from app.services.face_gallery import FaceGallery, EMBEDDING_DIM
+from app.services.facial_service import FacialRecognitionService, FrameAnalysis, liveness_sessions
+from app.services.liveness_session import LivenessSession
+
+BOX = [200, 150, 296, 270]
+
+
+@pytest.fixture
+def people(monkeypatch):
+    """Hai nhân viên trong gallery; ảnh giả mang danh tính ở giá trị pixel (0 = không có mặt)"""
+    rng = np.random.default_rng(4)
+    embeddings = {i: rng.standard_normal(EMBEDDING_DIM).astype(np.float32) for i in (1, 2, 3)}
+    gallery = FaceGallery()
+    gallery.build([("E001", "front", embeddings[1].tobytes()), ("E002", "front", embeddings[2].tobytes())])
+    monkeypatch.setattr(facial_service, 'face_gallery', gallery)
+    monkeypatch.setattr(gallery, 'sync', lambda force=False: None)
+
+    calls = {"embed": 0}
+
+    def identity(analysis):
+        return int(analysis.image[0, 0, 0])
+
+    def embedding(analysis):
+        # Như FrameAnalysis.embedding: model recognition chạy tối đa một lần mỗi khung hình
+        if analysis._embedding is None:
+            calls["embed"] += 1
+            # Cùng người, khung hình khác: thêm chút nhiễu
+            noise = 0.05 * rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+            analysis._embedding = embeddings[identity(analysis)] + noise
+        return analysis._embedding
+
+    monkeypatch.setattr(FrameAnalysis, 'face', property(lambda a: SimpleNamespace(bbox=BOX) if identity(a) else None))
+    monkeypatch.setattr(FrameAnalysis, 'embedding', property(embedding))
+    monkeypatch.setattr(FrameAnalysis, 'pose_type', property(lambda a: 'front'))
+    return calls
+
+
+def _frame(person):
+    frame = np.full((480, 640, 3), person, dtype=np.uint8)
+    frame[240:, ::2] = 200  # đủ tương phản cho kiểm tra ánh sáng của liveness
+    return frame
+
+
+@pytest.fixture
+def session_id(monkeypatch):
+    monkeypatch.setattr(Config, 'FACE_RESULT_CACHE_TTL_SECONDS', 3.0)
+    session = LivenessSession(30, last_update=time.time())
+    session.liveness_passed = True
+    session.update_track(BOX, tracked=False)
+    liveness_sessions().put('cache-test', session)
+    yield 'cache-test'
+    liveness_sessions().delete('cache-test')
+
+
+def test_cached_outcome_is_served_while_the_same_employee_is_recognized(people, session_id):
+    decided = {"success": True, "status": "check-in", "employee": {"employee_id": "E001"}}
+    FacialRecognitionService.cache_result(session_id, "E001", decided, None, 200)
+
+    result, error, status = FacialRecognitionService.cached_result(_frame(1), session_id)
+    assert (result, error, status) == (dict(decided, cached=True), None, 200)
+    assert people["embed"] == 1
+
+
+@pytest.mark.parametrize("person", [2, 3, 0], ids=["other employee", "unknown face", "no face"])
+def test_different_face_in_the_same_box_misses_the_cache(people, session_id, person):
+    FacialRecognitionService.cache_result(session_id, "E001", {"success": True}, None, 200)
+
+    assert FacialRecognitionService.cached_result(_frame(person), session_id) is None
+    # Kết quả đã bị bỏ: kể cả người cũ quay lại cũng phải qua pipeline đầy đủ
+    assert FacialRecognitionService.cached_result(_frame(1), session_id) is None
+
+
+def test_cached_outcome_expires_and_errors_are_not_cached(people, session_id):
+    FacialRecognitionService.cache_result(session_id, "E001", None, {"success": False}, 500)
+    assert FacialRecognitionService.cached_result(_frame(1), session_id) is None
+
+    FacialRecognitionService.cache_result(session_id, "E001", {"success": True}, None, 200)
+    session = liveness_sessions().get(session_id)
+    session.result_expires = time.time() - 1
+    liveness_sessions().put(session_id, session)
+    assert FacialRecognitionService.cached_result(_frame(1), session_id) is None
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Settings giả (không cần database); attendance_service dùng chung gallery với facial_service"""
+    settings = SimpleNamespace(detection_scale=0.5, detection_max_side=320, gallery_search_backend='centroid',
+                               ivf_list_count=None, ivf_probe_count=None, centroid_shortlist=5)
+    monkeypatch.setattr(attendance_service.Settings, 'get_current_settings', lambda: settings)
+    monkeypatch.setattr(attendance_service, 'face_gallery', facial_service.face_gallery)
+    monkeypatch.setattr(FacialRecognitionService, 'detection_options', {"scale": 1.0, "max_side": 0})
+    return settings
+
+
+def _recognize(person, session_id):
+    raw = cv2.imencode('.png', _frame(person))[1].tobytes()
+    return attendance_service.recognize_image_bytes_logic(raw, None, None, session_id)
+
+
+def test_cache_hit_skips_attendance_logic(people, session_id, settings, monkeypatch):
+    FacialRecognitionService.cache_result(session_id, "E001", {"success": True}, None, 200)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache hit must not run the liveness pipeline or the attendance logic")
+    monkeypatch.setattr(attendance_service.FacialRecognitionService, 'recognize_face_with_liveness', fail)
+    monkeypatch.setattr(attendance_service, 'record_attendance_logic', fail)
+
+    gallery = facial_service.face_gallery
+    search = gallery.search
+    seen = {}
+
+    def search_with_current_settings(query, pose_type=None):
+        # Cache được kiểm tra với backend và tỉ lệ detection của settings hiện tại
+        seen.update(backend=gallery._backend_config, detection=dict(FacialRecognitionService.detection_options))
+        return search(query, pose_type)
+    monkeypatch.setattr(gallery, 'search', search_with_current_settings)
+
+    result, error, status = _recognize(1, session_id)
+    assert result == {"success": True, "cached": True} and status == 200
+    assert seen["backend"][0] == "centroid" and seen["detection"] == {"scale": 0.5, "max_side": 320}
+
+
+def test_cache_miss_reuses_the_frame_analysis(people, session_id, settings, monkeypatch):
+    FacialRecognitionService.cache_result(session_id, "E001", {"success": True}, None, 200)
+    landmarks = np.random.default_rng(0).uniform(100, 300, (68, 2)).astype(np.float32)
+    monkeypatch.setattr(FrameAnalysis, 'landmarks', property(lambda a: landmarks))
+    monkeypatch.setattr(FrameAnalysis, 'face_quality', property(lambda a: 50.0))
+    monkeypatch.setattr(FrameAnalysis, 'aligned_crop', property(lambda a: a.image[:112, :112]))
+
+    matched = {}
+
+    def match_embedding(query_embedding, query_pose=None):
+        matched["embedding"] = query_embedding
+        return True, "Face recognized successfully", SimpleNamespace(employee_id="E002")
+    monkeypatch.setattr(FacialRecognitionService, 'match_embedding', match_embedding)
+    monkeypatch.setattr(attendance_service, 'record_attendance_logic',
+                        lambda employee, settings, session_id: ({"success": True}, None, 200))
+
+    # E002 trong khung của E001: cache trượt, pipeline đầy đủ dùng lại detection và embedding đã tính
+    assert _recognize(2, session_id) == ({"success": True}, None, 200)
+    assert people["embed"] == 1 and matched["embedding"] is not None
@@ -19,6 +19,48 @@ export const recognizeFace = async (formData) => {
   }
 }
 
+// Nhận diện từ ảnh nhị phân (Blob JPEG): không base64, metadata gửi qua header
+export const recognizeFaceBinary = async (blob, { sessionId, location, deviceInfo } = {}) => {
+  try {
+    const headers = { 'Content-Type': blob.type || 'application/octet-stream', 'X-Session-Id': sessionId }
+    if (location) headers['X-Location'] = encodeURIComponent(location)
+    if (deviceInfo) headers['X-Device-Info'] = encodeURIComponent(deviceInfo)
+
+    const response = await api.post('/api/recognize/binary', blob, { headers })
+    return response.data
+
+  } catch (error) {
+    console.error('Face recognition error:', error.response?.data || error.message)
+    throw error
+  }
+}
+
+// Phiên nhận diện qua WebSocket: gửi frame liên tục, nhận "progress" khi trạng thái liveness đổi
+// và một "result" cuối cùng (cùng format với /api/recognize), sau đó server đóng kết nối
+export const openRecognitionStream = ({ sessionId, location, deviceInfo, onEvent, onClose } = {}) => {
+  const url = new URL('/api/recognize/stream', api.defaults.baseURL)
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
+  const socket = new WebSocket(url)
+  socket.binaryType = 'arraybuffer'
+
+  socket.onopen = () => {
+    socket.send(JSON.stringify({ type: 'start', session_id: sessionId, location, device_info: deviceInfo }))
+  }
+  socket.onmessage = (event) => onEvent?.(JSON.parse(event.data))
+  socket.onclose = (event) => onClose?.(event)
+
+  return {
+    // Bỏ qua frame khi kết nối chưa sẵn sàng hoặc còn dữ liệu chưa gửi hết
+    sendFrame: (blob) => {
+      if (socket.readyState === WebSocket.OPEN && socket.bufferedAmount === 0) socket.send(blob)
+    },
+    stop: () => {
+      if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'stop' }))
+      socket.close()
+    },
+  }
+}
+
 // Gửi ảnh training
 export const captureFacePose = (data) => {
   return api.post('/api/face-training/capture', data, {